@@ -6,16 +6,35 @@
 """
 
 import sqlite3
-import json
 import os
+import argparse
 from datetime import datetime
 from collections import defaultdict
 
+from torah_compress import CompressionStage, gzip_blocks, open_block_gzip
+from torah_corpus import TorahCorpus
+from torah_json_stream import RawJSON, iter_json, json_text, write_json_stream
+from torah_incremental import CORE_TABLES, BuildState, ContentFingerprints
+from torah_metrics import BuildMetrics, measured
+from torah_parallel import list_book_ids, map_books
+from torah_serializer import BACKENDS, PROFILES, JSONSerializer, dumps, use_backend
+from torah_stats import load_stats
+
 class CompleteTorahJSONExporter:
-    def __init__(self, db_path="torah.db", output_dir="torah_json_export"):
+    def __init__(self, db_path="torah.db", output_dir="torah_json_export", streaming=False, workers=1,
+                 incremental=False, compress_workers=None, json_profile="pretty"):
         self.db_path = db_path
         self.output_dir = output_dir
+        self.streaming = streaming  # כתיבה בזרימה - זיכרון חסום לספר אחד
+        self.workers = workers      # מספר תהליכים לבניית ספרים במקביל
+        self.incremental = incremental  # בנייה רק של תוצרים שהקלטים שלהם השתנו
+        self.compress_workers = compress_workers  # חוטי דחיסה (ברירת מחדל: כל הליבות)
+        self.compression = None  # שלב הדחיסה המקבילי (torah_compress) - רק בלי מצב זרימה
+        self.serializer = JSONSerializer(json_profile)  # pretty (פיתוח) או compact (ייצור) לקבצים הלא דחוסים
         self.conn = None
+        self.corpus = None
+        self.build_state = None
+        self.torah_stats = None  # ספירות מוכנות לכל ספר/פרק/פסוק (torah_stats)
         self.export_stats = {
             "exported_at": datetime.now().isoformat(),
             "total_files": 0,
@@ -23,6 +42,7 @@ class CompleteTorahJSONExporter:
             "tables_exported": {},
             "records_count": {}
         }
+        self.metrics = BuildMetrics("CompleteTorahJSONExporter")  # זמן/שאילתות/שורות/בתים/זיכרון לכל שלב
         
     def connect_db(self):
         """התחברות לבסיס הנתונים"""
@@ -32,6 +52,12 @@ class CompleteTorahJSONExporter:
         self.conn = sqlite3.connect(self.db_path)
         self.conn.row_factory = sqlite3.Row
         print(f"✅ מחובר ל-{self.db_path}")
+    
+    def load_corpus(self):
+        """טעינת כל הטבלאות לזיכרון פעם אחת לכל ההרצה"""
+        if self.corpus is None:
+            self.corpus = TorahCorpus.load(self.conn)
+        return self.corpus
         
     def setup_output_directory(self):
         """יצירת תיקיות פלט"""
@@ -53,235 +79,376 @@ class CompleteTorahJSONExporter:
         full_path = f"{self.output_dir}/{filepath}"
         
         if compress:
-            import gzip
-            with gzip.open(f"{full_path}.gz", 'wt', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
-            file_size = os.path.getsize(f"{full_path}.gz")
-            self.export_stats["total_files"] += 1
-            self.export_stats["total_size_mb"] += file_size / (1024*1024)
-            return f"{filepath}.gz"
+            if self.streaming:
+                # אותם בלוקים כמו בשלב הדחיסה - אותם בתים בריצה בזרימה, סדרתית ומקבילית
+                with open_block_gzip(f"{full_path}.gz") as f:
+                    for chunk in iter_json(data):
+                        f.write(chunk)
+                return self.save_bytes(None, f"{filepath}.gz")
+            return self.save_compressed(json_text(data, pretty=False).encode('utf-8'), f"{filepath}.gz")
         else:
-            with open(full_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            file_size = os.path.getsize(full_path)
-            self.export_stats["total_files"] += 1
-            self.export_stats["total_size_mb"] += file_size / (1024*1024)
-            return filepath
+            if self.streaming or self.workers > 1:
+                write_json_stream(data, full_path, pretty=self.serializer.indented())
+            else:
+                self.serializer.write(data, full_path)
+            return self.save_bytes(None, filepath)
+    
+    def save_compressed(self, payload, filepath):
+        """דחיסה ברקע בשלב הדחיסה המקבילי (הסטטיסטיקות מתעדכנות ב-wait_for_compression)"""
+        if self.compression is None:
+            return self.save_bytes(gzip_blocks(payload), filepath)
+        self.compression.submit(f"{self.output_dir}/{filepath}", payload)
+        return filepath
+    
+    def wait_for_compression(self):
+        """המתנה לכל הקבצים שבתור הדחיסה והוספתם לסטטיסטיקות הייצוא"""
+        if self.compression is None:
+            return
+        with self.metrics.stage("compress_wait"):
+            for full_path, file_size in self.compression.wait():
+                self.export_stats["total_files"] += 1
+                self.export_stats["total_size_mb"] += file_size / (1024*1024)
+    
+    def save_bytes(self, payload, filepath):
+        """כתיבת תוכן מוכן (למשל דחוס בתהליך עובד) ועדכון סטטיסטיקות הייצוא"""
+        full_path = f"{self.output_dir}/{filepath}"
+        
+        if payload is not None:
+            with open(full_path, 'wb') as f:
+                f.write(payload)
+        file_size = os.path.getsize(full_path)
+        self.export_stats["total_files"] += 1
+        self.export_stats["total_size_mb"] += file_size / (1024*1024)
+        return filepath
+    
+    def skip_unchanged(self, filepath, fingerprint):
+        """במצב מצטבר - דילוג על קובץ שהקלטים שלו לא השתנו (נספר בסטטיסטיקות כמו קובץ שנכתב)"""
+        if not self.build_state.is_fresh(filepath, fingerprint):
+            return False
+        self.save_bytes(None, filepath)
+        print(f"  ⏭️ {filepath}: ללא שינוי")
+        return True
+    
+    def iter_query_rows(self, query):
+        """הפקת שורות שאילתה אחת-אחת (למצב זרימה)"""
+        cursor = self.conn.cursor()
+        cursor.execute(query)
+        for row in cursor:
+            yield dict(row)
+    
+    def list_tables(self):
+        """רשימת כל הטבלאות בבסיס הנתונים"""
+        if not self.streaming:
+            return list(self.load_corpus().tables)
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+        return [row[0] for row in cursor.fetchall()]
     
+    def build_table_data(self, table_name):
+        """נתוני טבלה אחת - במצב זרימה השורות נקראות רק בזמן הכתיבה"""
+        # ייצוא מלא של הטבלה ומידע על הטבלה
+        if self.streaming:
+            cursor = self.conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+            row_count = cursor.fetchone()[0]
+            rows = self.iter_query_rows(f"SELECT * FROM {table_name}")
+            cursor.execute(f"PRAGMA table_info({table_name})")
+            columns_info = [dict(row) for row in cursor.fetchall()]
+        else:
+            table = self.load_corpus().tables[table_name]
+            rows = list(table.iter_dicts())
+            row_count = len(rows)
+            columns_info = table.columns
+        
+        return {
+            "table_name": table_name,
+            "columns": columns_info,
+            "row_count": row_count,
+            "data": rows
+        }
+    
+    @measured
     def export_all_tables_raw(self):
         """ייצוא כל הטבלאות בצורה גולמית"""
         print("\n📊 מייצא את כל הטבלאות...")
         
-        cursor = self.conn.cursor()
+        fingerprints = self.build_state.fingerprints
+        
+        # טבלאות שלא השתנו לא נקראות ולא נכתבות מחדש
+        changed_tables = []
+        for table_name, fingerprint in fingerprints.tables.items():
+            filepath = f"tables/{table_name}.json"
+            if self.skip_unchanged(filepath, fingerprint):
+                self.export_stats["records_count"][table_name] = self.build_state.info(filepath)
+            else:
+                changed_tables.append(table_name)
+        
+        if not changed_tables and self.skip_unchanged("backup/all_tables_raw.gz", fingerprints.of_all()):
+            return None
         
         # קבלת רשימת כל הטבלאות
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
-        tables = [row[0] for row in cursor.fetchall()]
+        tables = self.list_tables()
         
         all_tables_data = {}
         
         for table_name in tables:
             print(f"  📋 מייצא טבלה: {table_name}")
             
-            # ייצוא מלא של הטבלה
-            cursor.execute(f"SELECT * FROM {table_name}")
-            rows = [dict(row) for row in cursor.fetchall()]
-            
-            # מידע על הטבלה
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns_info = [dict(row) for row in cursor.fetchall()]
-            
-            table_data = {
-                "table_name": table_name,
-                "columns": columns_info,
-                "row_count": len(rows),
-                "data": rows
-            }
+            table_data = self.build_table_data(table_name)
+            row_count = table_data["row_count"]
             
             all_tables_data[table_name] = table_data
-            self.export_stats["records_count"][table_name] = len(rows)
+            self.export_stats["records_count"][table_name] = row_count
             
-            # שמירה נפרדת של כל טבלה
-            self.save_json(table_data, f"tables/{table_name}.json")
+            # שמירה נפרדת של כל טבלה (רק אם השתנתה)
+            if table_name in changed_tables:
+                self.save_json(table_data, f"tables/{table_name}.json")
+                self.build_state.record(f"tables/{table_name}.json", fingerprints.tables.get(table_name), row_count)
             
-            print(f"    ✅ {len(rows):,} רשומות נשמרו")
+            print(f"    ✅ {row_count:,} רשומות נשמרו")
         
         # שמירה של כל הטבלאות ביחד (דחוס)
+        if self.streaming:
+            # הגנרטורים כבר נצרכו בשמירה הנפרדת - קוראים שוב
+            all_tables_data = {table_name: self.build_table_data(table_name) for table_name in tables}
         self.save_json(all_tables_data, "backup/all_tables_raw", compress=True)
+        self.build_state.record("backup/all_tables_raw.gz", fingerprints.of_all())
         print(f"  💾 כל הטבלאות נשמרו גם ביחד (דחוס)")
         
         return all_tables_data
     
-    def create_structured_export(self):
-        """יצירת ייצוא מובנה עם קשרים"""
-        print("\n🏗️ יוצר ייצוא מובנה...")
-        
-        cursor = self.conn.cursor()
+    def iter_structured_books(self, book_ids=None):
+        """בניית הספרים המובנים אחד-אחד (כולם, או רק book_ids)"""
+        if self.workers > 1:
+            # כל ספר נבנה ועובר סריאליזציה בתהליך נפרד, התוצאות מגיעות לפי הסדר
+            if book_ids is None:
+                book_ids = list_book_ids(self.conn)
+            for fragment in map_books(self.db_path, book_ids, build_structured_book_json, self.workers,
+                                      self.torah_stats):
+                yield RawJSON(fragment)
+            return
+        
+        # במצב זרימה כל ספר נטען בנפרד, אחרת כל הנתונים נטענים פעם אחת
+        if self.streaming:
+            corpus = None
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT * FROM tbl_Sefer ORDER BY ID")
+            books = cursor.fetchall()
+        else:
+            corpus = self.load_corpus()
+            books = corpus.books
         
-        structured_data = {
-            "metadata": {
-                "export_date": self.export_stats["exported_at"],
-                "source_database": self.db_path,
-                "description": "נתוני התורה המלאים במבנה מובנה"
-            },
-            "books": [],
-            "parshiot": [],
-            "statistics": {}
+        for book in books:
+            if book_ids is not None and book["ID"] not in book_ids:
+                continue
+            book_corpus = corpus or TorahCorpus.load(self.conn, book["ID"])
+            yield self.build_structured_book(book_corpus, book)
+    
+    def build_structured_book(self, corpus, book):
+        """בניית ספר מובנה אחד עם סטטיסטיקות הספר"""
+        book_id = book["ID"]
+        book_name = book["SeferName"]
+        
+        print(f"  📚 מעבד ספר: {book_name}")
+        
+        book_stats = self.torah_stats.book(book_id)
+        book_data = {
+            "book_info": dict(book),
+            "chapters": [],
+            "statistics": {
+                "chapter_count": book_stats["chapters"],
+                "verse_count": book_stats["verses"],
+                "question_count": book_stats["questions"],
+                "title_count": book_stats["titles"]
+            }
         }
         
-        # ייצוא ספרים עם כל הנתונים
-        cursor.execute("SELECT * FROM tbl_Sefer ORDER BY ID")
-        books = cursor.fetchall()
-        
-        total_verses = 0
-        total_questions = 0
-        total_titles = 0
+        # קבלת כל הפרקים
+        chapters = corpus.chapters(book_id)
         
-        for book in books:
-            book_id = book["ID"]
-            book_name = book["SeferName"]
-            
-            print(f"  📚 מעבד ספר: {book_name}")
-            
-            book_data = {
-                "book_info": dict(book),
-                "chapters": [],
-                "statistics": {
-                    "chapter_count": 0,
-                    "verse_count": 0,
-                    "question_count": 0,
-                    "title_count": 0
-                }
+        for chapter_num in chapters:
+            chapter_data = {
+                "chapter_number": chapter_num,
+                "verses": []
             }
             
-            # קבלת כל הפרקים
-            cursor.execute("SELECT DISTINCT Perek FROM tbl_Torah WHERE Sefer = ? ORDER BY Perek", (book_id,))
-            chapters = [row[0] for row in cursor.fetchall()]
+            # קבלת כל הפסוקים בפרק
+            verses = corpus.verses(book_id, chapter_num)
             
-            for chapter_num in chapters:
-                chapter_data = {
-                    "chapter_number": chapter_num,
-                    "verses": []
-                }
-                
-                # קבלת כל הפסוקים בפרק
-                cursor.execute("""
-                    SELECT ID, PasukNum, Pasuk 
-                    FROM tbl_Torah 
-                    WHERE Sefer = ? AND Perek = ? 
-                    ORDER BY PasukNum
-                """, (book_id, chapter_num))
+            for verse in verses:
+                torah_id = verse["ID"]
+                verse_num = verse["PasukNum"]
+                verse_text = verse["Pasuk"]
                 
-                verses = cursor.fetchall()
+                # קבלת כותרות לפסוק
+                titles = [dict(row) for row in corpus.titles(torah_id)]
                 
-                for verse in verses:
-                    torah_id = verse["ID"]
-                    verse_num = verse["PasukNum"]
-                    verse_text = verse["Pasuk"]
-                    
-                    # קבלת כותרות לפסוק
-                    cursor.execute("SELECT * FROM tbl_Title WHERE TorahID = ?", (torah_id,))
-                    titles = [dict(row) for row in cursor.fetchall()]
+                # קבלת שאלות לכל כותרת
+                verse_questions = []
+                for title in titles:
+                    questions = [dict(row) for row in corpus.questions(title["ID"])]
                     
-                    # קבלת שאלות לכל כותרת
-                    verse_questions = []
-                    for title in titles:
-                        cursor.execute("SELECT * FROM tbl_Question WHERE TitleID = ?", (title["ID"],))
-                        questions = [dict(row) for row in cursor.fetchall()]
-                        
-                        if questions:  # רק אם יש שאלות
-                            verse_questions.append({
-                                "title_info": title,
-                                "questions": questions
-                            })
-                    
-                    verse_data = {
-                        "torah_id": torah_id,
-                        "verse_number": verse_num,
-                        "text": verse_text,
-                        "titles": titles,
-                        "question_groups": verse_questions,
-                        "stats": {
-                            "title_count": len(titles),
-                            "question_count": sum(len(qg["questions"]) for qg in verse_questions)
-                        }
+                    if questions:  # רק אם יש שאלות
+                        verse_questions.append({
+                            "title_info": title,
+                            "questions": questions
+                        })
+                
+                verse_stats = self.torah_stats.verse(torah_id)
+                verse_data = {
+                    "torah_id": torah_id,
+                    "verse_number": verse_num,
+                    "text": verse_text,
+                    "titles": titles,
+                    "question_groups": verse_questions,
+                    "stats": {
+                        "title_count": verse_stats["titles"],
+                        "question_count": verse_stats["questions"]
                     }
-                    
-                    chapter_data["verses"].append(verse_data)
-                    
-                    # עדכון סטטיסטיקות
-                    book_data["statistics"]["title_count"] += len(titles)
-                    book_data["statistics"]["question_count"] += verse_data["stats"]["question_count"]
+                }
                 
-                book_data["chapters"].append(chapter_data)
-                book_data["statistics"]["verse_count"] += len(verses)
-            
-            book_data["statistics"]["chapter_count"] = len(chapters)
-            structured_data["books"].append(book_data)
-            
-            # עדכון סטטיסטיקות כלליות
-            total_verses += book_data["statistics"]["verse_count"]
-            total_questions += book_data["statistics"]["question_count"]
-            total_titles += book_data["statistics"]["title_count"]
+                chapter_data["verses"].append(verse_data)
             
-            print(f"    ✅ {book_name}: {book_data['statistics']['chapter_count']} פרקים, {book_data['statistics']['verse_count']} פסוקים, {book_data['statistics']['question_count']} שאלות")
+            book_data["chapters"].append(chapter_data)
+        
+        print(f"    ✅ {book_name}: {book_data['statistics']['chapter_count']} פרקים, {book_data['statistics']['verse_count']} פסוקים, {book_data['statistics']['question_count']} שאלות")
+        
+        return book_data
+    
+    def build_structured_data(self):
+        """בניית הייצוא המובנה - במצב זרימה הספרים נבנים רק בזמן הכתיבה"""
+        books = self.iter_structured_books()
+        if self.workers > 1 and not self.streaming:
+            # הספרים כבר עברו סריאליזציה קומפקטית - מחברים למערך אחד שאפשר לכתוב שוב בקובץ המלא
+            books = RawJSON("[" + ",".join(book.text for book in books) + "]")
+        
+        structured_data = {
+            "metadata": {
+                "export_date": self.export_stats["exported_at"],
+                "source_database": self.db_path,
+                "description": "נתוני התורה המלאים במבנה מובנה"
+            },
+            "books": books if self.streaming or self.workers > 1 else list(books),
+            "parshiot": [],
+            "statistics": {}
+        }
         
         # ייצוא פרשות
-        cursor.execute("""
-            SELECT p.*, s.SeferName 
-            FROM tbl_Parsha p
-            JOIN tbl_Sefer s ON p.SeferID = s.ID
-            ORDER BY p.ID
-        """)
-        parshiot = [dict(row) for row in cursor.fetchall()]
+        if self.streaming:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                SELECT p.*, s.SeferName 
+                FROM tbl_Parsha p
+                JOIN tbl_Sefer s ON p.SeferID = s.ID
+                ORDER BY p.ID
+            """)
+            parshiot = [dict(row) for row in cursor.fetchall()]
+        else:
+            parshiot = self.load_corpus().parshiot_with_book_names()
         structured_data["parshiot"] = parshiot
         
-        # סטטיסטיקות כלליות
+        # סטטיסטיקות כלליות (מחושבות מראש - לא תלויות בבניית הספרים)
+        totals = self.torah_stats.totals
         structured_data["statistics"] = {
-            "total_books": len(books),
-            "total_chapters": sum(book["statistics"]["chapter_count"] for book in structured_data["books"]),
-            "total_verses": total_verses,
-            "total_questions": total_questions,
-            "total_titles": total_titles,
+            "total_books": totals["books"],
+            "total_chapters": totals["chapters"],
+            "total_verses": totals["verses"],
+            "total_questions": totals["questions"],
+            "total_titles": totals["titles"],
             "total_parshiot": len(parshiot)
         }
+        return structured_data
+    
+    @measured
+    def create_structured_export(self):
+        """יצירת ייצוא מובנה עם קשרים"""
+        print("\n🏗️ יוצר ייצוא מובנה...")
+        
+        fingerprint = self.build_state.fingerprints.of_tables(*CORE_TABLES, "tbl_Parsha")
+        if self.skip_unchanged("structured/complete_torah_structured.gz", fingerprint):
+            return None
+        
+        structured_data = self.build_structured_data()
         
         # שמירה של הייצוא המובנה (דחוס - כי זה גדול)
         self.save_json(structured_data, "structured/complete_torah_structured", compress=True)
+        self.build_state.record("structured/complete_torah_structured.gz", fingerprint)
         
         print(f"  💾 ייצוא מובנה נשמר (דחוס)")
         print(f"  📊 סטטיסטיקות: {structured_data['statistics']}")
         
         return structured_data
     
-    def create_separate_books(self, structured_data):
+    @measured
+    def create_separate_books(self, structured_data=None):
         """יצירת קובץ נפרד לכל ספר"""
         print("\n📖 יוצר קבצים נפרדים לכל ספר...")
         
-        for book in structured_data["books"]:
+        # רק ספרים שהתוכן שלהם השתנה נבנים מחדש
+        fingerprints = self.build_state.fingerprints
+        book_ids = [
+            book_id for book_id, book_name in self.conn.execute("SELECT ID, SeferName FROM tbl_Sefer ORDER BY ID")
+            if not self.skip_unchanged(f"books_separate/book_{book_id}_{book_name}.json.gz", fingerprints.of_book(book_id))
+        ]
+        
+        if self.workers > 1:
+            # כל ספר נבנה ועובר סריאליזציה בתהליך נפרד - הדחיסה בשלב הדחיסה, כמו בריצה סדרתית
+            results = map_books(self.db_path, book_ids, build_separate_book_json, self.workers,
+                                self.export_stats["exported_at"], self.torah_stats)
+            for book_id, (filename, payload) in zip(book_ids, results):
+                self.save_compressed(payload, filename)
+                self.build_state.record(filename, fingerprints.of_book(book_id))
+                print(f"  📚 {filename} נשמר בנפרד")
+            return
+        
+        if structured_data is None:
+            # מצב זרימה - כל ספר נבנה מחדש ונכתב לפני הבא
+            books = self.iter_structured_books(book_ids)
+        else:
+            books = [book for book in structured_data["books"] if book["book_info"]["ID"] in book_ids]
+        
+        for book in books:
             book_name = book["book_info"]["SeferName"]
             book_id = book["book_info"]["ID"]
-            
-            book_file_data = {
-                "book_info": book["book_info"],
-                "chapters": book["chapters"],
-                "statistics": book["statistics"],
-                "export_info": {
-                    "exported_at": self.export_stats["exported_at"],
-                    "book_name": book_name,
-                    "book_id": book_id
-                }
-            }
+            book_file_data = self.build_book_file_data(book)
             
             filename = f"books_separate/book_{book_id}_{book_name}.json"
             self.save_json(book_file_data, filename, compress=True)
+            self.build_state.record(f"{filename}.gz", fingerprints.of_book(book_id))
             
             print(f"  📚 {book_name} נשמר בנפרד")
     
-    def create_complete_single_file(self, all_tables, structured_data):
+    def build_book_file_data(self, book):
+        """תוכן הקובץ הנפרד של ספר"""
+        book_name = book["book_info"]["SeferName"]
+        book_id = book["book_info"]["ID"]
+        
+        return {
+            "book_info": book["book_info"],
+            "chapters": book["chapters"],
+            "statistics": book["statistics"],
+            "export_info": {
+                "exported_at": self.export_stats["exported_at"],
+                "book_name": book_name,
+                "book_id": book_id
+            }
+        }
+    
+    @measured
+    def create_complete_single_file(self, all_tables=None, structured_data=None):
         """יצירת קובץ אחד עם כל המידע"""
         print("\n📦 יוצר קובץ אחד עם כל המידע...")
         
+        fingerprint = self.build_state.fingerprints.of_all()
+        if self.skip_unchanged("complete/torah_complete_export.gz", fingerprint):
+            return
+        
+        # מצב זרימה - הטבלאות והספרים נקראים שוב בזמן הכתיבה
+        if all_tables is None:
+            all_tables = {table_name: self.build_table_data(table_name) for table_name in self.list_tables()}
+        if structured_data is None:
+            structured_data = self.build_structured_data()
+        
         complete_data = {
             "export_info": {
                 "exported_at": self.export_stats["exported_at"],
@@ -296,13 +463,19 @@ class CompleteTorahJSONExporter:
         
         # שמירה עם דחיסה מקסימלית
         self.save_json(complete_data, "complete/torah_complete_export", compress=True)
+        self.build_state.record("complete/torah_complete_export.gz", fingerprint)
         
         print(f"  💾 קובץ מלא נוצר (דחוס)")
     
+    @measured
     def create_export_manifest(self):
         """יצירת קובץ מניפסט עם תיאור כל הקבצים"""
         print("\n📋 יוצר מניפסט ייצוא...")
         
+        fingerprint = self.build_state.fingerprints.of_all()
+        if self.skip_unchanged("manifest.json", fingerprint):
+            return None
+        
         manifest = {
             "export_info": {
                 "created": self.export_stats["exported_at"],
@@ -333,6 +506,7 @@ class CompleteTorahJSONExporter:
         }
         
         self.save_json(manifest, "manifest.json")
+        self.build_state.record("manifest.json", fingerprint)
         print(f"  ✅ מניפסט נוצר")
         
         return manifest
@@ -342,10 +516,19 @@ class CompleteTorahJSONExporter:
         print("🚀 מתחיל ייצוא מלא של נתוני התורה ל-JSON")
         print("=" * 60)
         
+        self.metrics.begin()
         try:
             # 1. הכנות
             self.connect_db()
+            self.metrics.attach(self.conn)
             self.setup_output_directory()
+            with self.metrics.stage("scan_fingerprints"):
+                self.build_state = BuildState(self.output_dir, ContentFingerprints.scan(self.conn), self.incremental,
+                                              layout=self.serializer.profile)
+            with self.metrics.stage("load_stats"):
+                self.torah_stats = load_stats(self.conn, self.build_state, "structured/torah_stats.json")
+            if not self.streaming:
+                self.compression = CompressionStage(self.compress_workers)
             
             # 2. ייצוא גולמי של כל הטבלאות
             all_tables = self.export_all_tables_raw()
@@ -353,16 +536,29 @@ class CompleteTorahJSONExporter:
             # 3. ייצוא מובנה עם קשרים
             structured_data = self.create_structured_export()
             
+            if self.streaming:
+                # הנתונים כבר נכתבו בזרימה - השלבים הבאים קוראים מחדש במקום להחזיק הכל בזיכרון
+                all_tables = structured_data = None
+            
             # 4. קבצים נפרדים לכל ספר
             self.create_separate_books(structured_data)
             
-            # 5. קובץ אחד עם הכל
+            # 5. קובץ אחד עם הכל - הסטטיסטיקות נכנסות לקובץ, אז קודם כל הקבצים הדחוסים שבתור
+            # (הניקוז בשלב עליון משלו - לא בתוך create_complete_single_file)
+            self.wait_for_compression()
             self.create_complete_single_file(all_tables, structured_data)
             
             # 6. מניפסט הסבר
+            self.wait_for_compression()
             manifest = self.create_export_manifest()
+            self.build_state.save()
             
             print(f"\n🎉 ייצוא הושלם בהצלחה!")
+            if self.compression is not None:
+                # הדחיסה חופפת לשלבים - הזמן שלה נרשם כשלב רקע, וההמתנה לה כ-compress_wait
+                self.metrics.record_background("compress", self.compression.encode_seconds,
+                                               self.compression.encode_cpu_seconds)
+            self.metrics.finish(ok=True)
             return True
             
         except Exception as e:
@@ -371,16 +567,55 @@ class CompleteTorahJSONExporter:
             traceback.print_exc()
             return False
         finally:
+            if self.compression:
+                self.compression.close()
             if self.conn:
                 self.conn.close()
+            self.metrics.save(self.output_dir)
+
+def build_structured_book_json(corpus, book_id, torah_stats):
+    """בניית ספר מובנה אחד וסריאליזציה קומפקטית שלו (רץ בתהליך עובד)"""
+    exporter = CompleteTorahJSONExporter()
+    exporter.torah_stats = torah_stats
+    book_data = exporter.build_structured_book(corpus, corpus.book_by_id[book_id])
+    return dumps(book_data).decode('utf-8')
+
+def build_separate_book_json(corpus, book_id, exported_at, torah_stats):
+    """בניית הקובץ הנפרד של ספר וסריאליזציה קומפקטית שלו (רץ בתהליך עובד)"""
+    exporter = CompleteTorahJSONExporter()
+    exporter.export_stats["exported_at"] = exported_at
+    exporter.torah_stats = torah_stats
+    book = exporter.build_structured_book(corpus, corpus.book_by_id[book_id])
+    book_file_data = exporter.build_book_file_data(book)
+    
+    book_name = book["book_info"]["SeferName"]
+    filename = f"books_separate/book_{book_id}_{book_name}.json.gz"
+    return filename, json_text(book_file_data, pretty=False).encode('utf-8')
 
 def main():
     print("📚 ייצוא מלא של נתוני התורה ל-JSON")
     print("יוצר גיבוי מושלם של כל המידע במבנה מאורגן")
     print("=" * 60)
     
-    exporter = CompleteTorahJSONExporter()
+    parser = argparse.ArgumentParser(description="ייצוא מלא של נתוני התורה ל-JSON")
+    parser.add_argument("--stream", action="store_true", help="כתיבה בזרימה - זיכרון חסום לספר אחד")
+    parser.add_argument("--workers", type=int, default=1, help="מספר תהליכים לבניית ספרים במקביל")
+    parser.add_argument("--incremental", action="store_true", help="בנייה רק של תוצרים שהקלטים שלהם השתנו")
+    parser.add_argument("--profile", action="store_true", help="הדפסת טבלת זמנים ומדדים לכל שלב")
+    parser.add_argument("--compress-workers", type=int, default=None,
+                        help="מספר חוטי הדחיסה (ברירת מחדל: כל הליבות)")
+    parser.add_argument("--json-profile", choices=PROFILES, default="pretty",
+                        help="pretty - קבצים מוזחים לפיתוח, compact - בלי רווחים לייצור (קבצי gz תמיד קומפקטיים)")
+    parser.add_argument("--json-backend", choices=("auto",) + BACKENDS, default="auto",
+                        help="מנוע הקידוד של JSON (הפלט זהה בכל מנוע)")
+    args = parser.parse_args()
+    print(f"⚙️ מנוע JSON: {use_backend(args.json_backend)}")
+    
+    exporter = CompleteTorahJSONExporter(streaming=args.stream, workers=args.workers, incremental=args.incremental,
+                                         compress_workers=args.compress_workers, json_profile=args.json_profile)
     success = exporter.export_all()
+    if args.profile:
+        exporter.metrics.print_profile()
     
     if success:
         print(f"\n🎯 הייצוא הושלם בהצלחה!")
@@ -6,17 +6,38 @@
 """
 
 import sqlite3
-import json
 import os
+import argparse
 from datetime import datetime
 from collections import defaultdict
 
+from torah_columnar import write_table
+from torah_corpus import TorahCorpus
+from torah_json_stream import Deferred, RawJSON, write_json_stream
+from torah_incremental import CORE_TABLES, BuildState, ContentFingerprints
+from torah_metrics import BuildMetrics, measured
+from torah_parallel import list_book_ids, map_books
+from torah_serializer import BACKENDS, PROFILES, JSONSerializer, dumps, use_backend
+from torah_sqlite_replica import build_replica
+from torah_stats import load_stats
+from torah_strings import INTERNED_COLUMNS, STRINGS_KEY, StringTables
+
 class FullTorahJSONExporter:
-    def __init__(self, db_path="torah.db", output_dir="torah_full_export"):
+    def __init__(self, db_path="torah.db", output_dir="torah_full_export", streaming=False, workers=1,
+                 incremental=False, string_tables=False, json_profile="pretty"):
         self.db_path = db_path
         self.output_dir = output_dir
+        self.streaming = streaming  # כתיבה בזרימה - זיכרון חסום לספר אחד
+        self.workers = workers      # מספר תהליכים לבניית ספרים במקביל
+        self.incremental = incremental  # בנייה רק של תוצרים שהקלטים שלהם השתנו
+        self.string_tables = string_tables  # ערכים שחוזרים (שם ספר, כותרת, מפרש) נשמרים פעם אחת
+        self.serializer = JSONSerializer(json_profile)  # pretty (פיתוח) או compact (ייצור)
         self.conn = None
+        self.corpus = None
+        self.build_state = None
+        self.torah_stats = None  # ספירות מוכנות לכל ספר/פרק/פסוק (torah_stats)
         self.stats = {}
+        self.metrics = BuildMetrics("FullTorahJSONExporter")  # זמן/שאילתות/שורות/בתים/זיכרון לכל שלב
         
     def connect_db(self):
         """התחברות לבסיס הנתונים"""
@@ -29,13 +50,21 @@ class FullTorahJSONExporter:
         print(f"✅ מחובר ל-{self.db_path}")
         return True
     
+    def load_corpus(self):
+        """טעינת כל הטבלאות לזיכרון פעם אחת לכל ההרצה"""
+        if self.corpus is None:
+            self.corpus = TorahCorpus.load(self.conn)
+        return self.corpus
+    
     def setup_directories(self):
         """יצירת תיקיות הפלט"""
         directories = [
             self.output_dir,
             f"{self.output_dir}/complete",     # הכל במקום אחד
             f"{self.output_dir}/separated",    # כל טבלה בנפרד
-            f"{self.output_dir}/structured"    # מבנה היררכי
+            f"{self.output_dir}/structured",   # מבנה היררכי
+            f"{self.output_dir}/columnar",     # בינארי עמודתי לשירותי backend
+            f"{self.output_dir}/sqlite"        # עותק SQLite לקריאה בלבד
         ]
         
         for directory in directories:
@@ -46,27 +75,84 @@ class FullTorahJSONExporter:
         """שמירת JSON עם אופציה לפורמט יפה או קומפקטי"""
         full_path = f"{self.output_dir}/{filepath}"
         
-        if pretty:
-            with open(full_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+        if self.streaming or self.workers > 1:
+            write_json_stream(data, full_path, pretty=self.serializer.indented(pretty))
         else:
-            with open(full_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            self.serializer.write(data, full_path, pretty)
         
         # חישוב גודל
         size = os.path.getsize(full_path)
         print(f"  💾 {filepath}: {size:,} בתים ({size/1024:.1f} KB)")
         return size
     
+    def skip_unchanged(self, artifact, fingerprint, stats_key):
+        """במצב מצטבר - דילוג על תוצר שהקלטים שלו לא השתנו (הסטטיסטיקות מהריצה הקודמת)"""
+        if not self.build_state.is_fresh(artifact, fingerprint):
+            return False
+        self.stats[stats_key] = self.build_state.info(artifact)
+        print(f"  ⏭️ {artifact}: ללא שינוי")
+        return True
+    
+    def iter_query_rows(self, query):
+        """הפקת שורות שאילתה אחת-אחת (למצב זרימה)"""
+        cursor = self.conn.cursor()
+        cursor.execute(query)
+        for row in cursor:
+            yield dict(row)
+    
+    def count_query_rows(self, query):
+        """ספירת שורות שאילתה בלי לטעון אותן"""
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM ({query})")
+        return cursor.fetchone()[0]
+    
+    def interned(self, tables, rows):
+        """השורות עם הפניות לטבלאות המחרוזות (גנרטור במצב זרימה, רשימה אחרת)"""
+        rows = tables.intern_rows(rows)
+        return rows if self.streaming else list(rows)
+    
+    def strings_of(self, tables):
+        """הטבלאות עצמן - במצב זרימה נכתבות אחרי השורות שמילאו אותן"""
+        return Deferred(tables.to_dict) if self.streaming else tables.to_dict()
+    
+    def encoded_fingerprint(self, fingerprint):
+        """טביעת אצבע של תוצר שהקידוד שלו תלוי במצב טבלאות המחרוזות"""
+        if not self.string_tables:
+            return fingerprint
+        return ContentFingerprints.combine(fingerprint, "string_tables")
+    
+    def table_data(self, table_name, rows):
+        """{"data": ...} של טבלה גולמית, ובמצב טבלאות מחרוזות גם "strings" לעמודות שחוזרות"""
+        columns = INTERNED_COLUMNS.get(table_name) if self.string_tables else None
+        if not columns:
+            return {"data": rows}
+        tables = StringTables(*columns)
+        return {"data": self.interned(tables, rows), STRINGS_KEY: self.strings_of(tables)}
+    
+    @measured
     def export_raw_tables(self):
         """ייצוא גולמי של כל הטבלאות"""
         print("\n📊 מייצא טבלאות גולמיות...")
         
+        fingerprints = self.build_state.fingerprints
+        separated_fresh = {
+            table_name: self.build_state.is_fresh(f"separated/{table_name}.json", self.encoded_fingerprint(fingerprint))
+            for table_name, fingerprint in fingerprints.tables.items()
+        }
+        raw_fingerprint = self.encoded_fingerprint(fingerprints.of_all())
+        if all(separated_fresh.values()) and \
+                self.skip_unchanged("complete/all_tables_raw.json", raw_fingerprint, "raw_export"):
+            return None
+        
         cursor = self.conn.cursor()
         
         # קבלת רשימת טבלאות
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
-        tables = [row[0] for row in cursor.fetchall()]
+        if self.streaming:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+            tables = [row[0] for row in cursor.fetchall()]
+        else:
+            corpus = self.load_corpus()
+            tables = list(corpus.tables)
         
         raw_export = {
             "export_info": {
@@ -82,32 +168,42 @@ class FullTorahJSONExporter:
         for table_name in tables:
             print(f"  📋 מייצא טבלה: {table_name}")
             
-            # קבלת כל הנתונים
-            cursor.execute(f"SELECT * FROM {table_name}")
-            rows = [dict(row) for row in cursor.fetchall()]
-            
-            # מידע על הטבלה
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns_info = [dict(row) for row in cursor.fetchall()]
+            # קבלת כל הנתונים ומידע על הטבלה
+            if self.streaming:
+                query = f"SELECT * FROM {table_name}"
+                rows = self.iter_query_rows(query)
+                record_count = self.count_query_rows(query)
+                cursor.execute(f"PRAGMA table_info({table_name})")
+                columns_info = [dict(row) for row in cursor.fetchall()]
+            else:
+                table = corpus.tables[table_name]
+                rows = list(table.iter_dicts())
+                record_count = len(rows)
+                columns_info = table.columns
             
             raw_export["tables"][table_name] = {
                 "columns": columns_info,
-                "record_count": len(rows),
-                "data": rows
+                "record_count": record_count,
+                **self.table_data(table_name, self.iter_query_rows(query) if self.streaming else rows)
             }
             
-            total_records += len(rows)
-            print(f"    ✅ {len(rows):,} רשומות")
+            total_records += record_count
+            print(f"    ✅ {record_count:,} רשומות")
             
-            # שמירה נפרדת של כל טבלה
+            # שמירה נפרדת של כל טבלה (רק אם השתנתה)
+            if separated_fresh.get(table_name):
+                print(f"  ⏭️ separated/{table_name}.json: ללא שינוי")
+                continue
             table_data = {
                 "table_name": table_name,
                 "columns": columns_info,
-                "record_count": len(rows),
+                "record_count": record_count,
                 "exported": datetime.now().isoformat(),
-                "data": rows
+                **self.table_data(table_name, rows)
             }
             self.save_json(table_data, f"separated/{table_name}.json")
+            self.build_state.record(f"separated/{table_name}.json",
+                                    self.encoded_fingerprint(fingerprints.tables.get(table_name)))
         
         raw_export["export_info"]["total_records"] = total_records
         self.stats["raw_export"] = {"tables": len(tables), "records": total_records}
@@ -115,15 +211,67 @@ class FullTorahJSONExporter:
         # שמירת הייצוא המלא
         size = self.save_json(raw_export, "complete/all_tables_raw.json")
         self.stats["raw_export"]["size"] = size
+        self.build_state.record("complete/all_tables_raw.json", raw_fingerprint, self.stats["raw_export"])
         
         print(f"  🎉 סיכום: {len(tables)} טבלאות, {total_records:,} רשומות")
         return raw_export
     
+    @measured
+    def export_columnar_tables(self):
+        """ייצוא בינארי עמודתי - קובץ .tcol לכל טבלה (נקרא דרך torah_columnar.ColumnarTable)"""
+        print("\n🧱 מייצא טבלאות בפורמט עמודתי...")
+        
+        fingerprints = self.build_state.fingerprints
+        total_size = 0
+        
+        for table_name, fingerprint in fingerprints.tables.items():
+            filepath = f"columnar/{table_name}.tcol"
+            
+            if self.build_state.is_fresh(filepath, fingerprint):
+                size = self.build_state.info(filepath)
+                print(f"  ⏭️ {filepath}: ללא שינוי")
+            else:
+                # במצב זרימה נטענת טבלה אחת בכל פעם
+                if self.streaming:
+                    table = TorahCorpus.read_table(self.conn.cursor(), table_name, f"SELECT * FROM {table_name}")
+                else:
+                    table = self.load_corpus().tables[table_name]
+                
+                size = write_table(f"{self.output_dir}/{filepath}", table)
+                self.build_state.record(filepath, fingerprint, size)
+                print(f"  💾 {filepath}: {size:,} בתים ({size/1024:.1f} KB)")
+            
+            total_size += size
+        
+        self.stats["columnar"] = {"tables": len(fingerprints.tables), "size": total_size}
+        print(f"  🎉 {len(fingerprints.tables)} טבלאות עמודתיות, {total_size:,} בתים")
+    
+    @measured
+    def export_sqlite_replica(self):
+        """עותק SQLite לקריאה בלבד - אינדקסים, FTS5 וטבלאות ספירה (נפתח דרך torah_sqlite_replica.open_replica)"""
+        print("\n🗄️ בונה עותק SQLite לאתר...")
+        
+        filepath = "sqlite/torah_replica.db"
+        fingerprint = self.build_state.fingerprints.of_all()
+        if self.skip_unchanged(filepath, fingerprint, "sqlite_replica"):
+            return None
+        
+        size = build_replica(self.db_path, f"{self.output_dir}/{filepath}", source_fingerprint=fingerprint)
+        self.stats["sqlite_replica"] = {"size": size}
+        self.build_state.record(filepath, fingerprint, self.stats["sqlite_replica"])
+        print(f"  💾 {filepath}: {size:,} בתים ({size/1024:.1f} KB)")
+        return filepath
+    
+    @measured
     def export_structured_torah(self):
         """ייצוא מובנה של התורה - ספרים->פרקים->פסוקים->שאלות"""
         print("\n📚 מייצא מבנה תורה מובנה...")
         
-        cursor = self.conn.cursor()
+        fingerprint = self.build_state.fingerprints.of_tables(*CORE_TABLES)
+        if self.skip_unchanged("structured/complete_torah_structured.json", fingerprint, "structured"):
+            return None
+        
+        books = self.iter_structured_books()
         
         structured_torah = {
             "export_info": {
@@ -131,145 +279,160 @@ class FullTorahJSONExporter:
                 "type": "structured_torah",
                 "description": "התורה במבנה היררכי מלא"
             },
-            "books": []
+            # במצב זרימה ובמצב מקבילי הספרים נכתבים לקובץ אחד-אחד
+            "books": books if self.streaming or self.workers > 1 else list(books)
         }
         
-        # קבלת כל הספרים
-        cursor.execute("SELECT * FROM tbl_Sefer ORDER BY ID")
-        books = cursor.fetchall()
+        # הוספת סטטיסטיקות (מחושבות מראש - לא תלויות בבניית הספרים)
+        totals = self.torah_stats.totals
+        structured_torah["statistics"] = {
+            "total_books": totals["books"],
+            "total_chapters": totals["chapters"],
+            "total_verses": totals["verses"],
+            "total_questions": totals["questions"]
+        }
+        
+        # שמירה
+        size = self.save_json(structured_torah, "structured/complete_torah_structured.json")
+        self.stats["structured"] = {
+            "books": totals["books"],
+            "chapters": totals["chapters"],
+            "verses": totals["verses"],
+            "questions": totals["questions"],
+            "size": size
+        }
+        self.build_state.record("structured/complete_torah_structured.json", fingerprint, self.stats["structured"])
         
-        total_chapters = 0
-        total_verses = 0
-        total_questions = 0
+        print(f"  🎊 סיכום מבנה: {totals['books']} ספרים, {totals['chapters']} פרקים, {totals['verses']:,} פסוקים, {totals['questions']:,} שאלות")
+        return structured_torah
+    
+    def iter_structured_books(self):
+        """בניית הספרים המובנים אחד-אחד"""
+        if self.workers > 1:
+            # כל ספר נבנה ועובר סריאליזציה בתהליך נפרד, התוצאות מגיעות לפי הסדר
+            book_ids = list_book_ids(self.conn)
+            for fragment in map_books(self.db_path, book_ids, build_structured_book_json, self.workers,
+                                      self.serializer.indent()):
+                yield RawJSON(fragment)
+            return
+        
+        # במצב זרימה כל ספר נטען בנפרד, אחרת כל הנתונים נטענים פעם אחת
+        if self.streaming:
+            corpus = None
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT * FROM tbl_Sefer ORDER BY ID")
+            books = cursor.fetchall()
+        else:
+            corpus = self.load_corpus()
+            books = corpus.books
         
         for book in books:
-            book_id = book["ID"]
-            book_name = book["SeferName"]
-            
-            print(f"  📖 מעבד ספר: {book_name}")
-            
-            book_data = {
-                "book_info": dict(book),
-                "chapters": []
+            book_corpus = corpus or TorahCorpus.load(self.conn, book["ID"])
+            yield self.build_structured_book(book_corpus, book)
+    
+    def build_structured_book(self, corpus, book):
+        """בניית ספר מובנה אחד - ספר->פרקים->פסוקים->שאלות"""
+        book_id = book["ID"]
+        book_name = book["SeferName"]
+        
+        print(f"  📖 מעבד ספר: {book_name}")
+        
+        book_data = {
+            "book_info": dict(book),
+            "chapters": []
+        }
+        
+        # קבלת כל הפרקים
+        chapters = corpus.chapters(book_id)
+        
+        for chapter_num in chapters:
+            chapter_data = {
+                "chapter_number": chapter_num,
+                "verses": []
             }
             
-            # קבלת כל הפרקים
-            cursor.execute("SELECT DISTINCT Perek FROM tbl_Torah WHERE Sefer = ? ORDER BY Perek", (book_id,))
-            chapters = [row[0] for row in cursor.fetchall()]
+            # קבלת כל הפסוקים בפרק
+            verses = corpus.verses(book_id, chapter_num)
             
-            for chapter_num in chapters:
-                chapter_data = {
-                    "chapter_number": chapter_num,
-                    "verses": []
-                }
+            for verse in verses:
+                torah_id = verse["ID"]
+                verse_num = verse["PasukNum"]
+                verse_text = verse["Pasuk"]
                 
-                # קבלת כל הפסוקים בפרק
-                cursor.execute("""
-                    SELECT ID, PasukNum, Pasuk 
-                    FROM tbl_Torah 
-                    WHERE Sefer = ? AND Perek = ? 
-                    ORDER BY PasukNum
-                """, (book_id, chapter_num))
+                # קבלת כותרות לפסוק
+                titles = corpus.titles(torah_id)
                 
-                verses = cursor.fetchall()
+                # קבלת שאלות לכל כותרת
+                verse_content = {
+                    "verse_number": verse_num,
+                    "text": verse_text,
+                    "torah_id": torah_id,
+                    "titles_and_questions": []
+                }
                 
-                for verse in verses:
-                    torah_id = verse["ID"]
-                    verse_num = verse["PasukNum"]
-                    verse_text = verse["Pasuk"]
-                    
-                    # קבלת כותרות לפסוק
-                    cursor.execute("SELECT * FROM tbl_Title WHERE TorahID = ?", (torah_id,))
-                    titles = cursor.fetchall()
-                    
-                    # קבלת שאלות לכל כותרת
-                    verse_content = {
-                        "verse_number": verse_num,
-                        "text": verse_text,
-                        "torah_id": torah_id,
-                        "titles_and_questions": []
-                    }
-                    
-                    verse_question_count = 0
-                    
-                    for title in titles:
-                        title_id = title["ID"]
-                        title_text = title["Title"]
-                        
-                        # קבלת שאלות לכותרת
-                        cursor.execute("SELECT * FROM tbl_Question WHERE TitleID = ?", (title_id,))
-                        questions = cursor.fetchall()
-                        
-                        if questions:  # רק אם יש שאלות
-                            title_content = {
-                                "title_info": dict(title),
-                                "questions": [dict(q) for q in questions]
-                            }
-                            verse_content["titles_and_questions"].append(title_content)
-                            verse_question_count += len(questions)
+                verse_question_count = 0
+                
+                for title in titles:
+                    title_id = title["ID"]
                     
-                    verse_content["total_questions"] = verse_question_count
-                    chapter_data["verses"].append(verse_content)
+                    # קבלת שאלות לכותרת
+                    questions = corpus.questions(title_id)
                     
-                    total_verses += 1
-                    total_questions += verse_question_count
-                
-                book_data["chapters"].append(chapter_data)
-                total_chapters += 1
+                    if questions:  # רק אם יש שאלות
+                        title_content = {
+                            "title_info": dict(title),
+                            "questions": [dict(q) for q in questions]
+                        }
+                        verse_content["titles_and_questions"].append(title_content)
+                        verse_question_count += len(questions)
                 
-                print(f"    ✅ פרק {chapter_num}: {len(verses)} פסוקים")
+                verse_content["total_questions"] = verse_question_count
+                chapter_data["verses"].append(verse_content)
             
-            structured_torah["books"].append(book_data)
-            print(f"    🎉 {book_name}: {len(chapters)} פרקים הושלמו")
-        
-        # הוספת סטטיסטיקות
-        structured_torah["statistics"] = {
-            "total_books": len(books),
-            "total_chapters": total_chapters,
-            "total_verses": total_verses,
-            "total_questions": total_questions
-        }
-        
-        self.stats["structured"] = {
-            "books": len(books),
-            "chapters": total_chapters,
-            "verses": total_verses,
-            "questions": total_questions
-        }
+            book_data["chapters"].append(chapter_data)
+            
+            print(f"    ✅ פרק {chapter_num}: {len(verses)} פסוקים")
         
-        # שמירה
-        size = self.save_json(structured_torah, "structured/complete_torah_structured.json")
-        self.stats["structured"]["size"] = size
+        print(f"    🎉 {book_name}: {len(chapters)} פרקים הושלמו")
         
-        print(f"  🎊 סיכום מבנה: {len(books)} ספרים, {total_chapters} פרקים, {total_verses:,} פסוקים, {total_questions:,} שאלות")
-        return structured_torah
+        return book_data
     
+    @measured
     def export_parshiot_complete(self):
         """ייצוא מלא של פרשות השבוע"""
         print("\n📜 מייצא פרשות השבוע...")
         
-        cursor = self.conn.cursor()
-        
-        # מטבלה tbl_Parsha
-        cursor.execute("""
-            SELECT p.*, s.SeferName 
-            FROM tbl_Parsha p
-            JOIN tbl_Sefer s ON p.SeferID = s.ID
-            ORDER BY p.ID
-        """)
-        parshiot_main = [dict(row) for row in cursor.fetchall()]
+        fingerprint = self.build_state.fingerprints.of_tables("tbl_Parsha", "Parshiot", "tbl_Sefer")
+        if self.skip_unchanged("complete/parshiot_complete.json", fingerprint, "parshiot"):
+            return None
         
-        # מטבלה Parshiot (אם שונה)
-        try:
+        if self.streaming:
+            cursor = self.conn.cursor()
+            
+            # מטבלה tbl_Parsha
             cursor.execute("""
-                SELECT par.*, s.SeferName 
-                FROM Parshiot par
-                JOIN tbl_Sefer s ON par.SeferID = s.ID
-                ORDER BY par.ID
+                SELECT p.*, s.SeferName 
+                FROM tbl_Parsha p
+                JOIN tbl_Sefer s ON p.SeferID = s.ID
+                ORDER BY p.ID
             """)
-            parshiot_alt = [dict(row) for row in cursor.fetchall()]
-        except sqlite3.OperationalError:
-            parshiot_alt = []
+            parshiot_main = [dict(row) for row in cursor.fetchall()]
+            
+            # מטבלה Parshiot (אם שונה)
+            try:
+                cursor.execute("""
+                    SELECT par.*, s.SeferName 
+                    FROM Parshiot par
+                    JOIN tbl_Sefer s ON par.SeferID = s.ID
+                    ORDER BY par.ID
+                """)
+                parshiot_alt = [dict(row) for row in cursor.fetchall()]
+            except sqlite3.OperationalError:
+                parshiot_alt = []
+        else:
+            corpus = self.load_corpus()
+            parshiot_main = corpus.parshiot_with_book_names("tbl_Parsha")
+            parshiot_alt = corpus.parshiot_with_book_names("Parshiot")
         
         parshiot_export = {
             "export_info": {
@@ -286,51 +449,98 @@ class FullTorahJSONExporter:
         
         size = self.save_json(parshiot_export, "complete/parshiot_complete.json")
         self.stats["parshiot"] = {"count": len(parshiot_main), "size": size}
+        self.build_state.record("complete/parshiot_complete.json", fingerprint, self.stats["parshiot"])
         
         print(f"  ✅ {len(parshiot_main)} פרשות עיקריות, {len(parshiot_alt)} נוספות")
         return parshiot_export
     
+    @measured
     def export_search_optimized(self):
         """ייצוא מותאם לחיפוש"""
         print("\n🔍 מייצא נתונים מותאמים לחיפוש...")
         
-        cursor = self.conn.cursor()
+        fingerprint = self.encoded_fingerprint(self.build_state.fingerprints.of_tables(*CORE_TABLES))
+        if self.skip_unchanged("complete/search_optimized.json", fingerprint, "search"):
+            return None
+        
+        if self.streaming:
+            # אינדקס פסוקים לחיפוש
+            verses_query = """
+                SELECT 
+                    tor.ID as torah_id,
+                    tor.Sefer as book_id,
+                    s.SeferName as book_name,
+                    tor.Perek as chapter,
+                    tor.PasukNum as verse,
+                    tor.Pasuk as text
+                FROM tbl_Torah tor
+                JOIN tbl_Sefer s ON tor.Sefer = s.ID
+                ORDER BY tor.Sefer, tor.Perek, tor.PasukNum
+            """
+            
+            # אינדקס שאלות לחיפוש
+            questions_query = """
+                SELECT 
+                    q.ID as question_id,
+                    q.Question as question_text,
+                    t.Title as title,
+                    t.TorahID as torah_id,
+                    tor.Sefer as book_id,
+                    s.SeferName as book_name,
+                    tor.Perek as chapter,
+                    tor.PasukNum as verse
+                FROM tbl_Question q
+                JOIN tbl_Title t ON q.TitleID = t.ID
+                JOIN tbl_Torah tor ON t.TorahID = tor.ID
+                JOIN tbl_Sefer s ON tor.Sefer = s.ID
+                ORDER BY s.ID, tor.Perek, tor.PasukNum
+            """
+            
+            verses_search = self.iter_query_rows(verses_query)
+            questions_search = self.iter_query_rows(questions_query)
+            verses_count = self.count_query_rows(verses_query)
+            questions_count = self.count_query_rows(questions_query)
+        else:
+            corpus = self.load_corpus()
+            verses_search = []
+            questions_search = []
+            
+            for verse in corpus.iter_verses():
+                book_name = corpus.book_name(verse["Sefer"])
+                if book_name is None:
+                    continue
+                
+                # אינדקס פסוקים לחיפוש
+                verses_search.append({
+                    "torah_id": verse["ID"],
+                    "book_id": verse["Sefer"],
+                    "book_name": book_name,
+                    "chapter": verse["Perek"],
+                    "verse": verse["PasukNum"],
+                    "text": verse["Pasuk"]
+                })
+                
+                # אינדקס שאלות לחיפוש
+                for title, question in corpus.verse_questions(verse["ID"]):
+                    questions_search.append({
+                        "question_id": question["ID"],
+                        "question_text": question["Question"],
+                        "title": title["Title"],
+                        "torah_id": verse["ID"],
+                        "book_id": verse["Sefer"],
+                        "book_name": book_name,
+                        "chapter": verse["Perek"],
+                        "verse": verse["PasukNum"]
+                    })
+            
+            verses_count = len(verses_search)
+            questions_count = len(questions_search)
         
-        # אינדקס פסוקים לחיפוש
-        cursor.execute("""
-            SELECT 
-                tor.ID as torah_id,
-                tor.Sefer as book_id,
-                s.SeferName as book_name,
-                tor.Perek as chapter,
-                tor.PasukNum as verse,
-                tor.Pasuk as text
-            FROM tbl_Torah tor
-            JOIN tbl_Sefer s ON tor.Sefer = s.ID
-            ORDER BY tor.Sefer, tor.Perek, tor.PasukNum
-        """)
-        
-        verses_search = [dict(row) for row in cursor.fetchall()]
-        
-        # אינדקס שאלות לחיפוש
-        cursor.execute("""
-            SELECT 
-                q.ID as question_id,
-                q.Question as question_text,
-                t.Title as title,
-                t.TorahID as torah_id,
-                tor.Sefer as book_id,
-                s.SeferName as book_name,
-                tor.Perek as chapter,
-                tor.PasukNum as verse
-            FROM tbl_Question q
-            JOIN tbl_Title t ON q.TitleID = t.ID
-            JOIN tbl_Torah tor ON t.TorahID = tor.ID
-            JOIN tbl_Sefer s ON tor.Sefer = s.ID
-            ORDER BY s.ID, tor.Perek, tor.PasukNum
-        """)
-        
-        questions_search = [dict(row) for row in cursor.fetchall()]
+        if self.string_tables:
+            # שם הספר חוזר בכל שורה, והכותרת (טקסט הפסוק) בכל שאלה שלה
+            tables = StringTables("book_name", "title")
+            verses_search = self.interned(tables, verses_search)
+            questions_search = self.interned(tables, questions_search)
         
         search_export = {
             "export_info": {
@@ -341,34 +551,46 @@ class FullTorahJSONExporter:
             "verses_index": verses_search,
             "questions_index": questions_search,
             "statistics": {
-                "total_verses": len(verses_search),
-                "total_questions": len(questions_search)
+                "total_verses": verses_count,
+                "total_questions": questions_count
             }
         }
+        if self.string_tables:
+            search_export["export_info"]["encoding"] = "string_tables"
+            search_export[STRINGS_KEY] = self.strings_of(tables)
         
         size = self.save_json(search_export, "complete/search_optimized.json")
-        self.stats["search"] = {"verses": len(verses_search), "questions": len(questions_search), "size": size}
+        self.stats["search"] = {"verses": verses_count, "questions": questions_count, "size": size}
+        self.build_state.record("complete/search_optimized.json", fingerprint, self.stats["search"])
         
-        print(f"  ✅ {len(verses_search):,} פסוקים, {len(questions_search):,} שאלות לחיפוש")
+        print(f"  ✅ {verses_count:,} פסוקים, {questions_count:,} שאלות לחיפוש")
         return search_export
     
+    @measured
     def create_export_summary(self):
         """יצירת סיכום הייצוא"""
         print("\n📋 יוצר סיכום הייצוא...")
         
+        # הסיכום תלוי בכל הנתונים (דרך הסטטיסטיקות)
+        fingerprint = self.build_state.fingerprints.of_all()
+        if self.skip_unchanged("export_summary.json", fingerprint, "summary_size"):
+            return None
+        
         summary = {
             "export_summary": {
                 "created": datetime.now().isoformat(),
                 "source_database": self.db_path,
                 "export_directory": self.output_dir,
                 "export_types": [
-                    "raw_tables", "structured_torah", "parshiot", "search_optimized"
+                    "raw_tables", "columnar_tables", "sqlite_replica", "structured_torah", "parshiot",
+                    "search_optimized"
                 ]
             },
             "statistics": self.stats,
             "files_created": {
                 "complete_exports": [
                     "complete/all_tables_raw.json",
+                    "complete/torah_stats.json",
                     "complete/parshiot_complete.json", 
                     "complete/search_optimized.json"
                 ],
@@ -382,18 +604,27 @@ class FullTorahJSONExporter:
                     "separated/tbl_Title.json",
                     "separated/tbl_Parsha.json",
                     "separated/Parshiot.json"
+                ],
+                "columnar_tables": [
+                    f"columnar/{table_name}.tcol" for table_name in self.build_state.fingerprints.tables
+                ],
+                "sqlite_replica": [
+                    "sqlite/torah_replica.db"
                 ]
             },
             "usage_recommendations": {
                 "backup": "השתמש ב-complete/all_tables_raw.json לגיבוי מלא",
                 "development": "השתמש ב-structured/complete_torah_structured.json לפיתוח אתר",
                 "search": "השתמש ב-complete/search_optimized.json לחיפוש מהיר",
-                "analysis": "השתמש בקבצים ב-separated/ לניתוח נתונים"
+                "analysis": "השתמש בקבצים ב-separated/ לניתוח נתונים",
+                "backend": "השתמש ב-columnar/ דרך torah_columnar.ColumnarTable - פתיחה מיידית בלי json.load",
+                "sqlite": "השתמש ב-sqlite/torah_replica.db דרך sql.js או open_replica (immutable=1)"
             }
         }
         
         size = self.save_json(summary, "export_summary.json")
         self.stats["summary_size"] = size
+        self.build_state.record("export_summary.json", fingerprint, size)
         
         return summary
     
@@ -402,30 +633,45 @@ class FullTorahJSONExporter:
         print("📦 מתחיל ייצוא מלא של כל נתוני התורה ל-JSON")
         print("=" * 60)
         
+        self.metrics.begin()
         try:
             # 1. התחברות
             if not self.connect_db():
                 return False
+            self.metrics.attach(self.conn)
             
             # 2. הכנת תיקיות
             self.setup_directories()
+            with self.metrics.stage("scan_fingerprints"):
+                self.build_state = BuildState(self.output_dir, ContentFingerprints.scan(self.conn), self.incremental,
+                                              layout=self.serializer.profile)
+            with self.metrics.stage("load_stats"):
+                self.torah_stats = load_stats(self.conn, self.build_state, "complete/torah_stats.json")
             
             # 3. ייצוא גולמי של טבלאות
             self.export_raw_tables()
             
-            # 4. ייצוא מובנה של התורה
+            # 4. ייצוא בינארי עמודתי
+            self.export_columnar_tables()
+            
+            # 5. עותק SQLite לאתר
+            self.export_sqlite_replica()
+            
+            # 6. ייצוא מובנה של התורה
             self.export_structured_torah()
             
-            # 5. ייצוא פרשות
+            # 7. ייצוא פרשות
             self.export_parshiot_complete()
             
-            # 6. ייצוא לחיפוש
+            # 8. ייצוא לחיפוש
             self.export_search_optimized()
             
-            # 7. סיכום
+            # 9. סיכום
             self.create_export_summary()
+            self.build_state.save()
             
             print("\n🎉 הייצוא הושלם בהצלחה!")
+            self.metrics.finish(ok=True)
             return True
             
         except Exception as e:
@@ -436,14 +682,37 @@ class FullTorahJSONExporter:
         finally:
             if self.conn:
                 self.conn.close()
+            self.metrics.save(self.output_dir)
+
+def build_structured_book_json(corpus, book_id, indent):
+    """בניית ספר מובנה אחד וסריאליזציה שלו בהזחה של הפרופיל (רץ בתהליך עובד)"""
+    book_data = FullTorahJSONExporter().build_structured_book(corpus, corpus.book_by_id[book_id])
+    return dumps(book_data, indent).decode('utf-8')
 
 def main():
     print("📦 ייצוא מלא של נתוני התורה ל-JSON")
     print("יוצר backup מקיף וקבצים לפיתוח")
     print("=" * 60)
     
-    exporter = FullTorahJSONExporter()
+    parser = argparse.ArgumentParser(description="ייצוא מלא של נתוני התורה ל-JSON")
+    parser.add_argument("--stream", action="store_true", help="כתיבה בזרימה - זיכרון חסום לספר אחד")
+    parser.add_argument("--workers", type=int, default=1, help="מספר תהליכים לבניית ספרים במקביל")
+    parser.add_argument("--incremental", action="store_true", help="בנייה רק של תוצרים שהקלטים שלהם השתנו")
+    parser.add_argument("--profile", action="store_true", help="הדפסת טבלת זמנים ומדדים לכל שלב")
+    parser.add_argument("--string-tables", action="store_true",
+                        help="שם ספר, כותרת ומפרש נשמרים פעם אחת ב-\"strings\" (torah_strings.decode_strings מפענח)")
+    parser.add_argument("--json-profile", choices=PROFILES, default="pretty",
+                        help="pretty - קבצים מוזחים לפיתוח, compact - בלי רווחים לייצור")
+    parser.add_argument("--json-backend", choices=("auto",) + BACKENDS, default="auto",
+                        help="מנוע הקידוד של JSON (הפלט זהה בכל מנוע)")
+    args = parser.parse_args()
+    print(f"⚙️ מנוע JSON: {use_backend(args.json_backend)}")
+    
+    exporter = FullTorahJSONExporter(streaming=args.stream, workers=args.workers, incremental=args.incremental,
+                                     string_tables=args.string_tables, json_profile=args.json_profile)
     success = exporter.export_all()
+    if args.profile:
+        exporter.metrics.print_profile()
     
     if success:
         print("\n🎯 הייצוא הושלם!")
@@ -460,9 +729,9 @@ def main():
         print(f"  🔹 torah_full_export/complete/all_tables_raw.json - גיבוי מלא")
         print(f"  🔹 torah_full_export/structured/complete_torah_structured.json - מבנה לאתר")
         print(f"  🔹 torah_full_export/complete/search_optimized.json - לחיפוש")
+        print(f"  🔹 torah_full_export/columnar/ - טבלאות בינאריות לשירותי backend")
+        print(f"  🔹 torah_full_export/sqlite/torah_replica.db - SQLite מוטמע לאתר (sql.js / immutable=1)")
         print(f"  🔹 torah_full_export/export_summary.json - סיכום והנחיות")
-        
-        print(f"\n🚀 כעת תוכל להתחיל בשלב הבא - SQLite מוטמע!")
     else:
         print(f"\n❌ הייצוא נכשל. בדוק את השגיאות למעלה.")
 
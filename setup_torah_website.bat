@@ -253,7 +253,11 @@ start http://localhost:8000
 
 REM הפעלת השרת
 echo 🌐 מפעיל שרת...
-python -m http.server 8000
+if exist "torah_server.py" (
+    python torah_server.py --port 8000
+) else (
+    python -m http.server 8000
+)
 
 echo.
 echo 👋 השרת נסגר. להפעלה מחדש הרץ שוב את הסקריפט!
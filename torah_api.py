@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+שרת API אסינכרוני לשאילתות על נתוני התורה
+הקורפוס נטען לזיכרון פעם אחת (torah_corpus) ועונה על כל צורת שאילתה בלי ייצוא
+מיוחד: פסוק, טווח פסוקים, פרק, פרשה וחיפוש בשאלות/בפסוקים (torah_search_index).
+הפסוקים באותו מבנה כמו קבצי הפרקים של האופטימייזר (i, n, t, q, g), כך שאותו קוד
+בדפדפן קורא את שניהם.
+תשובות נשמרות במטמון LRU חסום בבתים - כבר מסודרות ודחוסות בכל קידוד, כך שבקשה
+חוזרת היא רק כתיבה לסוקט. בקשות זהות שמגיעות יחד בזמן שהתשובה עוד נבנית מחכות
+לאותה בנייה (request coalescing); הבנייה והדחיסה רצות בתהליכון, והלולאה ממשיכה
+לענות מהמטמון
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import time
+import zlib
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from torah_corpus import TorahCorpus
+from torah_data_optimizer import TorahDataOptimizer
+from torah_encodings import negotiate
+from torah_parallel import connect_read_only
+from torah_parsha import ParshaIndex
+from torah_search_index import SearchIndexBuilder, tokenize
+from torah_stats import TorahStats
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# גודל המטמון (כל הקידודים של כל התשובות)
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# תשובה קטנה מזה נשלחת בלי דחיסה
+MIN_COMPRESS_BYTES = 512
+
+# מספר התוצאות המקסימלי בעמוד חיפוש
+MAX_SEARCH_LIMIT = 500
+
+# ראש בקשה גדול מזה נדחה
+MAX_HEADER_BYTES = 16 * 1024
+
+CACHE_CONTROL = "public, max-age=60"
+
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _runtime_encoders():
+    """דחיסה בזמן ריצה - רמות מהירות (הקבצים הסטטיים נדחסים ברמה מקסימלית בבנייה)"""
+    encoders = {}
+    if brotli is not None:
+        encoders["br"] = lambda payload: brotli.compress(payload, mode=brotli.MODE_TEXT, quality=5)
+    if zstandard is not None:
+        # ZstdCompressor לא בטוח לשימוש מכמה תהליכונים - אחד לכל דחיסה
+        encoders["zstd"] = lambda payload: zstandard.ZstdCompressor(level=3).compress(payload)
+    encoders["gzip"] = lambda payload: _gzip(payload)
+    return encoders
+
+
+def _gzip(payload):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(payload) + compressor.flush()
+
+
+class CachedResponse:
+    """תשובה מוכנה: סטטוס, ETag וגוף בכל קידוד (מהקטן לגדול)"""
+
+    __slots__ = ("status", "etag", "bodies", "entry", "size")
+
+    def __init__(self, status, payload, encoders):
+        self.status = status
+        self.etag = '"%s"' % hashlib.sha256(payload).hexdigest()[:24]
+        self.bodies = {None: payload}
+        if len(payload) >= MIN_COMPRESS_BYTES:
+            for encoding, encoder in encoders.items():
+                self.bodies[encoding] = encoder(payload)
+        # רשומה בפורמט של encodings.json - לבחירת הקידוד עם torah_encodings.negotiate
+        compressed = sorted(((len(body), encoding) for encoding, body in self.bodies.items() if encoding))
+        self.entry = {"encodings": {encoding: size for size, encoding in compressed}}
+        self.size = sum(len(body) for body in self.bodies.values())
+
+    def body(self, accept_encoding):
+        encoding = negotiate(self.entry, accept_encoding)
+        if encoding is not None and len(self.bodies[encoding]) >= len(self.bodies[None]):
+            encoding = None
+        return encoding, self.bodies[encoding]
+
+
+class ResponseCache:
+    """LRU חסום בבתים"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        response = self.entries.get(key)
+        if response is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def peek(self, key):
+        """בלי ספירה ובלי עדכון הסדר (בדיקה חוזרת אחרי get)"""
+        return self.entries.get(key)
+
+    def put(self, key, response):
+        if response.size > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old.size
+        self.entries[key] = response
+        self.bytes += response.size
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= evicted.size
+
+
+class TorahQueryService:
+    """השאילתות עצמן - מהקורפוס ומהאינדקסים בזיכרון"""
+
+    def __init__(self, corpus, torah_stats):
+        self.corpus = corpus
+        self.torah_stats = torah_stats
+        # אותו מבנה פסוק/פרק/פרשה כמו בקבצים של האופטימייזר
+        self.formatter = TorahDataOptimizer()
+        self.formatter.corpus = corpus
+        self.parsha_index = ParshaIndex(corpus.parshiot)
+        self.search_index = SearchIndexBuilder.from_corpus(corpus)
+        self.routes = {
+            "books": self.books,
+            "verse": self.verse,
+            "range": self.verse_range,
+            "chapter": self.chapter,
+            "parsha": self.parsha,
+            "search": self.search,
+        }
+
+    @classmethod
+    def load(cls, db_path):
+        conn = connect_read_only(db_path)
+        try:
+            return cls(TorahCorpus.load(conn), TorahStats.compute(conn))
+        finally:
+            conn.close()
+
+    def handle(self, path, query):
+        """/api/<שם>/<פרמטרים...> -> אובייקט JSON"""
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+        if len(parts) < 2 or parts[0] != "api" or parts[1] not in self.routes:
+            raise APIError(404, "נתיב לא מוכר")
+        return self.routes[parts[1]](parts[2:], query)
+
+    @staticmethod
+    def _ints(values, count):
+        if len(values) != count:
+            raise APIError(400, f"נדרשים {count} פרמטרים")
+        try:
+            return [int(value) for value in values]
+        except ValueError:
+            raise APIError(400, "פרמטר לא מספרי")
+
+    def _book(self, book_id):
+        if book_id not in self.corpus.book_by_id:
+            raise APIError(404, f"ספר {book_id} לא נמצא")
+
+    def books(self, params, query):
+        """/api/books"""
+        return {"b": [
+            {"i": book_id, "n": counts["name"], "c": counts["chapters"], "v": counts["verses"],
+             "q": counts["questions"]}
+            for book_id, counts in self.torah_stats.books.items()
+        ]}
+
+    def verse(self, params, query):
+        """/api/verse/<ספר>/<פרק>/<פסוק>"""
+        book_id, chapter_num, verse_num = self._ints(params, 3)
+        self._book(book_id)
+        verse = self.corpus.verse(book_id, chapter_num, verse_num)
+        if verse is None:
+            raise APIError(404, f"פסוק {chapter_num}:{verse_num} לא נמצא")
+        return dict(b=book_id, c=chapter_num, **self.formatter.optimize_verse(verse))
+
+    def verse_range(self, params, query):
+        """/api/range/<ספר>/<פרק>:<פסוק>-<פרק>:<פסוק> (או <פרק>:<פסוק>-<פסוק> באותו פרק)"""
+        if len(params) != 2:
+            raise APIError(400, "נדרשים ספר וטווח")
+        book_id = self._ints(params[:1], 1)[0]
+        self._book(book_id)
+        first, _, last = params[1].partition("-")
+        start = self._ints(first.split(":"), 2)
+        end = self._ints(last.split(":"), 2) if ":" in last else [start[0], *self._ints([last], 1)]
+        if end < start:
+            raise APIError(400, "סוף הטווח לפני תחילתו")
+
+        verses = []
+        for chapter_num in self.corpus.chapters(book_id):
+            if start[0] <= chapter_num <= end[0]:
+                for verse in self.corpus.verses(book_id, chapter_num):
+                    if start <= [chapter_num, verse["PasukNum"]] <= end:
+                        verses.append(dict(c=chapter_num, **self.formatter.optimize_verse(verse)))
+        if not verses:
+            raise APIError(404, "אין פסוקים בטווח")
+        return {"b": book_id, "s": start, "e": [verses[-1]["c"], verses[-1]["n"]], "v": verses}
+
+    def chapter(self, params, query):
+        """/api/chapter/<ספר>/<פרק>"""
+        book_id, chapter_num = self._ints(params, 2)
+        self._book(book_id)
+        chapter = self.formatter.optimize_chapter(book_id, chapter_num)
+        if chapter is None:
+            raise APIError(404, f"פרק {chapter_num} לא נמצא")
+        return chapter
+
+    def parsha(self, params, query):
+        """/api/parsha/<מזהה> - כמו data/parshiot/p_<מזהה>.json"""
+        parsha_id = self._ints(params, 1)[0]
+        for interval_id, book_id, start, end in self.parsha_index.intervals():
+            if interval_id == parsha_id:
+                return self.formatter.build_parsha_bundle(parsha_id, self.parsha_index.names[parsha_id], book_id,
+                                                          start, end)
+        raise APIError(404, f"פרשה {parsha_id} לא נמצאה")
+
+    def search(self, params, query):
+        """/api/search?q=<מילים>&type=questions|verses&limit=50&offset=0 - כל המילים (AND)"""
+        tokens = tokenize(query.get("q", ""))
+        if not tokens:
+            raise APIError(400, "חסרה שאילתה (q)")
+        kind = query.get("type", "questions")
+        if kind not in ("questions", "verses"):
+            raise APIError(400, "type חייב להיות questions או verses")
+        try:
+            limit = min(MAX_SEARCH_LIMIT, max(1, int(query.get("limit", 50))))
+            offset = max(0, int(query.get("offset", 0)))
+        except ValueError:
+            raise APIError(400, "limit/offset לא מספריים")
+
+        if kind == "questions":
+            postings, docs = self.search_index.question_postings, self.search_index.question_docs
+        else:
+            postings, docs = self.search_index.verse_postings, self.search_index.verse_docs
+        # חיתוך מהרשימה הקצרה לארוכה
+        matches = None
+        for posting in sorted((postings.get(token, set()) for token in set(tokens)), key=len):
+            matches = set(posting) if matches is None else matches & posting
+            if not matches:
+                break
+        ids = sorted(matches or ())
+        return {
+            "q": query.get("q", ""),
+            "type": kind,
+            "total": len(ids),
+            "offset": offset,
+            "r": [docs[doc_id] for doc_id in ids[offset:offset + limit]],
+        }
+
+
+class TorahAPI:
+    """מטמון + איחוד בקשות מעל TorahQueryService"""
+
+    def __init__(self, service, cache_bytes=DEFAULT_CACHE_BYTES):
+        self.service = service
+        self.cache = ResponseCache(cache_bytes)
+        self.pending = {}  # מפתח -> Future של תשובה שנבנית כרגע
+        self.encoders = _runtime_encoders()
+        self.coalesced = 0
+
+    @staticmethod
+    def cache_key(target):
+        """מפתח קנוני: נתיב + פרמטרים ממוינים (הסדר ב-URL לא משנה)"""
+        parts = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+        return parts.path.rstrip("/") or "/", tuple(sorted(query.items()))
+
+    def build(self, key):
+        """בניית תשובה (בתהליכון): JSON + כל הקידודים"""
+        path, query = key
+        try:
+            status, data = 200, self.service.handle(path, dict(query))
+        except APIError as e:
+            status, data = e.status, {"error": str(e)}
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return CachedResponse(status, payload, self.encoders)
+
+    async def response(self, key):
+        """התשובה למפתח שלא היה במטמון ב-get - אולי כבר נבנתה, או נבנית כרגע"""
+        cached = self.cache.peek(key)
+        if cached is not None:
+            return cached
+        future = self.pending.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await future
+        loop = asyncio.get_running_loop()
+        future = self.pending[key] = loop.create_future()
+        try:
+            response = await loop.run_in_executor(None, self.build, key)
+            self.cache.put(key, response)
+            future.set_result(response)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            # מי שחיכה מקבל את החריגה; אם אף אחד לא חיכה - לא מדווחים עליה פעמיים
+            future.exception()
+            raise
+        finally:
+            del self.pending[key]
+
+
+def _http_response(status, headers, body, send_body=True):
+    head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    head += [f"{name}: {value}" for name, value in headers]
+    head.append(f"Content-Length: {len(body)}")
+    data = ("\r\n".join(head) + "\r\n\r\n").encode('latin-1')
+    return data + body if send_body else data
+
+
+class HTTPProtocol(asyncio.Protocol):
+    """HTTP/1.1 מינימלי (GET/HEAD, keep-alive, pipelining) - תשובה מהמטמון נכתבת מיד"""
+
+    def __init__(self, api):
+        self.api = api
+        self.transport = None
+        self.buffer = b""
+        self.queue = []      # בקשות שממתינות (pipelining - התשובות לפי הסדר)
+        self.busy = False    # תשובה שנבנית כרגע חוסמת את הבאות אחריה
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.buffer += data
+        while True:
+            end = self.buffer.find(b"\r\n\r\n")
+            if end < 0:
+                if len(self.buffer) > MAX_HEADER_BYTES:
+                    self.transport.write(_http_response(431, [("Connection", "close")], b""))
+                    self.transport.close()
+                return
+            head, self.buffer = self.buffer[:end].decode('latin-1'), self.buffer[end + 4:]
+            self.queue.append(head)
+            if not self.busy:
+                self.process()
+
+    def process(self):
+        while self.queue and not self.busy and not self.transport.is_closing():
+            lines = self.queue.pop(0).split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ")
+            except ValueError:
+                self.transport.write(_http_response(400, [("Connection", "close")], b""))
+                self.transport.close()
+                return
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            keep_alive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close") or \
+                headers.get("connection", "").lower() == "keep-alive"
+
+            if method not in ("GET", "HEAD"):
+                self.finish(_http_response(405, [("Allow", "GET, HEAD")], b""), keep_alive)
+                continue
+            key = self.api.cache_key(target)
+            cached = self.api.cache.get(key)
+            if cached is not None:
+                self.finish(self.render(cached, method, headers), keep_alive)
+                continue
+            self.busy = True
+            asyncio.ensure_future(self.respond_later(key, method, headers, keep_alive))
+
+    async def respond_later(self, key, method, headers, keep_alive):
+        try:
+            response = await self.api.response(key)
+            data = self.render(response, method, headers)
+        except Exception as e:
+            body = json.dumps({"error": str(e)}, ensure_ascii=False).encode('utf-8')
+            data = _http_response(500, [("Content-Type", "application/json; charset=utf-8")], body)
+        self.busy = False
+        if not self.transport.is_closing():
+            self.finish(data, keep_alive)
+            self.process()
+
+    def render(self, response, method, headers):
+        common = [
+            ("Content-Type", "application/json; charset=utf-8"),
+            ("ETag", response.etag),
+            ("Cache-Control", CACHE_CONTROL),
+            ("Vary", "Accept-Encoding"),
+            ("Access-Control-Allow-Origin", "*"),
+        ]
+        if response.status == 200 and response.etag in headers.get("if-none-match", ""):
+            return _http_response(304, common, b"", send_body=False)
+        encoding, body = response.body(headers.get("accept-encoding"))
+        if encoding:
+            common.append(("Content-Encoding", encoding))
+        return _http_response(response.status, common, body, send_body=method == "GET")
+
+    def finish(self, data, keep_alive):
+        self.transport.write(data)
+        if not keep_alive:
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        self.queue.clear()
+
+
+async def serve(db_path, host, port, cache_bytes):
+    print(f"📚 טוען את {db_path} לזיכרון...")
+    start = time.perf_counter()
+    service = TorahQueryService.load(db_path)
+    index = service.search_index
+    print(f"  ✅ {len(service.corpus.tables['tbl_Torah']):,} פסוקים, {len(index.question_docs):,} שאלות, "
+          f"{len(set(index.verse_postings) | set(index.question_postings)):,} מילים באינדקס "
+          f"({time.perf_counter() - start:.1f} שניות)")
+
+    api = TorahAPI(service, cache_bytes)
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(lambda: HTTPProtocol(api), host, port)
+    print(f"🌐 API בכתובת http://{host}:{port}/api/ (מטמון {cache_bytes // 1024 // 1024} MB)")
+    print("   books | verse/<ספר>/<פרק>/<פסוק> | range/<ספר>/<פרק>:<פסוק>-<פרק>:<פסוק> | "
+          "chapter/<ספר>/<פרק> | parsha/<מזהה> | search?q=...")
+    # עצירה מסודרת ב-SIGINT/SIGTERM (במערכות שתומכות בכך)
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        cache = api.cache
+        print(f"\n📊 מטמון: {cache.hits:,} פגיעות, {cache.misses:,} החטאות, {api.coalesced:,} בקשות אוחדו, "
+              f"{len(cache.entries):,} תשובות ({cache.bytes / 1024 / 1024:.1f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="שרת API לשאילתות על נתוני התורה")
+    parser.add_argument("--db", default="torah.db", help="בסיס הנתונים")
+    parser.add_argument("--host", default="127.0.0.1", help="כתובת האזנה")
+    parser.add_argument("--port", type=int, default=8080, help="פורט")
+    parser.add_argument("--cache-mb", type=int, default=DEFAULT_CACHE_BYTES // 1024 // 1024,
+                        help="גודל מטמון התשובות (MB)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"❌ שגיאה: הקובץ {args.db} לא נמצא!")
+        return
+    try:
+        asyncio.run(serve(args.db, args.host, args.port, args.cache_mb * 1024 * 1024))
+    except KeyboardInterrupt:
+        print("👋 השרת נעצר")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מדידת ביצועים של כל שלבי הבנייה על קורפוס סינתטי
+יוצר torah.db סינתטי באותה סכמה (tbl_Sefer, tbl_Torah, tbl_Title, tbl_Question,
+tbl_Parsha, ...) בגודל 1x, 10x, 100x של הקורפוס הנוכחי (~40 אלף שורות), מריץ את ארבעת
+הבונים - כל אחד בתהליך נפרד - ומודד זמן, זמן מעבד וזיכרון לכל שלב.
+מבנה הספרים, הפרקים והפרשות נשאר כמו בתורה; הקנה מידה מכפיל את הכותרות והשאלות לכל
+פסוק (כמו הוספת מערכות פירושים). התוצאות נשמרות כ-JSON ומושוות לבסיס שמור
+"""
+
+import argparse
+import contextlib
+import filecmp
+import importlib
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from torah_metrics import METRICS_FILE
+
+# גרסת המחולל - חלק משם הקובץ, כך שקבצים ישנים לא נלקחים מהמטמון
+GENERATOR_VERSION = 1
+
+DEFAULT_SCALES = (1, 10, 100)
+DEFAULT_SEED = 5784
+
+# (מזהה, שם, פרקים, פסוקים, פרשות) - המבנה של חמשת החומשים
+BOOKS = [
+    (1, "בראשית", 50, 1533, 12),
+    (2, "שמות", 40, 1210, 11),
+    (3, "ויקרא", 27, 859, 10),
+    (4, "במדבר", 36, 1288, 10),
+    (5, "דברים", 34, 955, 11),
+]
+
+# הסכמה של torah.db (כמו ב-torah_full_export/separated)
+SCHEMA = [
+    'CREATE TABLE tbl_Sefer ("ID" INTEGER PRIMARY KEY, "SeferName" TEXT)',
+    'CREATE TABLE tbl_Perek ("ID" INTEGER PRIMARY KEY, "PerekName" TEXT)',
+    'CREATE TABLE tbl_Pasuk ("ID" INTEGER PRIMARY KEY, "PasukName" TEXT)',
+    'CREATE TABLE tbl_Torah ("ID" INTEGER PRIMARY KEY, "Sefer" INTEGER, "Perek" INTEGER, "PasukNum" INTEGER, '
+    '"Pasuk" TEXT)',
+    'CREATE TABLE tbl_Title ("ID" INTEGER PRIMARY KEY, "TorahID" INTEGER, "Title" TEXT)',
+    'CREATE TABLE tbl_Question ("ID" INTEGER PRIMARY KEY, "TitleID" INTEGER, "Question" TEXT)',
+    'CREATE TABLE tbl_Perush ("ID" INTEGER PRIMARY KEY, "QuestionID" INTEGER, "Mefaresh" TEXT, "Perush" TEXT)',
+    'CREATE TABLE tbl_Parsha ("ID" INTEGER PRIMARY KEY, "SeferID" INTEGER, "ParshaName" TEXT, '
+    '"StartPerek" INTEGER, "StartPasuk" INTEGER, "EndPerek" INTEGER, "EndPasuk" INTEGER)',
+    'CREATE TABLE Parshiot ("ID" INTEGER PRIMARY KEY, "SeferID" INTEGER NOT NULL, "ParshaName" TEXT NOT NULL, '
+    '"StartPerek" INTEGER NOT NULL, "StartPasuk" INTEGER NOT NULL, "EndPerek" INTEGER NOT NULL, '
+    '"EndPasuk" INTEGER NOT NULL)',
+]
+
+# (מודול, מחלקה, מתודת ההרצה, פרמטרים לבנאי) - השלבים נמדדים בבונה עצמו (torah_metrics)
+# הסדר חשוב: האופטימייזר קורא את הפלט של בונה האתר (לחישוב החיסכון)
+BUILDERS = {
+    "full": ("full_torah_exporter", "FullTorahJSONExporter", "export_all", ("workers",)),
+    "complete": ("complete_torah_json_exporter", "CompleteTorahJSONExporter", "export_all", ("workers",)),
+    "website": ("torah_website_builder", "TorahWebsiteBuilder", "build_website_data", ()),
+    "optimizer": ("torah_data_optimizer", "TorahDataOptimizer", "optimize_all", ("workers", "input_dir")),
+}
+
+# שלב שהזמן שלו גדל מהר יותר מהנתונים (מעריך מעל הסף) מסומן
+SUPERLINEAR_EXPONENT = 1.2
+
+# הבדלים קטנים מזה (בשניות) הם רעש מדידה ולא נחשבים נסיגה
+NOISE_SECONDS = 0.05
+
+
+# --- מחולל הקורפוס ---
+
+LETTERS = "אבגדהוזחטיכלמנסעפצקרשת"
+FINAL_LETTERS = {"כ": "ך", "מ": "ם", "נ": "ן", "פ": "ף", "צ": "ץ"}
+VOWELS = "ְִֵֶַָֹֻ"
+
+
+def hebrew_numeral(number):
+    """מספר באותיות (1-999) - כמו PerekName/PasukName"""
+    units = "אבגדהוזחט"
+    tens = "יכלמנסעפצ"
+    hundreds = "קרשת"
+    result = ""
+    while number >= 400:
+        result += "ת"
+        number -= 400
+    if number >= 100:
+        result += hundreds[number // 100 - 1]
+        number %= 100
+    if number in (15, 16):
+        return result + "ט" + units[number - 10]
+    if number >= 10:
+        result += tens[number // 10 - 1]
+        number %= 10
+    if number:
+        result += units[number - 1]
+    return result
+
+
+class CorpusGenerator:
+    """מחולל דטרמיניסטי: אותו קנה מידה ואותו seed - אותו קובץ"""
+
+    def __init__(self, scale=1, seed=DEFAULT_SEED, vocabulary_size=4000):
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.pointed, self.plain = self._vocabulary(vocabulary_size)
+        # התפלגות זיפף - מעט מילים נפוצות מאוד והרבה נדירות
+        self.weights = []
+        total = 0.0
+        for rank in range(1, vocabulary_size + 1):
+            total += 1.0 / rank
+            self.weights.append(total)
+
+    def _vocabulary(self, size):
+        pointed, plain = [], []
+        for _ in range(size):
+            letters = [self.rng.choice(LETTERS) for _ in range(self.rng.randint(2, 6))]
+            if letters[-1] in FINAL_LETTERS:
+                letters[-1] = FINAL_LETTERS[letters[-1]]
+            plain.append("".join(letters))
+            pointed.append("".join(letter + self.rng.choice(VOWELS) for letter in letters[:-1]) + letters[-1])
+        return pointed, plain
+
+    def words(self, vocabulary, low, high):
+        return " ".join(self.rng.choices(vocabulary, cum_weights=self.weights, k=self.rng.randint(low, high)))
+
+    def verse_text(self):
+        return self.words(self.pointed, 8, 18) + ":"
+
+    def title_text(self):
+        # כותרת היא לפעמים ציטוט של הפסוק עצמו
+        if self.rng.random() < 0.3:
+            return self.verse_text()
+        return self.words(self.plain, 2, 8)
+
+    def question_text(self):
+        return self.words(self.plain, 4, 10) + "?"
+
+    def chapter_lengths(self, chapters, verses):
+        """חלוקת הפסוקים של ספר לפרקים באורכים שונים"""
+        weights = [self.rng.uniform(0.5, 1.5) for _ in range(chapters)]
+        total = sum(weights)
+        lengths = [max(1, int(verses * weight / total)) for weight in weights]
+        lengths[-1] += verses - sum(lengths)
+        return lengths
+
+    def _insert_commentary(self, conn, titles, questions):
+        conn.executemany("INSERT INTO tbl_Title VALUES (?, ?, ?)", titles)
+        conn.executemany("INSERT INTO tbl_Question VALUES (?, ?, ?)", questions)
+
+    def generate(self, path):
+        """יצירת הקובץ, מחזיר את מספר השורות בכל טבלה"""
+        if os.path.exists(path):
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        for statement in SCHEMA:
+            conn.execute(statement)
+
+        verses, parshiot = [], []
+        max_chapters = max_verses = 0
+        for book_id, book_name, chapters, book_verses, parsha_count in BOOKS:
+            refs = []
+            for chapter_num, length in enumerate(self.chapter_lengths(chapters, book_verses), 1):
+                max_verses = max(max_verses, length)
+                for verse_num in range(1, length + 1):
+                    refs.append((chapter_num, verse_num))
+                    verses.append((len(verses) + 1, book_id, chapter_num, verse_num, self.verse_text()))
+            max_chapters = max(max_chapters, chapters)
+            # פרשות במרווחים שווים לאורך הספר
+            starts = [refs[len(refs) * index // parsha_count] for index in range(parsha_count)]
+            for index, start in enumerate(starts):
+                end = refs[len(refs) * (index + 1) // parsha_count - 1]
+                parshiot.append((len(parshiot) + 1, book_id, f"פרשה {hebrew_numeral(len(parshiot) + 1)}",
+                                 start[0], start[1], end[0], end[1]))
+
+        conn.executemany("INSERT INTO tbl_Sefer VALUES (?, ?)", [(book[0], book[1]) for book in BOOKS])
+        conn.executemany("INSERT INTO tbl_Perek VALUES (?, ?)",
+                         [(n, hebrew_numeral(n)) for n in range(1, max_chapters + 1)])
+        conn.executemany("INSERT INTO tbl_Pasuk VALUES (?, ?)",
+                         [(n, hebrew_numeral(n)) for n in range(1, max_verses + 1)])
+        conn.executemany("INSERT INTO tbl_Torah VALUES (?, ?, ?, ?, ?)", verses)
+        conn.executemany("INSERT INTO tbl_Parsha VALUES (?, ?, ?, ?, ?, ?, ?)", parshiot)
+        conn.executemany("INSERT INTO Parshiot VALUES (?, ?, ?, ?, ?, ?, ?)", parshiot)
+
+        # בממוצע 2 כותרות לפסוק ו-2 שאלות לכותרת בקנה מידה 1 (כמו בקורפוס האמיתי)
+        titles, questions = [], []
+        title_id = question_id = 0
+        for torah_id, *_ in verses:
+            for _ in range(self.rng.randint(self.scale, 3 * self.scale)):
+                title_id += 1
+                titles.append((title_id, torah_id, self.title_text()))
+                for _ in range(self.rng.randint(1, 3)):
+                    question_id += 1
+                    questions.append((question_id, title_id, self.question_text()))
+            # כתיבה בקבוצות - בקנה מידה 100 השורות לא נשמרות כולן בזיכרון
+            if len(questions) >= 100000:
+                self._insert_commentary(conn, titles, questions)
+                titles, questions = [], []
+        self._insert_commentary(conn, titles, questions)
+        conn.commit()
+
+        counts = {}
+        for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name").fetchall():
+            counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        conn.close()
+        return counts
+
+
+def database_path(work_dir, scale, seed):
+    return os.path.join(work_dir, f"torah_g{GENERATOR_VERSION}_x{scale}_seed{seed}.db")
+
+
+def prepare_database(work_dir, scale, seed):
+    """הקובץ הסינתטי לקנה מידה - נוצר פעם אחת ונשמר בתיקיית העבודה"""
+    path = database_path(work_dir, scale, seed)
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        tables = [name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+        counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+        conn.close()
+        print(f"  ⏭️ {os.path.basename(path)}: קיים")
+        return path, counts, 0.0
+
+    start = time.perf_counter()
+    counts = CorpusGenerator(scale, seed).generate(path)
+    seconds = time.perf_counter() - start
+    print(f"  🧪 {os.path.basename(path)}: {sum(counts.values()):,} שורות ב-{seconds:.1f} שניות")
+    return path, counts, seconds
+
+
+# --- הרצת בונה (בתהליך הבן) ---
+
+def run_builder(name, db_path, output_dir, workers=1, input_dir=None):
+    """הרצת בונה אחד בתהליך הנוכחי - המדדים לכל שלב נכתבים ל-.build_metrics.json (torah_metrics)"""
+    module_name, class_name, entry, options = BUILDERS[name]
+    kwargs = {"db_path": db_path, "output_dir": output_dir}
+    if "workers" in options:
+        kwargs["workers"] = workers
+    if "input_dir" in options and input_dir:
+        kwargs["input_dir"] = input_dir
+    builder = getattr(importlib.import_module(module_name), class_name)(**kwargs)
+    return bool(getattr(builder, entry)())
+
+
+def directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(dirpath, filename))
+        for dirpath, _, filenames in os.walk(path)
+        for filename in filenames
+    )
+
+
+def run_builder_process(name, db_path, output_dir, log_path, workers=1, input_dir=None, timeout=None):
+    """הבונה בתהליך נפרד - זיכרון נקי לכל בונה, ונפילה של בונה לא עוצרת את השאר"""
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child", name,
+        "--db", db_path, "--output-dir", output_dir, "--workers", str(workers),
+    ]
+    if input_dir:
+        command += ["--input-dir", input_dir]
+
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        try:
+            completed = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT, timeout=timeout,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       env=dict(os.environ, PYTHONIOENCODING="utf-8"))
+            returncode = completed.returncode
+        except subprocess.TimeoutExpired:
+            returncode = None
+    seconds = time.perf_counter() - start
+
+    metrics_path = os.path.join(output_dir, METRICS_FILE)
+    if returncode == 0 and os.path.exists(metrics_path):
+        with open(metrics_path, encoding="utf-8") as f:
+            result = json.load(f)
+        if not result["ok"]:
+            result["error"] = "הבונה נכשל"
+    else:
+        result = {"ok": False, "stages": {}, "error": "timeout" if returncode is None else f"exit {returncode}"}
+    result["process_seconds"] = seconds
+    result["output_bytes"] = directory_size(output_dir) if os.path.exists(output_dir) else 0
+    result["log"] = log_path
+    return result
+
+
+# --- פלט זהה בכל מצבי הריצה ---
+
+# מצבי הריצה של הייצוא המלא שחייבים לכתוב בדיוק את הבתים של ריצה סדרתית
+IDENTICAL_MODES = {"serial": {}, "workers": {"workers": None}, "stream": {"streaming": True}}
+
+
+def output_files(root):
+    """כל הקבצים שבתיקייה (נתיב יחסי), בלי קובץ המדדים (זמנים משתנים בכל ריצה)"""
+    return sorted(
+        os.path.relpath(os.path.join(dirpath, filename), root)
+        for dirpath, _, filenames in os.walk(root)
+        for filename in filenames if filename != METRICS_FILE
+    )
+
+
+def check_identical_outputs(work_dir="benchmark_work", seed=DEFAULT_SEED, workers=2):
+    """הייצוא המלא (complete) בריצה סדרתית, עם --workers ובזרימה על הקורפוס הסינתטי x1 -
+    כל הקבצים חייבים להיות זהים בתים-לבתים (cmp). מחזיר את רשימת ההבדלים"""
+    from complete_torah_json_exporter import CompleteTorahJSONExporter
+
+    work_dir = os.path.abspath(work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+    db_path, _, _ = prepare_database(work_dir, 1, seed)
+    check_dir = os.path.join(work_dir, "identical")
+    shutil.rmtree(check_dir, ignore_errors=True)
+    os.makedirs(check_dir)
+
+    # אותו זמן ייצוא בכל הריצות - הוא נכתב לתוך הקבצים
+    exported_at = datetime.now().isoformat()
+    for mode, options in IDENTICAL_MODES.items():
+        options = {key: workers if value is None else value for key, value in options.items()}
+        exporter = CompleteTorahJSONExporter(db_path=db_path, output_dir=os.path.join(check_dir, mode), **options)
+        exporter.export_stats["exported_at"] = exported_at
+        with open(os.path.join(check_dir, f"{mode}.log"), "w", encoding="utf-8") as log, \
+                contextlib.redirect_stdout(log):
+            ok = exporter.export_all()
+        if not ok:
+            return [f"{mode}: הייצוא נכשל"]
+        print(f"  ✅ {mode}: {len(output_files(os.path.join(check_dir, mode)))} קבצים")
+
+    reference = os.path.join(check_dir, "serial")
+    expected = output_files(reference)
+    differences = []
+    for mode in list(IDENTICAL_MODES)[1:]:
+        root = os.path.join(check_dir, mode)
+        actual = output_files(root)
+        differences += [f"{mode}: {path} חסר" for path in sorted(set(expected) - set(actual))]
+        differences += [f"{mode}: {path} מיותר" for path in sorted(set(actual) - set(expected))]
+        differences += [
+            f"{mode}: {path} שונה" for path in expected
+            if path in actual and not filecmp.cmp(os.path.join(reference, path), os.path.join(root, path), shallow=False)
+        ]
+    return differences
+
+
+# --- הרצה מלאה, סיכום והשוואה ---
+
+def run_benchmark(scales=DEFAULT_SCALES, builders=tuple(BUILDERS), work_dir="benchmark_work", seed=DEFAULT_SEED,
+                  workers=1, timeout=None, keep_outputs=False):
+    # הבונים רצים מתיקיית המאגר - הנתיבים שמועברים להם מוחלטים
+    work_dir = os.path.abspath(work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+    results = {
+        "version": 1,
+        "created": datetime.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "settings": {"seed": seed, "workers": workers, "generator_version": GENERATOR_VERSION},
+        "runs": [],
+    }
+
+    for scale in scales:
+        print(f"\n📏 קנה מידה x{scale}")
+        db_path, counts, generate_seconds = prepare_database(work_dir, scale, seed)
+        run = {
+            "scale": scale,
+            "rows": counts,
+            "total_rows": sum(counts.values()),
+            "database_bytes": os.path.getsize(db_path),
+            "generate_seconds": generate_seconds,
+            "builders": {},
+        }
+        scale_dir = os.path.join(work_dir, f"x{scale}")
+        if os.path.exists(scale_dir):
+            shutil.rmtree(scale_dir)
+        os.makedirs(scale_dir)
+
+        for name in builders:
+            output_dir = os.path.join(scale_dir, name)
+            input_dir = os.path.join(scale_dir, "website") if name == "optimizer" else None
+            result = run_builder_process(name, db_path, output_dir, os.path.join(scale_dir, f"{name}.log"),
+                                         workers, input_dir, timeout)
+            run["builders"][name] = result
+            if result["ok"]:
+                slowest = max(result["stages"].items(), key=lambda item: item[1]["seconds"], default=None)
+                slowest_text = f", הכי איטי: {slowest[0]} ({slowest[1]['seconds']:.2f}s)" if slowest else ""
+                print(f"  ✅ {name}: {result['seconds']:.2f}s, שיא זיכרון {(result.get('peak_rss_kb') or 0) / 1024:.0f} MB, "
+                      f"פלט {result['output_bytes'] / 1024 / 1024:.1f} MB{slowest_text}")
+            else:
+                print(f"  ❌ {name}: נכשל ({result.get('error', 'ראה לוג')}) - {result['log']}")
+
+        if not keep_outputs:
+            for name in builders:
+                shutil.rmtree(os.path.join(scale_dir, name), ignore_errors=True)
+        results["runs"].append(run)
+
+    results["scaling"] = scaling_report(results)
+    return results
+
+
+def scaling_report(results):
+    """מעריך הגדילה של כל שלב בין שני קני מידה עוקבים: 1 = לינארי, 2 = ריבועי"""
+    report = []
+    runs = sorted(results["runs"], key=lambda run: run["scale"])
+    for smaller, larger in zip(runs, runs[1:]):
+        row_ratio = larger["total_rows"] / max(1, smaller["total_rows"])
+        if row_ratio <= 1:
+            continue
+        for name, builder in larger["builders"].items():
+            base = smaller["builders"].get(name)
+            if not base or not builder["ok"] or not base["ok"]:
+                continue
+            for stage, timing in builder["stages"].items():
+                before = base["stages"].get(stage, {}).get("seconds", 0)
+                if before < NOISE_SECONDS:
+                    continue
+                exponent = math.log(timing["seconds"] / before) / math.log(row_ratio)
+                report.append({
+                    "builder": name, "stage": stage, "from": smaller["scale"], "to": larger["scale"],
+                    "exponent": round(exponent, 2), "superlinear": exponent > SUPERLINEAR_EXPONENT,
+                })
+    return report
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """השוואת זמני השלבים לבסיס: [(קנה מידה, בונה, שלב, לפני, אחרי, יחס)] של הנסיגות"""
+    regressions = []
+    baseline_runs = {run["scale"]: run for run in baseline.get("runs", [])}
+    print(f"\n📐 השוואה לבסיס ({baseline.get('created', '?')})")
+    for run in results["runs"]:
+        base_run = baseline_runs.get(run["scale"])
+        if base_run is None:
+            continue
+        for name, builder in run["builders"].items():
+            base_builder = base_run["builders"].get(name)
+            if base_builder is None:
+                continue
+            if base_builder["ok"] and not builder["ok"]:
+                regressions.append((run["scale"], name, "*", base_builder["seconds"], None, None))
+                print(f"  ❌ x{run['scale']} {name}: עבד בבסיס ונכשל עכשיו")
+                continue
+            for stage, timing in builder["stages"].items():
+                before = base_builder["stages"].get(stage, {}).get("seconds")
+                if before is None:
+                    continue
+                after = timing["seconds"]
+                ratio = after / before if before else float("inf")
+                if after - before > NOISE_SECONDS and ratio > 1 + threshold:
+                    regressions.append((run["scale"], name, stage, before, after, ratio))
+                    print(f"  🐢 x{run['scale']} {name}.{stage}: {before:.2f}s -> {after:.2f}s (x{ratio:.2f})")
+                elif before - after > NOISE_SECONDS and ratio < 1 - threshold:
+                    print(f"  🚀 x{run['scale']} {name}.{stage}: {before:.2f}s -> {after:.2f}s (x{ratio:.2f})")
+    if not regressions:
+        print("  ✅ אין נסיגות מעבר לסף")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="מדידת ביצועים של שלבי הבנייה על קורפוס סינתטי")
+    parser.add_argument("--scales", default=",".join(str(scale) for scale in DEFAULT_SCALES),
+                        help="קני מידה מופרדים בפסיק (1 = הקורפוס הנוכחי, ~40 אלף שורות)")
+    parser.add_argument("--builders", default=",".join(BUILDERS), help="הבונים למדידה, מופרדים בפסיק")
+    parser.add_argument("--work-dir", default="benchmark_work", help="תיקיית העבודה (הקבצים הסינתטיים נשמרים בה)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed למחולל")
+    parser.add_argument("--workers", type=int, default=1, help="מספר תהליכים לבונים שתומכים בכך")
+    parser.add_argument("--timeout", type=float, help="זמן מקסימלי לבונה (שניות)")
+    parser.add_argument("--keep-outputs", action="store_true", help="שמירת הפלטים של הבונים")
+    parser.add_argument("--output", default="benchmark_results.json", help="קובץ התוצאות")
+    parser.add_argument("--baseline", help="קובץ בסיס להשוואה")
+    parser.add_argument("--save-baseline", help="שמירת התוצאות גם כקובץ בסיס")
+    parser.add_argument("--threshold", type=float, default=0.25, help="האטה יחסית שנחשבת נסיגה (0.25 = 25%%)")
+    parser.add_argument("--check-identical", action="store_true",
+                        help="בדיקה שהייצוא המלא כותב אותם בתים בריצה סדרתית, מקבילית ובזרימה (במקום מדידה)")
+    # הרצה פנימית של בונה אחד (תהליך הבן)
+    parser.add_argument("--child", choices=list(BUILDERS), help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--output-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--input-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.exit(0 if run_builder(args.child, args.db, args.output_dir, args.workers, args.input_dir) else 1)
+
+    if args.check_identical:
+        print("🔬 בדיקת פלט זהה: סדרתי / --workers / בזרימה")
+        differences = check_identical_outputs(args.work_dir, args.seed, max(2, args.workers))
+        for difference in differences:
+            print(f"  ❌ {difference}")
+        print("✅ כל הקבצים זהים" if not differences else f"❌ {len(differences)} הבדלים")
+        sys.exit(1 if differences else 0)
+
+    print("⏱️ מדידת ביצועים של בניית נתוני התורה")
+    print("=" * 60)
+
+    scales = [int(scale) for scale in args.scales.split(",") if scale.strip()]
+    builders = [name for name in args.builders.split(",") if name.strip()]
+    unknown = [name for name in builders if name not in BUILDERS]
+    if unknown:
+        parser.error(f"בונים לא מוכרים: {', '.join(unknown)} (אפשריים: {', '.join(BUILDERS)})")
+    # סדר ההרצה לפי BUILDERS - האופטימייזר אחרי בונה האתר
+    builders = [name for name in BUILDERS if name in builders]
+
+    results = run_benchmark(scales, builders, args.work_dir, args.seed, args.workers,
+                            args.timeout, args.keep_outputs)
+
+    superlinear = [entry for entry in results["scaling"] if entry["superlinear"]]
+    if superlinear:
+        print(f"\n📈 שלבים שגדלים מהר מהנתונים (מעריך > {SUPERLINEAR_EXPONENT}):")
+        for entry in sorted(superlinear, key=lambda entry: -entry["exponent"]):
+            print(f"  ⚠️ {entry['builder']}.{entry['stage']}: x{entry['from']} -> x{entry['to']}, "
+                  f"מעריך {entry['exponent']}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 תוצאות: {args.output}")
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 בסיס: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare_with_baseline(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
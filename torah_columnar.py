@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+פורמט בינארי עמודתי לטבלאות התורה (.tcol)
+כל טבלה נשמרת כקובץ אחד: כותרת JSON קצרה ואחריה מקטעים מיושרים ל-8 בתים -
+עמודות מספריות ברוחב קבוע (int64/float64), מפת ביטים של NULL,
+ועמודות טקסט כמערך היסטים (uint64) לתוך ערימת UTF-8 אחת.
+הקורא ממפה את הקובץ לזיכרון (mmap) ומחזיר תצוגות בלי העתקה לפי טווח שורות
+"""
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+MAGIC = b"TCOL"
+FORMAT_VERSION = 1
+
+# magic, גרסה, אורך כותרת ה-JSON
+_PREAMBLE = struct.Struct("<4sII")
+
+# סוגי עמודות
+INT = "int"       # int64 ברוחב קבוע
+FLOAT = "float"   # float64 ברוחב קבוע
+TEXT = "text"     # היסטים + ערימת UTF-8
+BLOB = "blob"     # היסטים + ערימת בתים
+JSON = "json"     # ערכים מעורבים - כל ערך כ-JSON בערימה
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _column_kind(values):
+    """סוג העמודה לפי הערכים (SQLite מתיר ערכים מסוגים שונים באותה עמודה)"""
+    kinds = {type(value) for value in values if value is not None}
+    if not kinds:
+        return INT
+    if kinds == {int} and all(-2**63 <= value < 2**63 for value in values if value is not None):
+        return INT
+    if kinds <= {int, float}:
+        return FLOAT
+    if kinds == {str}:
+        return TEXT
+    if kinds == {bytes}:
+        return BLOB
+    return JSON
+
+
+def _null_bitmap(values):
+    bitmap = bytearray((len(values) + 7) // 8)
+    for i, value in enumerate(values):
+        if value is None:
+            bitmap[i >> 3] |= 1 << (i & 7)
+    return bytes(bitmap)
+
+
+def _encode_column(kind, values):
+    """המקטעים של עמודה: (נתונים, ערימה או None)"""
+    if kind == INT:
+        return array('q', (0 if value is None else value for value in values)).tobytes(), None
+    if kind == FLOAT:
+        return array('d', (0.0 if value is None else float(value) for value in values)).tobytes(), None
+
+    if kind == TEXT:
+        encoded = [b"" if value is None else value.encode('utf-8') for value in values]
+    elif kind == BLOB:
+        encoded = [b"" if value is None else bytes(value) for value in values]
+    else:
+        encoded = [b"" if value is None else json.dumps(value, ensure_ascii=False).encode('utf-8') for value in values]
+
+    offsets = array('Q', [0])
+    position = 0
+    for item in encoded:
+        position += len(item)
+        offsets.append(position)
+    return offsets.tobytes(), b"".join(encoded)
+
+
+def write_table(path, table):
+    """כתיבת CorpusTable לקובץ עמודתי, מחזיר את גודל הקובץ"""
+    row_count = len(table)
+    declared = {column["name"]: column.get("type", "") for column in table.columns}
+
+    sections = []
+    header_columns = []
+    for name, values in zip(table.names, table.data):
+        kind = _column_kind(values)
+        data, heap = _encode_column(kind, values)
+        nulls = _null_bitmap(values) if any(value is None for value in values) else None
+        header_columns.append({"name": name, "kind": kind, "declared_type": declared.get(name, "")})
+        sections.append((data, nulls, heap))
+
+    # הכותרת מכילה את ההיסטים של המקטעים, שתלויים באורך הכותרת עצמה
+    def build_header(layout):
+        for column, (data_offset, nulls_offset, heap_offset, heap_length) in zip(header_columns, layout):
+            column.update(data=data_offset, nulls=nulls_offset, heap=heap_offset, heap_length=heap_length)
+        return json.dumps({
+            "table": table.name,
+            "rows": row_count,
+            "byteorder": sys.byteorder,
+            "columns": header_columns
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def layout_for(header_length):
+        layout = []
+        offset = _align(_PREAMBLE.size + header_length)
+        for data, nulls, heap in sections:
+            data_offset = offset
+            offset = _align(offset + len(data))
+            nulls_offset = None
+            if nulls is not None:
+                nulls_offset = offset
+                offset = _align(offset + len(nulls))
+            heap_offset = None
+            if heap is not None:
+                heap_offset = offset
+                offset = _align(offset + len(heap))
+            layout.append((data_offset, nulls_offset, heap_offset, len(heap) if heap is not None else 0))
+        return layout
+
+    header = build_header(layout_for(0))
+    # מחשבים מחדש עד שאורך הכותרת מתייצב
+    while True:
+        layout = layout_for(len(header))
+        new_header = build_header(layout)
+        if len(new_header) == len(header):
+            header = new_header
+            break
+        header = new_header
+
+    with open(path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for (data, nulls, heap), (data_offset, nulls_offset, heap_offset, _) in zip(sections, layout):
+            for offset, payload in ((data_offset, data), (nulls_offset, nulls), (heap_offset, heap)):
+                if offset is None:
+                    continue
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(payload)
+        size = f.tell()
+    return size
+
+
+class VarColumn:
+    """תצוגה של עמודת טקסט/בתים בטווח שורות - ערכים מפוענחים רק כשניגשים אליהם"""
+
+    __slots__ = ("kind", "offsets", "heap", "nulls", "start", "stop")
+
+    def __init__(self, kind, offsets, heap, nulls, start, stop):
+        self.kind = kind
+        self.offsets = offsets
+        self.heap = heap
+        self.nulls = nulls
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def raw(self, index):
+        """הבתים של ערך כ-memoryview לתוך הקובץ הממופה (בלי העתקה)"""
+        row = self.start + index
+        return self.heap[self.offsets[row]:self.offsets[row + 1]]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        row = self.start + index
+        if self.nulls is not None and self.nulls[row >> 3] & (1 << (row & 7)):
+            return None
+        value = self.raw(index)
+        if self.kind == TEXT:
+            return str(value, 'utf-8')
+        if self.kind == BLOB:
+            return bytes(value)
+        return json.loads(str(value, 'utf-8'))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class ColumnarTable:
+    """קורא קובץ עמודתי דרך mmap"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+        magic, version, header_length = _PREAMBLE.unpack_from(self._view)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} אינו קובץ עמודתי")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path}: גרסת פורמט {version} לא נתמכת")
+
+        header = json.loads(bytes(self._view[_PREAMBLE.size:_PREAMBLE.size + header_length]))
+        self.name = header["table"]
+        self.rows = header["rows"]
+        self.columns = header["columns"]
+        self.names = [column["name"] for column in self.columns]
+        self._by_name = {column["name"]: column for column in self.columns}
+        self._native = header["byteorder"] == sys.byteorder
+
+    def __len__(self):
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # תצוגה מ-column() שעדיין מוחזקת מחוץ לאובייקט מונעת סגירה (BufferError)
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def _fixed(self, offset, code, count):
+        view = self._view[offset:offset + 8 * count]
+        if self._native:
+            return view.cast(code)
+        # קובץ מסדר בתים אחר - כאן אין ברירה אלא להעתיק
+        values = array(code, view.tobytes())
+        values.byteswap()
+        return memoryview(values)
+
+    def _nulls(self, column):
+        if column["nulls"] is None:
+            return None
+        return self._view[column["nulls"]:column["nulls"] + (self.rows + 7) // 8]
+
+    def column(self, name, start=0, stop=None):
+        """עמודה בטווח שורות: memoryview למספרים, VarColumn לטקסט (בלי העתקה)
+
+        במספרים NULL נשמר כ-0 - מפת הביטים זמינה דרך is_null.
+        """
+        column = self._by_name[name]
+        stop = self.rows if stop is None else min(stop, self.rows)
+        start = min(start, stop)
+        kind = column["kind"]
+        if kind == INT:
+            return self._fixed(column["data"], 'q', self.rows)[start:stop]
+        if kind == FLOAT:
+            return self._fixed(column["data"], 'd', self.rows)[start:stop]
+        offsets = self._fixed(column["data"], 'Q', self.rows + 1)
+        heap = self._view[column["heap"]:column["heap"] + column["heap_length"]]
+        return VarColumn(kind, offsets, heap, self._nulls(column), start, stop)
+
+    def is_null(self, name, row):
+        nulls = self._nulls(self._by_name[name])
+        return nulls is not None and bool(nulls[row >> 3] & (1 << (row & 7)))
+
+    def rows_range(self, start=0, stop=None):
+        """שורות בטווח כ-tuples (לפי סדר העמודות)"""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        columns = []
+        for column in self.columns:
+            values = self.column(column["name"], start, stop)
+            if column["kind"] in (INT, FLOAT) and column["nulls"] is not None:
+                nulls = self._nulls(column)
+                values = [None if nulls[row >> 3] & (1 << (row & 7)) else value
+                          for row, value in zip(range(start, stop), values)]
+            columns.append(values)
+        return zip(*columns)
+
+    def iter_dicts(self, start=0, stop=None):
+        """שורות כמילונים (כמו tables/*.json)"""
+        for row in self.rows_range(start, stop):
+            yield dict(zip(self.names, row))
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+שלב דחיסה מקבילי - תור של תוצרים שנדחסים בכל הליבות בזמן שהבנייה ממשיכה
+כל תוצר מחולק לבלוקים של BLOCK_SIZE שנדחסים כל אחד בנפרד (zlib משחרר את ה-GIL,
+כך שחוטים מספיקים ואין העתקה לתהליכים) ומשורשרים כ-gzip מרובה-איברים: פורמט תקני
+ש-gzip/zcat, 7-Zip ומודול gzip של Python פותחים כקובץ אחד. תוצר שקטן מבלוק יוצא
+זהה בתים-לבתים ל-gzip_bytes. חוט כתיבה כותב את התוצרים לפי הסדר, כל בלוק ברגע שהוא מוכן.
+open_block_gzip כותב בזרימה את אותם בלוקים בדיוק, כך שריצה בזרימה יוצאת זהה לריצה עם השלב.
+תוצר קטן עם מקודד משלו (submit(..., encoder=...), למשל brotli או zstd - שגם הם משחררים
+את ה-GIL) נדחס כמשימה אחת בלי פיצול, כך שגם הקידודים של קבצי האתר רצים במקביל.
+השלב סופר את זמן המשימות (encode_seconds) - הדחיסה חופפת לשלבי הבנייה, כך שהזמן שלה
+לא נראה בשלב אחד; הבונים מדווחים אותו כשלב רקע (BuildMetrics.record_background)
+"""
+
+import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from torah_json_stream import gzip_bytes
+
+# גודל בלוק (לא דחוס) - החלון של deflate הוא 32KB, כך שהפיצול כמעט לא פוגע ביחס הדחיסה
+BLOCK_SIZE = 1024 * 1024
+
+# תוכן לא דחוס שממתין לכתיבה לפני ש-submit חוסם (חוסם את הזיכרון של התור)
+MAX_PENDING_BYTES = 32 * 1024 * 1024
+
+
+def split_blocks(payload, block_size=BLOCK_SIZE):
+    """הבלוקים של תוכן (memoryview - בלי העתקה); תוכן ריק הוא בלוק ריק אחד"""
+    view = memoryview(payload)
+    return [view[start:start + block_size] for start in range(0, len(view), block_size)] or [view]
+
+
+def gzip_blocks(payload, block_size=BLOCK_SIZE):
+    """אותו פלט כמו CompressionStage, בלי חוטים (כשאין שלב דחיסה)"""
+    return b"".join(gzip_bytes(block) for block in split_blocks(payload, block_size))
+
+
+class _BlockGzipWriter(io.RawIOBase):
+    """קובץ בינארי לכתיבה שדוחס כל BLOCK_SIZE בתים כאיבר gzip נפרד - כמו CompressionStage"""
+
+    def __init__(self, raw, block_size):
+        self.raw = raw
+        self.block_size = block_size
+        self.buffer = bytearray()
+        self.blocks = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self._flush_block(self.buffer[:self.block_size])
+            del self.buffer[:self.block_size]
+        return len(data)
+
+    def _flush_block(self, block):
+        self.raw.write(gzip_bytes(bytes(block)))
+        self.blocks += 1
+
+    def close(self):
+        if not self.closed:
+            # השארית, או בלוק ריק אחד לתוכן ריק (כמו split_blocks)
+            if self.buffer or not self.blocks:
+                self._flush_block(self.buffer)
+            self.buffer = bytearray()
+        super().close()
+
+
+@contextmanager
+def open_block_gzip(path, block_size=BLOCK_SIZE):
+    """פתיחת gzip מרובה-איברים לכתיבת טקסט בזרימה (זיכרון חסום לבלוק אחד)"""
+    with open(path, 'wb') as raw:
+        with io.TextIOWrapper(io.BufferedWriter(_BlockGzipWriter(raw, block_size)), encoding='utf-8') as text:
+            yield text
+
+
+class CompressedArtifact:
+    """תוצר שנשלח לשלב הדחיסה - אחרי הכתיבה (wait) compressed_size הוא גודל הקובץ"""
+
+    def __init__(self, path, futures, size):
+        self.path = path
+        self.futures = futures
+        self.size = size
+        self.compressed_size = None
+
+
+class CompressionStage:
+    """submit(נתיב, בתים) מחזיר מיד; wait() ממתין לכתיבת כל מה שבתור"""
+
+    def __init__(self, workers=None, block_size=BLOCK_SIZE, max_pending=MAX_PENDING_BYTES):
+        self.workers = workers or os.cpu_count() or 1
+        self.block_size = block_size
+        self.max_pending = max_pending
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.queue = queue.Queue()
+        self.pending = 0  # בתים לא דחוסים שעוד לא נכתבו
+        self.room = threading.Condition()
+        self.written = []  # (נתיב, גודל) לפי סדר הכתיבה, מאז ה-wait האחרון
+        self.encode_seconds = 0.0  # סכום זמני משימות הדחיסה (זמן קיר ומעבד של החוטים)
+        self.encode_cpu_seconds = 0.0
+        self.timing = threading.Lock()
+        self.error = None
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def submit(self, path, payload, encoder=None):
+        """הדחיסה מתחילה מיד; הקובץ נכתב אחרי התוצרים שלפניו.
+        בלי encoder - gzip מרובה-איברים בבלוקים; עם encoder - encoder(payload) כמשימה אחת"""
+        if self.error is not None:
+            raise self.error
+        with self.room:
+            # תוצר שגדול מהמגבלה לבדו עובר כשהתור ריק
+            while self.pending and self.pending + len(payload) > self.max_pending:
+                self.room.wait()
+            self.pending += len(payload)
+        if encoder is None:
+            futures = [self.pool.submit(self._encode, gzip_bytes, block)
+                       for block in split_blocks(payload, self.block_size)]
+        else:
+            futures = [self.pool.submit(self._encode, encoder, payload)]
+        artifact = CompressedArtifact(path, futures, len(payload))
+        self.queue.put(artifact)
+        return artifact
+
+    def _encode(self, encoder, payload):
+        start, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            return encoder(payload)
+        finally:
+            with self.timing:
+                self.encode_seconds += time.perf_counter() - start
+                self.encode_cpu_seconds += time.thread_time() - start_cpu
+
+    def _write_loop(self):
+        while True:
+            artifact = self.queue.get()
+            try:
+                if artifact is None:
+                    return
+                with open(artifact.path, 'wb') as f:
+                    for future in artifact.futures:
+                        f.write(future.result())
+                # הבתים הדחוסים כבר בקובץ - לא נשמרים בזיכרון עד סוף הבנייה
+                artifact.futures = None
+                artifact.compressed_size = os.path.getsize(artifact.path)
+                self.written.append((artifact.path, artifact.compressed_size))
+            except Exception as e:
+                if self.error is None:
+                    self.error = e
+            finally:
+                if artifact is not None:
+                    with self.room:
+                        self.pending -= artifact.size
+                        self.room.notify_all()
+                self.queue.task_done()
+
+    def wait(self):
+        """המתנה לכל התוצרים שבתור - מחזיר [(נתיב, גודל)] שנכתבו מאז ה-wait הקודם"""
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+        written, self.written = self.written, []
+        return written
+
+    def close(self):
+        """סיום החוטים (אחרי כתיבת מה שבתור)"""
+        if self.writer is None:
+            return
+        self.queue.put(None)
+        self.writer.join()
+        self.writer = None
+        self.pool.shutdown()
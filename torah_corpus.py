@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מודל משותף בזיכרון של כל נתוני התורה
+כל טבלה נטענת פעם אחת לייצוג עמודתי קומפקטי (עמודות מספריות ב-array),
+עם אינדקסים של היסטים: פסוקים לפי ספר/פרק/פסוק, כותרות לפי פסוק ושאלות לפי כותרת
+"""
+
+from array import array
+from collections import defaultdict
+
+class Record:
+    """תצוגה קלה של שורה אחת בטבלה - תומכת ב-row["ID"] וב-dict(row)"""
+
+    __slots__ = ("table", "offset")
+
+    def __init__(self, table, offset):
+        self.table = table
+        self.offset = offset
+
+    def __getitem__(self, name):
+        return self.table.data[self.table.positions[name]][self.offset]
+
+    def keys(self):
+        return self.table.names
+
+    def __repr__(self):
+        return f"Record({self.table.name}, {dict(self)})"
+
+
+class CorpusTable:
+    """טבלה בייצוג עמודתי - רשימה אחת לכל עמודה במקום מילון לכל שורה"""
+
+    __slots__ = ("name", "columns", "names", "positions", "data", "_id_index")
+
+    def __init__(self, name, columns, rows):
+        self.name = name
+        self.columns = columns
+        self.names = [column["name"] for column in columns]
+        self.positions = {column_name: i for i, column_name in enumerate(self.names)}
+        self._id_index = None
+
+        data = [list(values) for values in zip(*rows)] if rows else [[] for _ in self.names]
+        for i, values in enumerate(data):
+            # עמודה שכולה מספרים שלמים נשמרת כ-array רציף
+            if values and all(type(value) is int for value in values):
+                try:
+                    data[i] = array('q', values)
+                except OverflowError:
+                    pass
+        self.data = data
+
+    def __len__(self):
+        return len(self.data[0]) if self.data else 0
+
+    def column(self, name):
+        """העמודה כולה לפי שם"""
+        return self.data[self.positions[name]]
+
+    def record(self, offset):
+        return Record(self, offset)
+
+    def records(self):
+        """כל השורות לפי סדר הטבלה"""
+        for offset in range(len(self)):
+            yield Record(self, offset)
+
+    def iter_dicts(self):
+        """כל השורות כמילונים (לייצוא)"""
+        names = self.names
+        for row in zip(*self.data):
+            yield dict(zip(names, row))
+
+    def offset_of(self, row_id):
+        """היסט השורה לפי ID (האינדקס נבנה בפעם הראשונה)"""
+        if self._id_index is None:
+            self._id_index = {value: offset for offset, value in enumerate(self.column("ID"))}
+        return self._id_index.get(row_id)
+
+
+class TorahCorpus:
+    def __init__(self):
+        self.tables = {}
+        self.books = []
+        self.book_by_id = {}
+        self.parshiot = []
+        self.chapters_by_book = defaultdict(list)
+        self.verse_by_ref = {}
+
+        # סדר ממוין של היסטים + טווח (התחלה, סוף) לכל קבוצה
+        self._verse_order = array('q')
+        self._chapter_spans = {}
+        self._title_order = array('q')
+        self._title_spans = {}
+        self._question_order = array('q')
+        self._question_spans = {}
+
+    @classmethod
+    def load(cls, conn, book_id=None):
+        """טעינת כל הטבלאות בסריקה אחת לכל טבלה (או רק נתוני ספר אחד)"""
+        corpus = cls()
+        cursor = conn.cursor()
+
+        if book_id is None:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+            for (table_name,) in [tuple(row) for row in cursor.fetchall()]:
+                corpus.tables[table_name] = cls.read_table(cursor, table_name, f"SELECT * FROM {table_name}")
+        else:
+            params = (book_id,)
+            corpus.tables["tbl_Sefer"] = cls.read_table(
+                cursor, "tbl_Sefer", "SELECT * FROM tbl_Sefer WHERE ID = ?", params)
+            corpus.tables["tbl_Torah"] = cls.read_table(
+                cursor, "tbl_Torah", "SELECT * FROM tbl_Torah WHERE Sefer = ?", params)
+            corpus.tables["tbl_Title"] = cls.read_table(cursor, "tbl_Title", """
+                SELECT t.* FROM tbl_Title t
+                JOIN tbl_Torah tor ON t.TorahID = tor.ID
+                WHERE tor.Sefer = ?
+            """, params)
+            corpus.tables["tbl_Question"] = cls.read_table(cursor, "tbl_Question", """
+                SELECT q.* FROM tbl_Question q
+                JOIN tbl_Title t ON q.TitleID = t.ID
+                JOIN tbl_Torah tor ON t.TorahID = tor.ID
+                WHERE tor.Sefer = ?
+            """, params)
+
+        corpus._build_indexes()
+        return corpus
+
+    @staticmethod
+    def read_table(cursor, table_name, query, params=()):
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        names = [description[0] for description in cursor.description]
+        columns = [dict(zip(names, row)) for row in cursor.fetchall()]
+
+        cursor.execute(query, params)
+        return CorpusTable(table_name, columns, cursor.fetchall())
+
+    @staticmethod
+    def _group(keys, order):
+        """טווחי (התחלה, סוף) בתוך order לכל ערך מפתח רצוף"""
+        spans = {}
+        start = 0
+        for position in range(1, len(order) + 1):
+            if position == len(order) or keys[order[position]] != keys[order[start]]:
+                spans[keys[order[start]]] = (start, position)
+                start = position
+        return spans
+
+    def _build_indexes(self):
+        sefer = self.tables["tbl_Sefer"]
+        self.books = sorted(sefer.records(), key=lambda book: book["ID"])
+        self.book_by_id = {book["ID"]: book for book in self.books}
+
+        # פסוקים לפי ספר, פרק ומספר פסוק
+        torah = self.tables["tbl_Torah"]
+        books, chapters, numbers = torah.column("Sefer"), torah.column("Perek"), torah.column("PasukNum")
+        order = sorted(range(len(torah)), key=lambda i: (books[i], chapters[i], numbers[i]))
+        self._verse_order = array('q', order)
+        chapter_keys = list(zip(books, chapters))
+        self._chapter_spans = self._group(chapter_keys, order)
+        for book_id, chapter_num in self._chapter_spans:
+            self.chapters_by_book[book_id].append(chapter_num)
+        self.verse_by_ref = {(books[i], chapters[i], numbers[i]): i for i in order}
+
+        # כותרות לפי פסוק, שאלות לפי כותרת
+        title = self.tables["tbl_Title"]
+        torah_ids, title_ids = title.column("TorahID"), title.column("ID")
+        order = sorted(range(len(title)), key=lambda i: (torah_ids[i], title_ids[i]))
+        self._title_order = array('q', order)
+        self._title_spans = self._group(torah_ids, order)
+
+        question = self.tables["tbl_Question"]
+        parent_ids, question_ids = question.column("TitleID"), question.column("ID")
+        order = sorted(range(len(question)), key=lambda i: (parent_ids[i], question_ids[i]))
+        self._question_order = array('q', order)
+        self._question_spans = self._group(parent_ids, order)
+
+        if "tbl_Parsha" in self.tables:
+            self.parshiot = sorted(self.tables["tbl_Parsha"].records(), key=lambda parsha: parsha["ID"])
+
+    def _records(self, table_name, order, span):
+        table = self.tables[table_name]
+        if span is None:
+            return []
+        return [Record(table, order[position]) for position in range(*span)]
+
+    def book_name(self, book_id):
+        book = self.book_by_id.get(book_id)
+        return book["SeferName"] if book is not None else None
+
+    def chapters(self, book_id):
+        """מספרי הפרקים של ספר לפי הסדר"""
+        return self.chapters_by_book.get(book_id, [])
+
+    def verses(self, book_id, chapter_num):
+        """הפסוקים של פרק לפי הסדר"""
+        return self._records("tbl_Torah", self._verse_order, self._chapter_spans.get((book_id, chapter_num)))
+
+    def verse(self, book_id, chapter_num, verse_num):
+        """פסוק בודד לפי מיקום, או None"""
+        offset = self.verse_by_ref.get((book_id, chapter_num, verse_num))
+        return None if offset is None else Record(self.tables["tbl_Torah"], offset)
+
+    def titles(self, torah_id):
+        """הכותרות של פסוק"""
+        return self._records("tbl_Title", self._title_order, self._title_spans.get(torah_id))
+
+    def questions(self, title_id):
+        """השאלות של כותרת"""
+        return self._records("tbl_Question", self._question_order, self._question_spans.get(title_id))
+
+    def verse_questions(self, torah_id):
+        """זוגות (כותרת, שאלה) של פסוק לפי הסדר"""
+        return [(title, question) for title in self.titles(torah_id) for question in self.questions(title["ID"])]
+
+    def parshiot_with_book_names(self, table_name="tbl_Parsha"):
+        """שורות טבלת פרשות עם SeferName, לפי ID (כמו JOIN עם tbl_Sefer)"""
+        table = self.tables.get(table_name)
+        if table is None:
+            return []
+        rows = []
+        for parsha in sorted(table.records(), key=lambda row: row["ID"]):
+            book_name = self.book_name(parsha["SeferID"])
+            if book_name is not None:
+                rows.append(dict(parsha, SeferName=book_name))
+        return rows
+
+    def iter_verses(self, book_id=None):
+        """כל הפסוקים לפי סדר ספר, פרק, פסוק"""
+        torah = self.tables["tbl_Torah"]
+        for offset in self._verse_order:
+            verse = Record(torah, offset)
+            if book_id is None or verse["Sefer"] == book_id:
+                yield verse
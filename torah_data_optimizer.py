@@ -7,25 +7,82 @@
 
 import sqlite3
 import json
-import gzip
+import hashlib
 import os
+import shutil
+import argparse
 import base64
+import fnmatch
 from datetime import datetime
+from functools import partial
 from collections import defaultdict
 
+from torah_corpus import TorahCorpus
+import torah_delta
+import torah_dictionary
+from torah_compress import CompressionStage
+from torah_encodings import (MANIFEST_FILE, available_encodings, build_manifest, encode, strip_encoding,
+                             submit_variants, write_variants)
+from torah_incremental import CORE_TABLES, BuildState, ContentFingerprints
+from torah_metrics import BuildMetrics, measured
+from torah_parallel import list_book_ids, map_books
+from torah_parsha import ParshaIndex
+from torah_publish import PUBLISHED_DIR, logical_name, publish, transfer_size
+from torah_search_index import SearchIndexBuilder, shard_file_name
+from torah_serializer import BACKENDS, dumps, use_backend
+from torah_stats import load_stats
+
+# קבצי האתר שלא מתפרסמים בשם לפי תוכן: נקודת הכניסה וה-service worker (חייבים כתובת קבועה)
+ENTRY_FILES = ("index.html", "sw.js", "precache-manifest.json")
+
+# מעטפת האתר - נשמרת מראש ומתעדכנת מהרשת בכל ביקור (network-first)
+SHELL_FILES = ("./", "asset-manifest.json")
+
+# התוצרים (שמות לוגיים) שה-service worker שומר מראש: הלואדר והאינדקסים
+PRECACHE_PATTERNS = ("assets/optimized-loader.js", torah_delta.SCRIPT_FILE, "data/books.json",
+                     "data/parshiot.json", "data/parshiot/index.json", "data/search/manifest.json",
+                     "data/stats.json", "chunks/*/index.json")
+
+# סקריפטים מ-CDN שהאתר תלוי בהם - נשמרים מראש לפי יכולת (תשובה opaque)
+CDN_SCRIPTS = ("https://unpkg.com/react@18/umd/react.production.min.js",
+               "https://unpkg.com/react-dom@18/umd/react-dom.production.min.js",
+               "https://cdnjs.cloudflare.com/ajax/libs/pako/2.0.4/pako.min.js")
+
+# גבול הגודל של מטמון זמן הריצה (פרקים, פרשות, חיפוש) - הישן ביותר בשימוש נמחק ראשון
+RUNTIME_CACHE_BYTES = 16 * 1024 * 1024
+
+# רשת איטית: אחרי כמה זמן המעטפת נלקחת מהמטמון
+NETWORK_TIMEOUT_MS = 3000
+
 class TorahDataOptimizer:
-    def __init__(self, db_path="torah.db", input_dir="website_data", output_dir="optimized_torah_site"):
+    def __init__(self, db_path="torah.db", input_dir="website_data", output_dir="optimized_torah_site", workers=1,
+                 incremental=False, train_dictionary=False, compress_workers=None):
         self.db_path = db_path
         self.input_dir = input_dir
         self.output_dir = output_dir
+        self.workers = workers  # מספר תהליכים לבניית ספרים במקביל
+        self.incremental = incremental  # בנייה רק של תוצרים שהקלטים שלהם השתנו
         self.conn = None
+        self.corpus = None
+        self.build_state = None
+        self.torah_stats = None  # ספירות מוכנות לכל ספר/פרק/פסוק (torah_stats)
+        self.encodings_manifest = None  # גודל כל קובץ בכל קידוד (torah_encodings)
+        self.train_dictionary = train_dictionary  # אימון מילון חדש גם כשיש מילון קיים
+        self.dictionary = None  # המילון המשותף לדחיסת הפרקים (torah_dictionary)
+        self.dictionary_id = None
+        self.asset_manifest = None  # שם לוגי -> שם לפי תוכן (torah_publish)
+        self.compress_workers = compress_workers  # חוטי הדחיסה (ברירת מחדל: כל הליבות)
+        self.compression = None  # שלב הדחיסה המקבילי של כל הקידודים (torah_compress)
+        self.compressed_callbacks = []  # רשומות שרצות אחרי הניקוז (after_compression)
+        self.metrics = BuildMetrics("TorahDataOptimizer")  # זמן/שאילתות/שורות/בתים/זיכרון לכל שלב
         
         # סטטיסטיקות אופטימיזציה
         self.stats = {
             "original_size": 0,
             "optimized_size": 0,
             "compression_ratio": 0,
-            "files_created": 0
+            "files_created": 0,
+            "encoded_sizes": {}  # קידוד -> סך הבתים של כל הקבצים בקידוד הזה
         }
     
     def connect_db(self):
@@ -34,6 +91,19 @@ class TorahDataOptimizer:
         self.conn.row_factory = sqlite3.Row
         print(f"✅ מחובר ל-{self.db_path}")
     
+    def load_corpus(self):
+        """טעינת כל הטבלאות לזיכרון פעם אחת לכל ההרצה"""
+        if self.corpus is None:
+            self.corpus = TorahCorpus.load(self.conn)
+        return self.corpus
+    
+    def skip_unchanged(self, artifact, fingerprint):
+        """במצב מצטבר - דילוג על קובץ שהקלטים שלו לא השתנו"""
+        if not self.build_state.is_fresh(artifact, fingerprint):
+            return False
+        print(f"  ⏭️ {artifact}: ללא שינוי")
+        return True
+    
     def setup_directories(self):
         """יצירת מבנה תיקיות אופטימלי"""
         directories = [
@@ -48,13 +118,14 @@ class TorahDataOptimizer:
             os.makedirs(directory, exist_ok=True)
             print(f"📁 {directory}")
     
+    @measured
     def create_optimized_books_index(self):
         """יצירת אינדקס ספרים אופטימלי - מיני קובץ מהיר"""
         print("\n📚 יוצר אינדקס ספרים אופטימלי...")
         
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM tbl_Sefer ORDER BY ID")
-        books = cursor.fetchall()
+        fingerprint = self.build_state.fingerprints.of_tables(*CORE_TABLES)
+        if self.skip_unchanged("data/books.json.gz", fingerprint):
+            return None
         
         # מבנה מינימלי וחכם
         optimized_index = {
@@ -63,189 +134,284 @@ class TorahDataOptimizer:
             "b": []  # books (שם קצר)
         }
         
-        for book in books:
-            book_id = book["ID"]
-            
-            # ספירות מהירות
-            cursor.execute("SELECT COUNT(DISTINCT Perek) FROM tbl_Torah WHERE Sefer = ?", (book_id,))
-            chapters = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM tbl_Torah WHERE Sefer = ?", (book_id,))
-            verses = cursor.fetchone()[0]
-            
-            cursor.execute("""
-                SELECT COUNT(q.ID) FROM tbl_Question q
-                JOIN tbl_Title t ON q.TitleID = t.ID
-                JOIN tbl_Torah tor ON t.TorahID = tor.ID
-                WHERE tor.Sefer = ?
-            """, (book_id,))
-            questions = cursor.fetchone()[0]
-            
+        # ספירות מוכנות מראש ב-torah_stats - בלי מעבר על הפסוקים
+        for book_id, book_stats in self.torah_stats.books.items():
             # מבנה מידע קומפקטי
             book_data = {
                 "i": book_id,                    # id
-                "n": book["SeferName"],          # name
-                "s": self.create_slug(book["SeferName"]),  # slug
-                "c": chapters,                   # chapters
-                "v": verses,                     # verses  
-                "q": questions,                  # questions
-                "f": f"chunks/book_{book_id}.gz" # file
+                "n": book_stats["name"],         # name
+                "s": self.create_slug(book_stats["name"]),  # slug
+                "c": book_stats["chapters"],     # chapters
+                "v": book_stats["verses"],       # verses  
+                "q": book_stats["questions"],    # questions
+                "f": f"chunks/book_{book_id}/index.json"  # chapter directory
             }
             
             optimized_index["b"].append(book_data)
         
         # שמירה עם דחיסה מקסימלית
-        compressed_data = self.compress_json(optimized_index)
-        with open(f"{self.output_dir}/data/books.gz", "wb") as f:
-            f.write(compressed_data)
+        variants = self.write_artifact("data/books.json", optimized_index)
+        self.build_state.record("data/books.json.gz", fingerprint)
         
-        print(f"  ✅ אינדקס ספרים: {len(compressed_data)} בתים (דחוס)")
+        self.after_compression(lambda: print(f"  ✅ אינדקס ספרים: {self.transfer_size(variants)} בתים (דחוס)"))
         return optimized_index
     
-    def create_optimized_book_chunks(self):
-        """יצירת חלקי ספרים אופטימליים - כל פרק נפרד"""
-        print("\n📖 יוצר חלקי ספרים אופטימליים...")
+    @measured
+    def prepare_dictionary(self):
+        """המילון המשותף - נשאר קבוע בין בניות (הדפדפן שומר אותו במטמון) עד --train-dictionary"""
+        print("\n📕 מכין מילון דחיסה משותף...")
         
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM tbl_Sefer ORDER BY ID")
-        books = cursor.fetchall()
+        pointer_path = f"{self.output_dir}/{torah_dictionary.POINTER_FILE}.gz"
+        if not self.train_dictionary and os.path.exists(pointer_path):
+            try:
+                reader = torah_dictionary.DictionaryReader(self.output_dir)
+                self.dictionary, self.dictionary_id = reader.dictionary, reader.id
+                print(f"  ⏭️ מילון {self.dictionary_id}: ללא שינוי")
+                return
+            except (OSError, ValueError, KeyError) as e:
+                print(f"  ⚠️ המילון הקיים לא נקרא ({e}) - מאמן מחדש")
         
-        for book in books:
-            book_id = book["ID"]
-            book_name = book["SeferName"]
-            
-            print(f"  📚 מעבד {book_name}...")
-            
-            # קבלת כל הפרקים
-            cursor.execute("""
-                SELECT DISTINCT Perek FROM tbl_Torah 
-                WHERE Sefer = ? ORDER BY Perek
-            """, (book_id,))
-            chapters = [row[0] for row in cursor.fetchall()]
-            
-            # מבנה ספר אופטימלי
-            book_data = {
-                "i": book_id,          # book id
-                "n": book_name,        # name
-                "c": len(chapters),    # chapters count
-                "ch": []               # chapters
-            }
-            
-            for chapter_num in chapters[:5]:  # מגביל ל-5 פרקים ראשונים לבדיקה
+        # דגימות האימון - הפרקים עצמם, באותו פורמט שבו הם נדחסים
+        samples = []
+        for book_id in list_book_ids(self.conn):
+            for chapter_num in self.torah_stats.chapter_numbers(book_id):
                 chapter_data = self.optimize_chapter(book_id, chapter_num)
                 if chapter_data:
-                    book_data["ch"].append(chapter_data)
-            
-            # שמירה דחוסה
-            compressed_book = self.compress_json(book_data)
-            
-            with open(f"{self.output_dir}/chunks/book_{book_id}.gz", "wb") as f:
-                f.write(compressed_book)
+                    samples.append(dumps(chapter_data))
+        
+        self.dictionary = torah_dictionary.train_dictionary(samples)
+        self.dictionary_id = torah_dictionary.dictionary_id(self.dictionary)
+        
+        # מילונים קודמים נמחקים - כל הקבצים שנדחסו איתם נבנים מחדש
+        dictionary_dir = f"{self.output_dir}/data/dictionary"
+        os.makedirs(dictionary_dir, exist_ok=True)
+        for filename in os.listdir(dictionary_dir):
+            os.remove(f"{dictionary_dir}/{filename}")
+        dictionary_file = torah_dictionary.dictionary_path(self.dictionary_id)
+        # המילון עצמו טקסט - נשמר כמו שהוא וגם בכל הקידודים
+        write_variants(f"{self.output_dir}/{dictionary_file}", encode(self.dictionary), identity=True)
+        self.write_artifact(torah_dictionary.POINTER_FILE, {
+            "i": self.dictionary_id,      # version id
+            "f": dictionary_file,         # dictionary file
+            "s": len(self.dictionary),    # size
+            "n": len(samples)             # samples
+        })
+        print(f"  ✅ מילון {self.dictionary_id}: {len(self.dictionary):,} בתים מ-{len(samples)} פרקים")
+    
+    @measured
+    def create_optimized_book_chunks(self):
+        """יצירת חלקי ספרים אופטימליים - קובץ דחוס לכל פרק + מדריך פרקים לכל ספר"""
+        print("\n📖 יוצר חלקי ספרים אופטימליים...")
+        
+        # רק פרקים שהתוכן שלהם (או המילון) השתנה נבנים מחדש; ספר שלא השתנה מדולג כולו
+        fingerprints = self.build_state.fingerprints
+        stale = {}
+        for book_id in list_book_ids(self.conn):
+            chapters = [
+                chapter_num for chapter_num in self.torah_stats.chapter_numbers(book_id)
+                if not self.build_state.is_fresh(f"chunks/book_{book_id}/ch_{chapter_num}.json.gz",
+                                                 self.chapter_fingerprint(book_id, chapter_num))
+            ]
+            if chapters or not self.skip_unchanged(f"chunks/book_{book_id}/index.json.gz",
+                                                   fingerprints.combine(fingerprints.of_book(book_id),
+                                                                        self.dictionary_id)):
+                stale[book_id] = chapters
+        
+        if self.workers > 1:
+            # כל ספר נבנה בתהליך נפרד - הדחיסה כאן, בשלב הדחיסה, כמו בבנייה הסדרתית
+            chunks = map_books(self.db_path, list(stale), build_chapter_chunks, self.workers, stale)
+        else:
+            chunks = (
+                self.build_chapter_chunks(self.load_corpus().book_by_id[book_id], chapters)
+                for book_id, chapters in stale.items()
+            )
+        
+        for book_id, book_name, chapter_chunks in chunks:
+            book_dir = f"{self.output_dir}/chunks/book_{book_id}"
+            os.makedirs(book_dir, exist_ok=True)
             
-            print(f"    ✅ {book_name}: {len(compressed_book)} בתים")
+            # הפרקים נדחסים ברקע בזמן שהבנייה ממשיכה; הרשומות והמדריך - אחרי הניקוז
+            pending = [
+                (chapter_num, self.write_payload(f"chunks/book_{book_id}/ch_{chapter_num}.json", payload),
+                 self.write_packed(f"chunks/book_{book_id}/ch_{chapter_num}.json", payload))
+                for chapter_num, payload in chapter_chunks
+            ]
+            self.after_compression(partial(self.finish_book_chunks, book_id, book_name, pending))
+    
+    def finish_book_chunks(self, book_id, book_name, pending):
+        """אחרי הדחיסה: [גודל, hash, גודל עם מילון] של כל פרק שנבנה, ומדריך הפרקים של הספר"""
+        for chapter_num, variants, packed in pending:
+            self.build_state.record(f"chunks/book_{book_id}/ch_{chapter_num}.json.gz",
+                                    self.chapter_fingerprint(book_id, chapter_num),
+                                    [*self.file_entry(variants), packed.compressed_size])
+        
+        directory = self.write_book_directory(book_id, book_name)
+        self.after_compression(lambda: print(f"    ✅ {book_name}: {len(pending)} פרקים נבנו, "
+                                             f"מדריך: {self.transfer_size(directory)} בתים"))
+    
+    def chapter_fingerprint(self, book_id, chapter_num):
+        fingerprints = self.build_state.fingerprints
+        return fingerprints.combine(fingerprints.of_chapter(book_id, chapter_num), self.dictionary_id)
+    
+    def write_book_directory(self, book_id, book_name):
+        """מדריך הפרקים של ספר: [פרק, פסוקים, שאלות, גודל, hash, גודל עם מילון] לכל פרק - נטען לפני הפרק הראשון
+        (מחזיר את הקידודים של המדריך)"""
+        chapter_numbers = self.torah_stats.chapter_numbers(book_id)
+        
+        # קבצי פרקים שכבר לא קיימים בספר נמחקים
+        current = {f"ch_{chapter_num}.json" for chapter_num in chapter_numbers}
+        for filename in os.listdir(f"{self.output_dir}/chunks/book_{book_id}"):
+            logical = strip_encoding(filename) or filename.removesuffix(torah_dictionary.EXTENSION)
+            if filename.startswith("ch_") and logical not in current:
+                os.remove(f"{self.output_dir}/chunks/book_{book_id}/{filename}")
+        
+        chapters = []
+        for chapter_num in chapter_numbers:
+            chapter_stats = self.torah_stats.chapter(book_id, chapter_num)
+            size, digest, packed_size = self.build_state.info(f"chunks/book_{book_id}/ch_{chapter_num}.json.gz")
+            chapters.append([chapter_num, chapter_stats["verses"], chapter_stats["questions"], size, digest, packed_size])
+        
+        directory = {
+            "i": book_id,              # book id
+            "n": book_name,            # name
+            "c": len(chapters),        # chapters count
+            "d": self.dictionary_id,   # dictionary id (ch_<n>.json.zd)
+            "ch": chapters             # [n, verses, questions, size, hash, dictionary size]
+        }
+        fingerprints = self.build_state.fingerprints
+        variants = self.write_artifact(f"chunks/book_{book_id}/index.json", directory)
+        self.build_state.record(f"chunks/book_{book_id}/index.json.gz",
+                                fingerprints.combine(fingerprints.of_book(book_id), self.dictionary_id))
+        return variants
+    
+    def build_chapter_chunks(self, book, chapter_numbers):
+        """בניית הפרקים של ספר אחד: [(פרק, JSON קומפקטי), ...] - הדחיסה בשלב הדחיסה"""
+        book_id = book["ID"]
+        book_name = book["SeferName"]
+        
+        print(f"  📚 מעבד {book_name}...")
+        
+        chapter_chunks = []
+        for chapter_num in chapter_numbers:
+            chapter_data = self.optimize_chapter(book_id, chapter_num)
+            if chapter_data:
+                chapter_chunks.append((chapter_num, dumps(chapter_data)))
+        
+        return book_id, book_name, chapter_chunks
     
     def optimize_chapter(self, book_id, chapter_num):
-        """אופטימיזציה של פרק יחיד"""
-        cursor = self.conn.cursor()
+        """אופטימיזציה של פרק יחיד - כל הפסוקים וכל השאלות, מקובצות לפי כותרת"""
+        corpus = self.load_corpus()
         
         # קבלת פסוקים
-        cursor.execute("""
-            SELECT ID, PasukNum, Pasuk FROM tbl_Torah 
-            WHERE Sefer = ? AND Perek = ? ORDER BY PasukNum
-        """, (book_id, chapter_num))
-        verses = cursor.fetchall()
+        verses = corpus.verses(book_id, chapter_num)
         
         if not verses:
             return None
         
         chapter_data = {
+            "b": book_id,      # book id
             "n": chapter_num,  # chapter number
             "v": []            # verses
         }
         
         for verse in verses:
-            torah_id = verse["ID"]
-            verse_num = verse["PasukNum"] 
-            verse_text = verse["Pasuk"]
-            
-            # קבלת שאלות (מהיר ויעיל)
-            cursor.execute("""
-                SELECT t.Title, q.Question FROM tbl_Question q
-                JOIN tbl_Title t ON q.TitleID = t.ID
-                WHERE t.TorahID = ? LIMIT 10
-            """, (torah_id,))
-            questions = cursor.fetchall()
-            
-            # מבנה פסוק אופטימלי
-            verse_data = {
-                "n": verse_num,     # number
-                "t": verse_text,    # text
-                "q": len(questions) # questions count
-            }
-            
-            # רק אם יש שאלות - הוסף אותן (בצורה דחוסה)
-            if questions:
-                verse_data["qs"] = []
-                for title, question in questions:
-                    verse_data["qs"].append({
-                        "ti": title,    # title
-                        "q": question   # question
-                    })
-            
-            chapter_data["v"].append(verse_data)
+            chapter_data["v"].append(self.optimize_verse(verse))
         
         return chapter_data
     
+    def optimize_verse(self, verse):
+        """פסוק אחד עם כל השאלות, מקובצות לפי כותרת"""
+        corpus = self.load_corpus()
+        
+        torah_id = verse["ID"]
+        verse_num = verse["PasukNum"] 
+        verse_text = verse["Pasuk"]
+        
+        # שאלות לפי כותרת: [כותרת, [שאלות]]
+        groups = []
+        question_count = 0
+        for title in corpus.titles(torah_id):
+            questions = [question["Question"] for question in corpus.questions(title["ID"])]
+            if questions:
+                groups.append([title["Title"], questions])
+                question_count += len(questions)
+        
+        # מבנה פסוק אופטימלי
+        verse_data = {
+            "i": torah_id,        # torah id
+            "n": verse_num,       # number
+            "t": verse_text,      # text
+            "q": question_count   # questions count
+        }
+        
+        # רק אם יש שאלות - הוסף אותן
+        if groups:
+            verse_data["g"] = groups
+        
+        return verse_data
+    
+    @measured
     def create_search_optimized_index(self):
-        """יצירת אינדקס חיפוש אופטימלי"""
+        """יצירת אינדקס חיפוש הפוך ברסיסים קטנים + מניפסט אתחול זעיר"""
         print("\n🔍 יוצר אינדקס חיפוש אופטימלי...")
         
-        cursor = self.conn.cursor()
+        fingerprint = self.build_state.fingerprints.of_tables(*CORE_TABLES)
+        if self.skip_unchanged("data/search/manifest.json.gz", fingerprint):
+            return
         
-        # אינדקס פסוקים (מינימלי)
-        cursor.execute("""
-            SELECT tor.ID, tor.Sefer, tor.Perek, tor.PasukNum, 
-                   LEFT(tor.Pasuk, 50) as ShortText, s.SeferName
-            FROM tbl_Torah tor
-            JOIN tbl_Sefer s ON tor.Sefer = s.ID
-            ORDER BY tor.Sefer, tor.Perek, tor.PasukNum
-        """)
-        
-        search_index = []
-        for row in cursor.fetchall():
-            # מבנה מינימלי לחיפוש
-            search_entry = [
-                row["ID"],           # 0: torah_id
-                row["Sefer"],        # 1: sefer_id  
-                row["Perek"],        # 2: chapter
-                row["PasukNum"],     # 3: verse
-                row["ShortText"],    # 4: text preview
-                row["SeferName"]     # 5: sefer_name
-            ]
-            search_index.append(search_entry)
+        builder = SearchIndexBuilder.from_corpus(self.load_corpus())
         
-        # דחיסה מקסימלית לחיפוש
-        compressed_search = self.compress_json(search_index)
+        # רסיסים ישנים (של מילים שכבר לא קיימות) נמחקים
+        search_dir = f"{self.output_dir}/data/search"
+        shutil.rmtree(search_dir, ignore_errors=True)
+        os.makedirs(search_dir)
         
-        with open(f"{self.output_dir}/data/search.gz", "wb") as f:
-            f.write(compressed_search)
+        def write_search_file(name, data):
+            return name, self.write_artifact(f"data/search/{name}.json", data)
         
-        print(f"  ✅ אינדקס חיפוש: {len(compressed_search)} בתים")
+        # רסיס לכל אות ראשונה או זוג אותיות: מילה -> רשימות מזהים
+        shards = builder.shards()
+        shard_files = {key: write_search_file(shard_file_name(key), shard) for key, shard in shards.items()}
+        
+        # רשומות התוצאות בבלוקים לפי מזהה
+        doc_files = {
+            "v": {str(block): write_search_file(f"v_{block}", docs) for block, docs in builder.verse_blocks().items()},
+            "q": {str(block): write_search_file(f"q_{block}", docs) for block, docs in builder.question_blocks().items()}
+        }
+        
+        # הגדלים וה-hash של הקבצים ידועים אחרי הדחיסה - המניפסט מושלם ונכתב אחרי הניקוז
+        manifest = builder.manifest({}, {})
+        self.after_compression(partial(self.finish_search_manifest, fingerprint, manifest, shard_files, doc_files))
     
+    def finish_search_manifest(self, fingerprint, manifest, shard_files, doc_files):
+        """אחרי הדחיסה: [שם, גודל, hash] של כל רסיס ובלוק במניפסט החיפוש"""
+        def resolve(files):
+            return {key: [name, *self.file_entry(variants)] for key, (name, variants) in files.items()}
+        
+        manifest["shards"] = resolve(shard_files)
+        manifest["docs"] = {kind: resolve(files) for kind, files in doc_files.items()}
+        variants = self.write_artifact("data/search/manifest.json", manifest)
+        self.build_state.record("data/search/manifest.json.gz", fingerprint)
+        
+        sizes = [entry[1] for entry in manifest["shards"].values()]
+        self.after_compression(lambda: print(
+            f"  ✅ אינדקס חיפוש: {manifest['counts']['tokens']:,} מילים, {len(sizes)} רסיסים "
+            f"({min(sizes):,}-{max(sizes):,} בתים), מניפסט: {self.transfer_size(variants):,} בתים"))
+    
+    @measured
     def create_parshiot_optimized(self):
         """פרשות אופטימליות"""
         print("\n📜 יוצר פרשות אופטימליות...")
         
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT p.ID, p.ParshaName, p.SeferID, p.StartPerek, p.StartPasuk, s.SeferName
-            FROM tbl_Parsha p
-            JOIN tbl_Sefer s ON p.SeferID = s.ID
-            ORDER BY p.ID
-        """)
+        fingerprint = self.build_state.fingerprints.of_tables("tbl_Parsha", "tbl_Sefer")
+        if self.skip_unchanged("data/parshiot.json.gz", fingerprint):
+            return
+        
+        corpus = self.load_corpus()
         
         parshiot = []
-        for row in cursor.fetchall():
+        for row in corpus.parshiot_with_book_names():
             parsha = [
                 row["ID"],           # 0: id
                 row["ParshaName"],   # 1: name
@@ -256,13 +422,116 @@ class TorahDataOptimizer:
             ]
             parshiot.append(parsha)
         
-        compressed_parshiot = self.compress_json(parshiot)
+        variants = self.write_artifact("data/parshiot.json", parshiot)
+        self.build_state.record("data/parshiot.json.gz", fingerprint)
+        
+        self.after_compression(lambda: print(f"  ✅ פרשות: {self.transfer_size(variants)} בתים"))
+    
+    @measured
+    def create_parsha_bundles(self):
+        """חבילה דחוסה לכל פרשה (פסוקים, כותרות ושאלות) + אינדקס טווחים (ספר, פרק, פסוק) -> פרשה"""
+        print("\n📖 יוצר חבילות פרשות...")
+        
+        fingerprints = self.build_state.fingerprints
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name = 'tbl_Parsha'")
+        if not cursor.fetchone():
+            print("  ⚠️ אין טבלת פרשות - מדלג")
+            return
+        cursor.execute("SELECT * FROM tbl_Parsha")
+        parsha_index = ParshaIndex(cursor.fetchall())
+        
+        bundle_dir = f"{self.output_dir}/data/parshiot"
+        os.makedirs(bundle_dir, exist_ok=True)
+        
+        # כל חבילה תלויה בפרקים שהיא פורשת ובנקודות ההתחלה (שקובעות את סופה)
+        bundle_fingerprints = {}
+        for parsha_id, book_id, start, end in parsha_index.intervals():
+            chapters = [
+                chapter_num for chapter_num in self.torah_stats.chapter_numbers(book_id)
+                if start[0] <= chapter_num and (end is None or chapter_num <= end[0])
+            ]
+            bundle_fingerprints[parsha_id] = fingerprints.combine(
+                fingerprints.of_tables("tbl_Parsha", "tbl_Sefer"),
+                *(fingerprints.of_chapter(book_id, chapter_num) for chapter_num in chapters)
+            )
+        
+        stale = {
+            parsha_id for parsha_id, fingerprint in bundle_fingerprints.items()
+            if not self.build_state.is_fresh(f"data/parshiot/p_{parsha_id}.json.gz", fingerprint)
+        }
+        index_fingerprint = fingerprints.combine(*sorted(bundle_fingerprints.values()))
+        if not stale and self.skip_unchanged("data/parshiot/index.json.gz", index_fingerprint):
+            return
+        
+        # החבילות נדחסות ברקע בזמן שהבנייה ממשיכה; הרשומות ואינדקס הטווחים - אחרי הניקוז
+        pending = {}
+        for parsha_id, book_id, start, end in parsha_index.intervals():
+            if parsha_id in stale:
+                bundle = self.build_parsha_bundle(parsha_id, parsha_index.names[parsha_id], book_id, start, end)
+                variants = self.write_artifact(f"data/parshiot/p_{parsha_id}.json", bundle)
+                pending[parsha_id] = variants, len(bundle["v"]), bundle["q"]
+        
+        # חבילות של פרשות שכבר לא קיימות נמחקות
+        current = {f"p_{parsha_id}.json" for parsha_id in parsha_index.ids} | {"index.json"}
+        for filename in os.listdir(bundle_dir):
+            if strip_encoding(filename) not in current:
+                os.remove(f"{bundle_dir}/{filename}")
+        
+        self.after_compression(partial(self.finish_parsha_index, parsha_index, bundle_fingerprints,
+                                       index_fingerprint, pending))
+    
+    def finish_parsha_index(self, parsha_index, bundle_fingerprints, index_fingerprint, pending):
+        """אחרי הדחיסה: נקודות ההתחלה לחיפוש בינארי + [גודל, hash, פסוקים, שאלות] לכל חבילה"""
+        bundle_files = {}
+        for parsha_id in parsha_index.ids:
+            artifact = f"data/parshiot/p_{parsha_id}.json.gz"
+            if parsha_id in pending:
+                variants, verse_count, question_count = pending[parsha_id]
+                self.build_state.record(artifact, bundle_fingerprints[parsha_id], [
+                    *self.file_entry(variants), verse_count, question_count
+                ])
+            bundle_files[str(parsha_id)] = self.build_state.info(artifact)
+        
+        index = dict(parsha_index.to_dict(), f=bundle_files)
+        variants = self.write_artifact("data/parshiot/index.json", index)
+        self.build_state.record("data/parshiot/index.json.gz", index_fingerprint)
+        
+        sizes = [entry[0] for entry in bundle_files.values()]
+        self.after_compression(lambda: print(
+            f"  ✅ {len(bundle_files)} חבילות פרשות ({len(pending)} נבנו, {min(sizes):,}-{max(sizes):,} בתים), "
+            f"אינדקס טווחים: {self.transfer_size(variants):,} בתים"))
+    
+    def build_parsha_bundle(self, parsha_id, parsha_name, book_id, start, end):
+        """כל הפסוקים של פרשה, מנקודת ההתחלה ועד תחילת הפרשה הבאה (end=None - עד סוף הספר)"""
+        corpus = self.load_corpus()
+        
+        verses = []
+        question_count = 0
+        for chapter_num in corpus.chapters(book_id):
+            if chapter_num < start[0] or (end is not None and chapter_num > end[0]):
+                continue
+            for verse in corpus.verses(book_id, chapter_num):
+                ref = (verse["Perek"], verse["PasukNum"])
+                if ref < start or (end is not None and ref >= end):
+                    continue
+                verse_data = dict(c=chapter_num, **self.optimize_verse(verse))
+                question_count += verse_data["q"]
+                verses.append(verse_data)
         
-        with open(f"{self.output_dir}/data/parshiot.gz", "wb") as f:
-            f.write(compressed_parshiot)
+        last = [verses[-1]["c"], verses[-1]["n"]] if verses else None
         
-        print(f"  ✅ פרשות: {len(compressed_parshiot)} בתים")
+        return {
+            "i": parsha_id,        # parsha id
+            "n": parsha_name,      # name
+            "b": book_id,          # book id
+            "s": list(start),      # [chapter, verse] first
+            "e": last,             # [chapter, verse] last
+            "q": question_count,   # questions count
+            "v": verses            # verses (+ "c": chapter)
+        }
     
+    @measured
     def create_optimized_loader(self):
         """יצירת JavaScript loader אופטימלי"""
         print("\n⚡ יוצר JavaScript loader...")
@@ -270,47 +539,153 @@ class TorahDataOptimizer:
         loader_js = '''
 // Torah Data Loader - אופטימלי ומהיר
 class OptimizedTorahLoader {
-    constructor() {
+    // dictionary: פרקים נטענים מ-X.json.zd (deflate עם מילון משותף) - קטנים יותר,
+    // אבל דורשים את המילון (פעם אחת) ואת pako. כדאי כשטוענים הרבה קבצים קטנים
+    constructor({ dictionary = false } = {}) {
+        this.siteURL = './';
         this.baseURL = './data/';
+        this.assets = null;
+        this.useDictionary = dictionary;
+        this.dictionaries = new Map();
         this.cache = new Map();
-        this.decompress = this.initDecompression();
+        // null - עוד לא ידוע; true - השרת מגיש X.json דחוס (Content-Encoding); false - רק X.json.gz
+        this.negotiated = null;
+        this.pako = null;
+        // עותקים שמורים שמתעדכנים ב-patches (assets/torah-delta.js, נטען לפני הלואדר)
+        this.versions = new TorahVersionedStore('torah-data', this.siteURL);
     }
     
-    initDecompression() {
-        // Pako - ספריית דחיסה מהירה
-        const script = document.createElement('script');
-        script.src = 'https://cdnjs.cloudflare.com/ajax/libs/pako/2.0.4/pako.min.js';
-        document.head.appendChild(script);
-        return new Promise(resolve => {
-            script.onload = () => resolve(true);
-        });
+    loadPako() {
+        // Pako נטען רק כגיבוי - לשרת בלי Content-Encoding ודפדפן בלי DecompressionStream
+        if (!this.pako) {
+            this.pako = new Promise((resolve, reject) => {
+                const script = document.createElement('script');
+                script.src = 'https://cdnjs.cloudflare.com/ajax/libs/pako/2.0.4/pako.min.js';
+                script.onload = () => resolve(true);
+                script.onerror = reject;
+                document.head.appendChild(script);
+            });
+        }
+        return this.pako;
     }
     
-    async loadCompressed(filename) {
+    // asset-manifest.json: שם לוגי -> שם לפי תוכן. רק הוא נבדק מחדש בכל טעינה;
+    // כל השאר immutable. בלי מניפסט - השמות הקבועים
+    loadAssetManifest() {
+        if (!this.assets) {
+            this.assets = fetch(this.siteURL + 'asset-manifest.json', { cache: 'no-cache' })
+                .then(response => response.ok ? response.json() : { files: {} })
+                .catch(() => ({ files: {} }));
+        }
+        return this.assets;
+    }
+    
+    // כתובת הקובץ: { path, query, logical, version, patches } - שם לפי תוכן כבר מזהה את הגרסה, בלי ?v=
+    async resolve(filename) {
+        const [path, query] = filename.split('?');
+        const logical = new URL(this.baseURL + path, 'https://site/').pathname.slice(1);
+        const manifest = await this.loadAssetManifest();
+        const hashed = manifest.files[logical];
+        if (hashed) {
+            return { path: this.siteURL + hashed, query: '', logical, version: hashed,
+                     patches: (manifest.patches || {})[logical] };
+        }
+        return { path: this.baseURL + path, query: query ? '?' + query : '', logical, version: null };
+    }
+    
+    loadCompressed(filename) {
+        // המטמון שומר את ה-Promise - בקשה לקובץ שכבר בטעינה (למשל prefetch) לא יוצאת פעמיים
         if (this.cache.has(filename)) {
             return this.cache.get(filename);
         }
         
+        const promise = this.fetchCompressed(filename);
+        this.cache.set(filename, promise);
+        promise.catch(() => this.cache.delete(filename));
+        return promise;
+    }
+    
+    async fetchCompressed(filename) {
         try {
-            await this.decompress; // חכה לטעינת pako
-            
-            const response = await fetch(this.baseURL + filename);
-            if (!response.ok) throw new Error(`Failed to load ${filename}`);
-            
-            const compressed = await response.arrayBuffer();
-            const decompressed = pako.ungzip(compressed, { to: 'string' });
-            const data = JSON.parse(decompressed);
-            
-            this.cache.set(filename, data);
-            return data;
+            const url = await this.resolve(filename);
+            return await this.versions.load(url, () => this.fetchFull(filename, url));
         } catch (error) {
             console.error(`Error loading ${filename}:`, error);
             throw error;
         }
     }
     
+    async fetchFull(filename, url) {
+        // השרת בוחר לפי encodings.json את X.json.br/.zst/.gz ושולח Content-Encoding -
+        // הדפדפן פותח את הדחיסה בעצמו
+        if (this.negotiated !== false) {
+            const response = await fetch(url.path + url.query);
+            if (response.ok) {
+                this.negotiated = true;
+                return await response.json();
+            }
+            if (response.status !== 404 || this.negotiated) throw new Error(`Failed to load ${filename}`);
+            this.negotiated = false;
+        }
+        return await this.fetchGzip(url);
+    }
+    
+    async fetchGzip(url) {
+        // שרת סטטי פשוט: הקובץ X.json.gz עצמו, נפתח בדפדפן
+        const response = await fetch(url.path + '.gz' + url.query);
+        if (!response.ok) throw new Error(`Failed to load ${url.path}`);
+        
+        if (typeof DecompressionStream !== 'undefined') {
+            const stream = response.body.pipeThrough(new DecompressionStream('gzip'));
+            return JSON.parse(await new Response(stream).text());
+        }
+        await this.loadPako();
+        return JSON.parse(pako.ungzip(new Uint8Array(await response.arrayBuffer()), { to: 'string' }));
+    }
+    
+    // המילון נשמר בשם לפי ה-hash שלו - נטען פעם אחת ונשאר במטמון הדפדפן
+    loadDictionary(dictionaryId) {
+        if (!this.dictionaries.has(dictionaryId)) {
+            const promise = this.resolve(`dictionary/${dictionaryId}.bin`).then(url => fetch(url.path)).then(response => {
+                if (!response.ok) throw new Error(`Failed to load dictionary ${dictionaryId}`);
+                return response.arrayBuffer();
+            }).then(buffer => new Uint8Array(buffer));
+            this.dictionaries.set(dictionaryId, promise);
+            promise.catch(() => this.dictionaries.delete(dictionaryId));
+        }
+        return this.dictionaries.get(dictionaryId);
+    }
+    
+    // X.json.zd - הקובץ שנדחס עם המילון המשותף (אותו מטמון כמו loadCompressed)
+    loadPacked(filename, dictionaryId) {
+        const key = filename + '#' + dictionaryId;
+        if (this.cache.has(key)) {
+            return this.cache.get(key);
+        }
+        
+        const promise = this.fetchPacked(filename, dictionaryId);
+        this.cache.set(key, promise);
+        promise.catch(() => this.cache.delete(key));
+        return promise;
+    }
+    
+    async fetchPacked(filename, dictionaryId) {
+        const url = await this.resolve(filename);
+        return this.versions.load(url, () => this.fetchPackedFull(filename, url, dictionaryId));
+    }
+    
+    async fetchPackedFull(filename, url, dictionaryId) {
+        const [response, dictionary] = await Promise.all([
+            fetch(url.path + '.zd' + url.query),
+            this.loadDictionary(dictionaryId),
+            this.loadPako()
+        ]);
+        if (!response.ok) throw new Error(`Failed to load ${filename}`);
+        return JSON.parse(pako.inflate(new Uint8Array(await response.arrayBuffer()), { dictionary, to: 'string' }));
+    }
+    
     async loadBooksIndex() {
-        const data = await this.loadCompressed('books.gz');
+        const data = await this.loadCompressed('books.json');
         
         // המרה מפורמט אופטימלי לפורמט רגיל
         return {
@@ -326,33 +701,71 @@ class OptimizedTorahLoader {
         };
     }
     
+    // מדריך הפרקים של ספר: d = מזהה המילון, ch = [[פרק, פסוקים, שאלות, גודל, hash, גודל עם מילון], ...]
+    loadBookDirectory(bookId) {
+        return this.loadCompressed(`../chunks/book_${bookId}/index.json`);
+    }
+    
+    loadChapterEntry(directory, entry) {
+        // ה-hash בכתובת - פרק שהשתנה לא נלקח ממטמון הדפדפן
+        const filename = `../chunks/book_${directory.i}/ch_${entry[0]}.json?v=${entry[4]}`;
+        // במצב מילון - רק פרק שקטן יותר עם המילון מאשר בקידוד הטוב ביותר
+        if (this.useDictionary && directory.d && entry[5] < entry[3]) {
+            return this.loadPacked(filename, directory.d);
+        }
+        return this.loadCompressed(filename);
+    }
+    
+    // פרק בודד לפי דרישה + טעינה מוקדמת של הפרק הקודם והבא ברקע
+    async loadChapter(bookId, chapterNum, prefetch = true) {
+        const directory = await this.loadBookDirectory(bookId);
+        const index = directory.ch.findIndex(entry => entry[0] === chapterNum);
+        if (index < 0) throw new Error(`Chapter ${chapterNum} not found in book ${bookId}`);
+        
+        const chapter = await this.loadChapterEntry(directory, directory.ch[index]);
+        if (prefetch) {
+            [index + 1, index - 1]
+                .filter(i => i >= 0 && i < directory.ch.length)
+                .forEach(i => this.loadChapterEntry(directory, directory.ch[i]).catch(() => {}));
+        }
+        return this.expandChapter(chapter);
+    }
+    
+    // המרה מפורמט אופטימלי לפורמט רגיל
+    expandVerse(verse) {
+        return {
+            torah_id: verse.i,
+            verse_number: verse.n,
+            text: verse.t,
+            total_questions: verse.q,
+            question_groups: (verse.g || []).map(([title, questions]) => ({ title, questions }))
+        };
+    }
+    
+    expandChapter(chapter) {
+        return {
+            chapter_number: chapter.n,
+            verses: chapter.v.map(verse => this.expandVerse(verse))
+        };
+    }
+    
+    // ספר שלם - כל הפרקים (עדיף loadChapter, שמוריד רק את הפרק המבוקש)
     async loadBook(bookId) {
-        const data = await this.loadCompressed(`../chunks/book_${bookId}.gz`);
+        const directory = await this.loadBookDirectory(bookId);
+        const chapters = await Promise.all(directory.ch.map(entry => this.loadChapterEntry(directory, entry)));
         
-        // המרה לפורמט רגיל
         return {
             book_info: {
-                id: data.i,
-                name: data.n,
-                chapter_count: data.c
+                id: directory.i,
+                name: directory.n,
+                chapter_count: directory.c
             },
-            chapters: data.ch.map(chapter => ({
-                chapter_number: chapter.n,
-                verses: chapter.v.map(verse => ({
-                    verse_number: verse.n,
-                    text: verse.t,
-                    total_questions: verse.q,
-                    question_groups: verse.qs ? [{
-                        title: "שאלות",
-                        questions: verse.qs.map(q => q.q)
-                    }] : []
-                }))
-            }))
+            chapters: chapters.map(chapter => this.expandChapter(chapter))
         };
     }
     
     async loadParshiot() {
-        const data = await this.loadCompressed('parshiot.gz');
+        const data = await this.loadCompressed('parshiot.json');
         
         return {
             parshiot: data.map(p => ({
@@ -367,23 +780,189 @@ class OptimizedTorahLoader {
         };
     }
     
-    async searchVerses(query) {
-        const searchData = await this.loadCompressed('search.gz');
+    // אינדקס הטווחים: b = ספר -> [[פרק, פסוק, מזהה פרשה], ...] ממוין, f = מזהה -> [גודל, hash, פסוקים, שאלות]
+    loadParshaIndex() {
+        return this.loadCompressed('parshiot/index.json');
+    }
+    
+    // הפרשה של פסוק - חיפוש בינארי על נקודות ההתחלה של הספר
+    async findParsha(bookId, chapter, verse) {
+        const index = await this.loadParshaIndex();
+        const starts = index.b[bookId] || [];
+        let low = 0, high = starts.length;
+        while (low < high) {
+            const middle = (low + high) >> 1;
+            const [startChapter, startVerse] = starts[middle];
+            if (startChapter < chapter || (startChapter === chapter && startVerse <= verse)) low = middle + 1;
+            else high = middle;
+        }
+        return low > 0 ? starts[low - 1][2] : null;
+    }
+    
+    // פרשה שלמה מקובץ אחד - פסוקים, כותרות ושאלות
+    async loadParsha(parshaId) {
+        const index = await this.loadParshaIndex();
+        const entry = index.f[parshaId];
+        if (!entry) throw new Error(`Parsha ${parshaId} not found`);
+        
+        const data = await this.loadCompressed(`parshiot/p_${parshaId}.json?v=${entry[1]}`);
+        return {
+            id: data.i,
+            name: data.n,
+            sefer_id: data.b,
+            start: { chapter: data.s[0], verse: data.s[1] },
+            end: data.e ? { chapter: data.e[0], verse: data.e[1] } : null,
+            total_questions: data.q,
+            verses: data.v.map(verse => ({ chapter: verse.c, ...this.expandVerse(verse) }))
+        };
+    }
+    
+    // נרמול זהה ל-normalize_hebrew ב-torah_search_index.py
+    normalizeHebrew(text) {
+        return text
+            .replace(/[\\u05BE\\u05C0\\u05C3\\u05C6]/g, ' ')
+            .replace(/[\\u0591-\\u05C7]/g, '')
+            .replace(/[\\u05F3\\u05F4'"]/g, '')
+            .replace(/[ךםןףץ]/g, ch => 'כמנפצ'['ךםןףץ'.indexOf(ch)])
+            .toLowerCase();
+    }
+    
+    tokenize(text) {
+        return this.normalizeHebrew(text).match(/[\\p{L}\\p{N}_]+/gu) || [];
+    }
+    
+    // מניפסט האתחול: מפתח רסיס -> [שם, גודל, hash], ובלוקי רשומות התוצאות
+    loadSearchManifest() {
+        return this.loadCompressed('search/manifest.json');
+    }
+    
+    loadSearchFile(entry) {
+        // ה-hash בכתובת - קובץ שהשתנה לא נלקח ממטמון הדפדפן
+        return this.loadCompressed(`search/${entry[0]}.json?v=${entry[2]}`);
+    }
+    
+    // הרסיסים שמכילים מילים שמתחילות ב-token (או את token עצמו כשאינו קידומת)
+    async loadSearchShards(token, asPrefix) {
+        const manifest = await this.loadSearchManifest();
+        let keys;
+        if (asPrefix) {
+            keys = Object.keys(manifest.shards).filter(key => key.startsWith(token) || token.startsWith(key));
+        } else {
+            // רסיס של שתי האותיות הראשונות אם קיים, אחרת של האות הראשונה
+            const key = token.slice(0, 2) in manifest.shards ? token.slice(0, 2) : token[0];
+            keys = key in manifest.shards ? [key] : [];
+        }
+        return Promise.all(keys.map(key => this.loadSearchFile(manifest.shards[key])));
+    }
+    
+    decodePostings(deltas) {
+        const ids = new Array(deltas.length);
+        let value = 0;
+        for (let i = 0; i < deltas.length; i++) {
+            value += deltas[i];
+            ids[i] = value;
+        }
+        return ids;
+    }
+    
+    intersect(a, b) {
+        const result = [];
+        let i = 0, j = 0;
+        while (i < a.length && j < b.length) {
+            if (a[i] === b[j]) { result.push(a[i]); i++; j++; }
+            else if (a[i] < b[j]) i++;
+            else j++;
+        }
+        return result;
+    }
+    
+    // מזהים שמכילים את כל מילות השאילתה - המילה האחרונה כקידומת (חיפוש תוך כדי הקלדה)
+    async searchIds(query, kind) {
+        const tokens = this.tokenize(query);
+        let result = null;
         
-        const results = searchData
-            .filter(item => item[4].includes(query))
-            .slice(0, 20)
-            .map(item => ({
-                torah_id: item[0],
-                sefer_id: item[1],
-                chapter: item[2],
-                verse: item[3],
-                text: item[4],
-                sefer_name: item[5],
-                reference: `${item[5]} ${item[2]}:${item[3]}`
-            }));
+        for (let i = 0; i < tokens.length; i++) {
+            const asPrefix = i === tokens.length - 1;
+            const shards = await this.loadSearchShards(tokens[i], asPrefix);
+            let ids;
+            
+            if (asPrefix) {
+                const merged = new Set();
+                for (const shard of shards) {
+                    for (const token in shard[kind]) {
+                        if (token.startsWith(tokens[i])) {
+                            this.decodePostings(shard[kind][token]).forEach(id => merged.add(id));
+                        }
+                    }
+                }
+                ids = [...merged].sort((a, b) => a - b);
+            } else {
+                const postings = shards.length ? shards[0][kind][tokens[i]] : null;
+                ids = postings ? this.decodePostings(postings) : [];
+            }
+            
+            result = result === null ? ids : this.intersect(result, ids);
+            if (!result.length) break;
+        }
         
-        return results;
+        return result || [];
+    }
+    
+    // רשומות התוצאות - נטענים רק הבלוקים של המזהים המבוקשים
+    async loadSearchDocs(kind, ids) {
+        const manifest = await this.loadSearchManifest();
+        const blocks = [...new Set(ids.map(id => Math.floor(id / manifest.block_size)))];
+        const docs = new Map();
+        
+        const loaded = await Promise.all(blocks.map(block => this.loadSearchFile(manifest.docs[kind][block])));
+        loaded.forEach(block => {
+            // בלוק שאלות: הכותרות בטבלת מחרוזות, והשורה מחזיקה את המיקום
+            if (Array.isArray(block)) {
+                block.forEach(row => docs.set(row[0], row));
+                return;
+            }
+            const titles = block.strings.title;
+            block.rows.forEach(row => {
+                const doc = row.slice();
+                doc[5] = row[5] === null ? null : titles[row[5]];
+                docs.set(doc[0], doc);
+            });
+        });
+        return docs;
+    }
+    
+    async searchVerses(query, limit = 20) {
+        const meta = await this.loadSearchManifest();
+        const ids = (await this.searchIds(query, 'v')).slice(0, limit);
+        const docs = await this.loadSearchDocs('v', ids);
+        
+        return ids.map(id => docs.get(id)).map(item => ({
+            torah_id: item[0],
+            sefer_id: item[1],
+            chapter: item[2],
+            verse: item[3],
+            text: item[4],
+            sefer_name: meta.books[item[1]],
+            reference: `${meta.books[item[1]]} ${item[2]}:${item[3]}`
+        }));
+    }
+    
+    async searchQuestions(query, limit = 20) {
+        const meta = await this.loadSearchManifest();
+        const ids = (await this.searchIds(query, 'q')).slice(0, limit);
+        const docs = await this.loadSearchDocs('q', ids);
+        
+        return ids.map(id => docs.get(id)).map(item => ({
+            question_id: item[0],
+            torah_id: item[1],
+            sefer_id: item[2],
+            chapter: item[3],
+            verse: item[4],
+            title: item[5],
+            question: item[6],
+            sefer_name: meta.books[item[2]],
+            reference: `${meta.books[item[2]]} ${item[3]}:${item[4]}`
+        }));
     }
 }
 
@@ -416,11 +995,19 @@ window.useOptimizedTorahData = function() {
 };
         '''.strip()
         
-        with open(f"{self.output_dir}/assets/optimized-loader.js", "w", encoding="utf-8") as f:
-            f.write(loader_js)
+        self.write_text_asset("assets/optimized-loader.js", loader_js)
+        # העותקים השמורים וה-patches - סקריפט משותף עם index.html של website_data
+        self.write_text_asset(torah_delta.SCRIPT_FILE, torah_delta.SCRIPT)
         
         print("  ✅ JavaScript loader נוצר")
     
+    @measured
+    def publish_assets(self):
+        """עותק בשם לפי תוכן לכל תוצר + asset-manifest.json (להגשה עם Cache-Control: immutable)"""
+        print("\n🔖 מפרסם תוצרים בשמות לפי תוכן...")
+        self.asset_manifest = publish(self.output_dir, exclude=ENTRY_FILES)
+    
+    @measured
     def create_optimized_html(self):
         """יצירת HTML אופטימלי"""
         print("\n🌐 יוצר HTML אופטימלי...")
@@ -433,7 +1020,7 @@ window.useOptimizedTorahData = function() {
     <title>תורה אינטראקטיבית - מהיר ויעיל</title>
     
     <!-- Preload קבצים קריטיים -->
-    <link rel="preload" href="data/books.gz" as="fetch" crossorigin>
+    <link rel="preload" href="data/books.json" as="fetch" crossorigin>
     <link rel="preload" href="assets/optimized-loader.js" as="script">
     
     <!-- CSS מינימלי מוטמע -->
@@ -461,6 +1048,7 @@ window.useOptimizedTorahData = function() {
     <!-- Scripts בסדר אופטימלי -->
     <script src="https://unpkg.com/react@18/umd/react.production.min.js"></script>
     <script src="https://unpkg.com/react-dom@18/umd/react-dom.production.min.js"></script>
+    <script src="assets/torah-delta.js"></script>
     <script src="assets/optimized-loader.js"></script>
     
     <script>
@@ -495,24 +1083,236 @@ window.useOptimizedTorahData = function() {
         }
         
         ReactDOM.render(React.createElement(App), document.getElementById('root'));
+        
+        // Service worker: פתיחה מיידית בביקור חוזר ועבודה בלי רשת
+        if ('serviceWorker' in navigator) {
+            window.addEventListener('load', () => navigator.serviceWorker.register('sw.js').catch(() => {}));
+        }
     </script>
 </body>
 </html>'''.strip()
         
-        with open(f"{self.output_dir}/index.html", "w", encoding="utf-8") as f:
-            f.write(html_content)
+        # הלואדר והאינדקס - בשם לפי תוכן (index.html עצמו נשאר בשם קבוע ונבדק מחדש)
+        assets = self.asset_manifest["files"] if self.asset_manifest else {}
+        for path in ("assets/optimized-loader.js", torah_delta.SCRIPT_FILE, "data/books.json"):
+            html_content = html_content.replace(f'"{path}"', f'"{assets.get(path, path)}"')
+        
+        self.write_text_asset("index.html", html_content)
         
         print("  ✅ HTML אופטימלי נוצר")
     
-    def compress_json(self, data):
-        """דחיסה מקסימלית של JSON"""
-        # JSON מינימלי (ללא רווחים)
-        json_str = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    @measured
+    def create_service_worker(self):
+        """sw.js + precache-manifest.json: המעטפת והאינדקסים נשמרים מראש, פרקים ופרשות בזמן ריצה"""
+        print("\n📴 יוצר service worker לעבודה בלי רשת...")
         
-        # דחיסה עם gzip
-        compressed = gzip.compress(json_str.encode('utf-8'), compresslevel=9)
+        # [כתובת לפי תוכן, גודל העברה] - כתובת שהתוכן שלה לא משתנה, כך שמה שנשמר לא מתיישן
+        assets = self.asset_manifest["files"] if self.asset_manifest else {}
+        files = [
+            [target, transfer_size(self.output_dir, target)]
+            for path, target in sorted(assets.items())
+            if any(fnmatch.fnmatch(path, pattern) for pattern in PRECACHE_PATTERNS)
+        ]
+        precache = {"shell": list(SHELL_FILES), "files": files, "external": list(CDN_SCRIPTS)}
+        # הגרסה בתוך sw.js - precache חדש משנה את sw.js, והדפדפן מתקין אותו מחדש
+        version = hashlib.sha256(json.dumps(precache, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        precache = {"version": version, **precache}
+        self.write_text_asset("precache-manifest.json",
+                              json.dumps(precache, ensure_ascii=False, separators=(',', ':')))
         
-        return compressed
+        sw_js = '''
+// Torah Service Worker - נוצר אוטומטית ע"י torah_data_optimizer.py
+// precache: המעטפת, הלואדר והאינדקסים (precache-manifest.json);
+// runtime: פרקים, פרשות וחיפוש - מטמון עם גבול גודל, הישן ביותר בשימוש נמחק ראשון
+const VERSION = '__VERSION__';
+const PRECACHE = 'torah-precache-' + VERSION;
+const RUNTIME = 'torah-runtime';
+const RUNTIME_MAX_BYTES = __RUNTIME_MAX_BYTES__;
+const NETWORK_TIMEOUT_MS = __NETWORK_TIMEOUT_MS__;
+const SHELL = new Set(__SHELL__);
+const SCOPE = new URL(self.registration.scope).pathname;
+
+self.addEventListener('install', event => {
+    event.waitUntil(precache().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(caches.keys().then(names => Promise.all(
+        names.filter(name => name.startsWith('torah-precache-') && name !== PRECACHE).map(name => caches.delete(name))
+    )).then(() => self.clients.claim()));
+});
+
+async function precache() {
+    const manifest = await (await fetch('precache-manifest.json?v=' + VERSION, { cache: 'no-cache' })).json();
+    const cache = await caches.open(PRECACHE);
+    await cache.addAll(manifest.shell);
+    await Promise.all(manifest.files.map(async ([url]) => {
+        // כמו ה-loader: X.json עם Content-Encoding, ובשרת סטטי פשוט X.json.gz
+        let response = await fetch(url);
+        if (response.status === 404 && url.endsWith('.json')) {
+            url += '.gz';
+            response = await fetch(url);
+        }
+        if (!response.ok) throw new Error('Failed to precache ' + url);
+        await cache.put(url, response);
+    }));
+    // React ו-pako מ-CDN - לפי יכולת, בלי להכשיל את ההתקנה
+    await Promise.all(manifest.external.map(url => fetch(url, { mode: 'no-cors' })
+        .then(response => cache.put(url, response)).catch(() => {})));
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+    if (url.origin !== location.origin) {
+        event.respondWith(caches.match(request).then(cached => cached || fetch(request)));
+        return;
+    }
+    const path = url.pathname.slice(SCOPE.length);
+    if (path.startsWith('immutable/')) {
+        event.respondWith(cacheFirst(request));
+    } else if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(request, './'));
+    } else if (SHELL.has(path)) {
+        event.respondWith(networkFirst(request, path));
+    }
+});
+
+// המעטפת: מהרשת (ועדכון העותק), אבל ברשת איטית או בלי רשת - העותק השמור
+async function networkFirst(request, key) {
+    const cache = await caches.open(PRECACHE);
+    const network = fetch(request).then(response => {
+        if (response.ok) cache.put(key, response.clone());
+        return response;
+    });
+    const cached = await cache.match(key);
+    if (!cached) return network;
+    const timeout = new Promise(resolve => setTimeout(() => resolve(cached), NETWORK_TIMEOUT_MS));
+    return Promise.race([network.catch(() => cached), timeout]);
+}
+
+// immutable/: התוכן של כתובת לא משתנה לעולם - מהמטמון אם יש, אחרת מהרשת ולמטמון ה-runtime
+async function cacheFirst(request) {
+    const cached = await caches.match(request);
+    if (cached) {
+        touch(request.url);
+        return cached;
+    }
+    let response;
+    try {
+        response = await fetch(request);
+    } catch (error) {
+        // בלי רשת, כשנשמר X.json.gz: 404 מעביר את ה-loader ל-X.json.gz (כמו שרת סטטי)
+        if (await caches.match(request.url + '.gz')) return new Response(null, { status: 404 });
+        throw error;
+    }
+    if (response.ok) await remember(request, response.clone());
+    return response;
+}
+
+// מטמון ה-runtime: כתובת -> גודל, לפי סדר השימוש (הישן ראשון)
+let runtimeIndex = null;
+
+function responseSize(response) {
+    const length = Number(response.headers.get('Content-Length'));
+    return length ? Promise.resolve(length) : response.clone().blob().then(blob => blob.size);
+}
+
+function loadRuntimeIndex(cache) {
+    if (!runtimeIndex) {
+        runtimeIndex = cache.keys().then(async requests => {
+            const index = new Map();
+            for (const request of requests) {
+                index.set(request.url, await responseSize(await cache.match(request)));
+            }
+            return index;
+        });
+    }
+    return runtimeIndex;
+}
+
+function touch(url) {
+    if (!runtimeIndex) return;
+    runtimeIndex.then(index => {
+        if (!index.has(url)) return;
+        const size = index.get(url);
+        index.delete(url);
+        index.set(url, size);
+    });
+}
+
+async function remember(request, response) {
+    const cache = await caches.open(RUNTIME);
+    const index = await loadRuntimeIndex(cache);
+    const size = await responseSize(response);
+    if (size > RUNTIME_MAX_BYTES) return;
+    await cache.put(request, response);
+    index.delete(request.url);
+    index.set(request.url, size);
+    
+    let total = 0;
+    index.forEach(entrySize => { total += entrySize; });
+    for (const [url, entrySize] of index) {
+        if (total <= RUNTIME_MAX_BYTES) break;
+        index.delete(url);
+        total -= entrySize;
+        await cache.delete(url);
+    }
+}
+        '''.strip()
+        for placeholder, value in (("__VERSION__", version), ("__RUNTIME_MAX_BYTES__", RUNTIME_CACHE_BYTES),
+                                   ("__NETWORK_TIMEOUT_MS__", NETWORK_TIMEOUT_MS),
+                                   ("__SHELL__", json.dumps(list(SHELL_FILES)))):
+            sw_js = sw_js.replace(placeholder, str(value))
+        self.write_text_asset("sw.js", sw_js)
+        
+        size = sum(entry[1] for entry in files)
+        print(f"  ✅ sw.js + precache-manifest.json: {len(files)} קבצים מראש ({size:,} בתים), "
+              f"מטמון runtime עד {RUNTIME_CACHE_BYTES // 1024 // 1024} MB")
+    
+    def write_artifact(self, filepath, data):
+        """JSON מינימלי שנשמר דחוס בכל הקידודים (X.br, X.zst, X.gz) - מחזיר PendingVariants"""
+        return self.write_payload(filepath, dumps(data))
+    
+    def write_payload(self, filepath, payload):
+        """כל קידוד נדחס כתוצר נפרד בשלב הדחיסה; הקבצים נכתבים עד finish_compression"""
+        return submit_variants(self.compression, f"{self.output_dir}/{filepath}", payload)
+    
+    def write_packed(self, filepath, payload):
+        """הקובץ שנדחס עם המילון המשותף (X.zd) - compressed_size אחרי finish_compression"""
+        path = f"{self.output_dir}/{filepath}{torah_dictionary.EXTENSION}"
+        return self.compression.submit(path, payload, partial(torah_dictionary.compress, dictionary=self.dictionary))
+    
+    def after_compression(self, callback):
+        """רשומה שתלויה בגדלים הדחוסים (מדריך, מניפסט, הדפסת גודל) - רצה אחרי הניקוז,
+        כך ששלב לא ממתין לדחיסה של עצמו והדחיסה חופפת לשלבים הבאים"""
+        self.compressed_callbacks.append(callback)
+    
+    def finish_compression(self):
+        """ניקוז שלב הדחיסה ואז הרשומות שחיכו לגדלים - שוב ושוב, כי הן כותבות קבצים משלהן"""
+        print("\n🗜️ משלים דחיסה, מדריכים ומניפסטים...")
+        while True:
+            with self.metrics.stage("compress_wait"):
+                self.compression.wait()
+            if not self.compressed_callbacks:
+                break
+            callbacks, self.compressed_callbacks = self.compressed_callbacks, []
+            with self.metrics.stage("compressed_entries"):
+                for callback in callbacks:
+                    callback()
+    
+    def write_text_asset(self, filepath, text):
+        """קובץ סטטי (JS/HTML) - נשמר כמו שהוא וגם בכל הקידודים"""
+        write_variants(f"{self.output_dir}/{filepath}", encode(text.encode('utf-8')), identity=True)
+    
+    def transfer_size(self, variants):
+        """גודל ההעברה - הקידוד הקטן ביותר (אחרי שהקידודים נכתבו)"""
+        return min(size for encoding, size in variants.sizes().items() if encoding != "identity")
+    
+    def file_entry(self, variants):
+        """[גודל העברה, hash של התוכן] - ה-hash לא תלוי בקידודים הזמינים"""
+        return [self.transfer_size(variants), variants.digest[:16]]
     
     def create_slug(self, text):
         """יצירת slug"""
@@ -525,6 +1325,7 @@ window.useOptimizedTorahData = function() {
         }
         return hebrew_to_english.get(text, text.lower().replace(" ", "-"))
     
+    @measured
     def calculate_stats(self):
         """חישוב סטטיסטיקות חיסכון"""
         # גודל מקורי
@@ -536,13 +1337,28 @@ window.useOptimizedTorahData = function() {
             )
             self.stats["original_size"] = original_size
         
-        # גודל אופטימלי
+        # גודל אופטימלי - מה שהדפדפן מוריד: הקידוד הקטן של כל קובץ מקודד, ושאר הקבצים כמו שהם
+        # (העותקים בשם לפי תוכן ב-immutable/ לא נספרים פעמיים)
         if os.path.exists(self.output_dir):
-            optimized_size = sum(
-                os.path.getsize(os.path.join(dirpath, filename))
-                for dirpath, dirnames, filenames in os.walk(self.output_dir)
-                for filename in filenames
-            )
+            optimized_size = 0
+            for dirpath, dirnames, filenames in os.walk(self.output_dir):
+                for filename in filenames:
+                    relative = os.path.relpath(os.path.join(dirpath, logical_name(filename)), self.output_dir)
+                    relative = relative.replace(os.sep, "/")
+                    if relative.startswith(PUBLISHED_DIR + "/"):
+                        continue
+                    size = os.path.getsize(os.path.join(dirpath, filename))
+                    if filename.endswith(torah_dictionary.EXTENSION):
+                        # חלופה לקידודים (נטענת רק במצב מילון), לא עוד קובץ להורדה
+                        self.stats["encoded_sizes"]["dictionary"] = self.stats["encoded_sizes"].get("dictionary", 0) + size
+                    elif relative not in self.encodings_manifest["files"]:
+                        optimized_size += size
+            for relative, entry in self.encodings_manifest["files"].items():
+                if relative.startswith(PUBLISHED_DIR + "/"):
+                    continue
+                optimized_size += min(entry["encodings"].values())
+                for encoding, size in entry["encodings"].items():
+                    self.stats["encoded_sizes"][encoding] = self.stats["encoded_sizes"].get(encoding, 0) + size
             self.stats["optimized_size"] = optimized_size
         
         # יחס דחיסה
@@ -557,25 +1373,48 @@ window.useOptimizedTorahData = function() {
         print("🚀 מתחיל אופטימיזציה מאסיבית של נתוני התורה")
         print("=" * 60)
         
+        self.metrics.begin()
         try:
             # 1. התכוננות
             self.connect_db()
+            self.metrics.attach(self.conn)
             self.setup_directories()
+            with self.metrics.stage("scan_fingerprints"):
+                self.build_state = BuildState(self.output_dir, ContentFingerprints.scan(self.conn), self.incremental)
+            with self.metrics.stage("load_stats"):
+                self.torah_stats = load_stats(self.conn, self.build_state, "data/stats.json.gz")
+            self.compression = CompressionStage(self.compress_workers)
+            self.prepare_dictionary()
             
             # 2. אופטימיזציה של הנתונים
             self.create_optimized_books_index()
             self.create_optimized_book_chunks()
             self.create_search_optimized_index()
             self.create_parshiot_optimized()
+            self.create_parsha_bundles()
+            # הפרסום בשם לפי תוכן קורא את הקבצים מהדיסק
+            self.finish_compression()
             
             # 3. יצירת קבצי אתר
             self.create_optimized_loader()
+            self.publish_assets()
             self.create_optimized_html()
+            self.create_service_worker()
+            self.build_state.save()
+            
+            # מניפסט הקידודים לשרת (כל התוצרים, גם אלה שלא נבנו מחדש)
+            with self.metrics.stage("build_manifest"):
+                self.encodings_manifest = build_manifest(self.output_dir)
+            print(f"\n🗜️ {MANIFEST_FILE}: {len(self.encodings_manifest['files'])} קבצים בקידודים "
+                  f"{', '.join(available_encodings())}")
             
             # 4. סטטיסטיקות
             self.calculate_stats()
             
             print("\n🎉 אופטימיזציה הושלמה!")
+            self.metrics.record_background("compress", self.compression.encode_seconds,
+                                           self.compression.encode_cpu_seconds)
+            self.metrics.finish(ok=True)
             return True
             
         except Exception as e:
@@ -584,16 +1423,41 @@ window.useOptimizedTorahData = function() {
             traceback.print_exc()
             return False
         finally:
+            if self.compression:
+                self.compression.close()
             if self.conn:
                 self.conn.close()
+            self.metrics.save(self.output_dir)
+
+def build_chapter_chunks(corpus, book_id, stale):
+    """בניית הפרקים של ספר אחד (רץ בתהליך עובד)"""
+    optimizer = TorahDataOptimizer()
+    optimizer.corpus = corpus
+    return optimizer.build_chapter_chunks(corpus.book_by_id[book_id], stale[book_id])
 
 def main():
     print("⚡ אופטימיזציה מאסיבית של אתר התורה")
     print("המרה לפורמט דחוס, מהיר ויעיל")
     print("=" * 60)
     
-    optimizer = TorahDataOptimizer()
+    parser = argparse.ArgumentParser(description="אופטימיזציה של נתוני התורה לאתר")
+    parser.add_argument("--workers", type=int, default=1, help="מספר תהליכים לבניית ספרים במקביל")
+    parser.add_argument("--incremental", action="store_true", help="בנייה רק של תוצרים שהקלטים שלהם השתנו")
+    parser.add_argument("--compress-workers", type=int, default=None,
+                        help="מספר חוטי הדחיסה (ברירת מחדל: כל הליבות)")
+    parser.add_argument("--train-dictionary", action="store_true",
+                        help="אימון מילון דחיסה חדש (ברירת מחדל: המילון הקיים נשמר בין בניות)")
+    parser.add_argument("--json-backend", choices=("auto",) + BACKENDS, default="auto",
+                        help="מנוע הקידוד של JSON (הפלט זהה בכל מנוע)")
+    parser.add_argument("--profile", action="store_true", help="הדפסת טבלת זמנים ומדדים לכל שלב")
+    args = parser.parse_args()
+    print(f"⚙️ מנוע JSON: {use_backend(args.json_backend)}")
+    
+    optimizer = TorahDataOptimizer(workers=args.workers, incremental=args.incremental,
+                                   train_dictionary=args.train_dictionary, compress_workers=args.compress_workers)
     success = optimizer.optimize_all()
+    if args.profile:
+        optimizer.metrics.print_profile()
     
     if success:
         stats = optimizer.stats
@@ -605,6 +1469,8 @@ def main():
             print(f"  🎯 חיסכון: {stats['compression_ratio']:.1f}%")
         else:
             print(f"  🗜️ גודל אופטימלי: {stats['optimized_size']:,} בתים ({stats['optimized_size']/1024/1024:.1f} MB)")
+        for encoding, size in stats["encoded_sizes"].items():
+            print(f"  📦 {encoding}: {size:,} בתים ({size/1024/1024:.1f} MB)")
         
         print(f"\n🚀 האתר האופטימלי מוכן!")
         print(f"📁 תיקייה: optimized_torah_site/")
@@ -618,7 +1484,7 @@ def main():
         
         print(f"\n🎯 השלבים הבאים:")
         print(f"  1️⃣ בדוק את optimized_torah_site/index.html")
-        print(f"  2️⃣ הרץ שרת מקומי לבדיקה")
+        print(f"  2️⃣ הרץ שרת מקומי לבדיקה: python torah_server.py --root optimized_torah_site")
         print(f"  3️⃣ העלה את כל התיקייה לנטליפיי")
         print(f"  4️⃣ תהנה מאתר תורה מהיר וחכם!")
 
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+הפרשים ברמת רשומה בין שתי גרסאות של תוצר JSON
+רשימה של רשומות עם מזהה (פסוק לפי "i"/"torah_id", פרק לפי "chapter_number" וכו')
+מושווית לפי המזהה: רק רשומות שנוספו, השתנו או נמחקו נכנסות ל-patch. כך הוספת
+שאלות בשבוע עולה ללקוח את הפסוקים שהשתנו, ולא את כל הקובץ.
+
+פורמט ה-patch (JSON):
+  {"=": ערך}                                     - החלפה
+  {"{": {מפתח: patch}, "-": [מפתחות]}              - מילון: שדות שהשתנו/נוספו, שדות שנמחקו
+  {"[": שדה מזהה, "-": [מזהים], "u": [[מזהה, patch], ...], "+": [[מיקום, רשומה], ...]}
+                                                 - רשימת רשומות: מחיקה, עדכון במקום, הוספה
+                                                   במיקום הסופי (לפי סדר עולה)
+  {"#": [[מיקום, patch], ...], ">": [איברים], "<": אורך}
+                                                 - רשימה בלי מזהים (כותרת ושאלותיה): שינוי
+                                                   לפי מיקום, איברים שנוספו בסוף או קיצור
+SCRIPT (נכתב כ-assets/torah-delta.js) מממש את אותו פורמט בדפדפן, לכל הדפים
+"""
+
+import json
+import os
+
+# הסקריפט המשותף של הדפדפן - כל דף טוען אותו לפני ה-loader שלו
+SCRIPT_FILE = "assets/torah-delta.js"
+
+# שדות שמזהים רשומה ברשימה, לפי סדר עדיפות
+ID_KEYS = ("i", "id", "ID", "torah_id", "question_id", "chapter_number", "verse_number")
+
+
+def record_key(items):
+    """השדה שמזהה את כל הרשומות ברשימה (ייחודי ופשוט), או None"""
+    if not items or not all(isinstance(item, dict) for item in items):
+        return None
+    for key in ID_KEYS:
+        ids = [item.get(key) for item in items]
+        if all(isinstance(value, (int, str)) and not isinstance(value, bool) for value in ids) \
+                and len(set(ids)) == len(ids):
+            return key
+    return None
+
+
+def _diff_records(old, new):
+    """patch של רשימת רשומות לפי מזהה, או None אם אין מזהה משותף או שהסדר השתנה"""
+    key = record_key(old)
+    if key is None or record_key(new) != key:
+        return None
+    old_by_id = {item[key]: item for item in old}
+    new_ids = {item[key] for item in new}
+    # הרשומות שנשארו חייבות לשמור על הסדר היחסי שלהן
+    kept_old = [item[key] for item in old if item[key] in new_ids]
+    kept_new = [item[key] for item in new if item[key] in old_by_id]
+    if kept_old != kept_new:
+        return None
+
+    patch = {"[": key}
+    removed = [item[key] for item in old if item[key] not in new_ids]
+    updated = []
+    added = []
+    for position, item in enumerate(new):
+        previous = old_by_id.get(item[key])
+        if previous is None:
+            added.append([position, item])
+            continue
+        change = diff(previous, item)
+        if change is not None:
+            updated.append([item[key], change])
+    if removed:
+        patch["-"] = removed
+    if updated:
+        patch["u"] = updated
+    if added:
+        patch["+"] = added
+    return patch
+
+
+def _diff_positions(old, new):
+    """patch של רשימה לפי מיקום: שינויים באיברים המשותפים + הוספה בסוף או קיצור"""
+    common = min(len(old), len(new))
+    changes = [[position, diff(old[position], new[position])] for position in range(common)]
+    patch = {"#": [change for change in changes if change[1] is not None]}
+    if len(new) > common:
+        patch[">"] = new[common:]
+    elif len(old) > common:
+        patch["<"] = common
+    return patch
+
+
+def _size(value):
+    return len(json.dumps(value, ensure_ascii=False, separators=(',', ':')))
+
+
+def diff(old, new):
+    """patch שהופך את old ל-new, או None אם הם זהים"""
+    if old == new:
+        return None
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = {}
+        for key, value in new.items():
+            if key not in old:
+                changed[key] = {"=": value}
+            else:
+                change = diff(old[key], value)
+                if change is not None:
+                    changed[key] = change
+        patch = {"{": changed}
+        removed = [key for key in old if key not in new]
+        if removed:
+            patch["-"] = removed
+        return patch
+    if isinstance(old, list) and isinstance(new, list):
+        patch = _diff_records(old, new)
+        if patch is not None:
+            return patch
+        patch = _diff_positions(old, new)
+        if _size(patch) < _size(new):
+            return patch
+    return {"=": new}
+
+
+def apply_patch(value, patch):
+    """הגרסה החדשה: value אחרי patch (value עצמו לא משתנה)"""
+    if "=" in patch:
+        return patch["="]
+    if "{" in patch:
+        result = {key: item for key, item in value.items() if key not in patch.get("-", ())}
+        for key, change in patch["{"].items():
+            result[key] = apply_patch(result.get(key), change)
+        return result
+    if "#" in patch:
+        result = value[:patch.get("<", len(value))]
+        for position, change in patch["#"]:
+            result[position] = apply_patch(result[position], change)
+        return result + patch.get(">", [])
+    key = patch["["]
+    removed = set(patch.get("-", ()))
+    updates = {record_id: change for record_id, change in patch.get("u", ())}
+    result = [
+        apply_patch(item, updates[item[key]]) if item[key] in updates else item
+        for item in value if item[key] not in removed
+    ]
+    for position, item in patch.get("+", ()):
+        result.insert(position, item)
+    return result
+
+
+# TorahVersionedStore: עותקים שמורים (Cache Storage) של תוצרים עם גרסה, שמתעדכנים דרך
+# שרשרת ה-patches של asset-manifest.json. העותק היחיד של applyPatch ב-JavaScript
+SCRIPT = '''
+// torah-delta.js - נוצר מ-torah_delta.py; פורמט ה-patch מתועד שם
+class TorahVersionedStore {
+    // cacheName - המטמון ב-Cache Storage; baseURL - הבסיס של הנתיבים ב-asset-manifest.json
+    constructor(cacheName, baseURL) {
+        this.cacheName = cacheName;
+        this.baseURL = baseURL;
+        this.store = null;
+    }
+    
+    // עותקים שמורים: שם לוגי -> { v: השם לפי תוכן, d: הנתונים }.
+    // בלי Cache Storage (למשל לא ב-https) - כל קובץ נטען במלואו
+    open() {
+        if (!this.store) {
+            this.store = typeof caches === 'undefined'
+                ? Promise.resolve(null)
+                : caches.open(this.cacheName).catch(() => null);
+        }
+        return this.store;
+    }
+    
+    // url: { logical, version, patches } - version: השם לפי תוכן (null - בלי מניפסט),
+    // patches: { שם קודם: [קובץ patch, השם הבא, גודל] } של התוצר מהמניפסט.
+    // העותק השמור אם הוא עדכני, העותק + שרשרת ה-patches אם יש, ואחרת fetchFull().
+    // הגרסה החדשה נשמרת במקום הישנה
+    async load(url, fetchFull) {
+        const store = url.version ? await this.open() : null;
+        if (!store) return fetchFull();
+        
+        const key = this.baseURL + url.logical;
+        const stored = await store.match(key).then(response => response ? response.json() : null).catch(() => null);
+        let data = stored ? await this.upgrade(url, stored).catch(() => null) : null;
+        if (!data) data = await fetchFull();
+        if (!stored || stored.v !== url.version) {
+            store.put(key, new Response(JSON.stringify({ v: url.version, d: data }))).catch(() => {});
+        }
+        return data;
+    }
+    
+    // העותק אחרי כל ה-patches עד url.version; null - אין דרך מהעותק לגרסה
+    async upgrade(url, stored) {
+        const chain = url.patches || {};
+        let data = stored.d;
+        let current = stored.v;
+        for (let step = 0; current !== url.version; step++) {
+            const link = chain[current];
+            if (!link || step >= Object.keys(chain).length) return null;
+            const response = await fetch(this.baseURL + link[0]);
+            if (!response.ok) return null;
+            data = this.applyPatch(data, await response.json());
+            current = link[1];
+        }
+        return data;
+    }
+    
+    // כמו apply_patch ב-torah_delta.py
+    applyPatch(value, patch) {
+        if ('=' in patch) return patch['='];
+        if ('#' in patch) {
+            const result = value.slice(0, '<' in patch ? patch['<'] : value.length);
+            patch['#'].forEach(([position, change]) => {
+                result[position] = this.applyPatch(result[position], change);
+            });
+            return result.concat(patch['>'] || []);
+        }
+        if ('{' in patch) {
+            const result = { ...value };
+            (patch['-'] || []).forEach(key => delete result[key]);
+            Object.entries(patch['{']).forEach(([key, change]) => {
+                result[key] = this.applyPatch(result[key], change);
+            });
+            return result;
+        }
+        const key = patch['['];
+        const removed = new Set(patch['-'] || []);
+        const updates = new Map(patch.u || []);
+        const result = value
+            .filter(item => !removed.has(item[key]))
+            .map(item => updates.has(item[key]) ? this.applyPatch(item, updates.get(item[key])) : item);
+        (patch['+'] || []).forEach(([position, item]) => result.splice(position, 0, item));
+        return result;
+    }
+}
+
+window.TorahVersionedStore = TorahVersionedStore;
+'''.strip()
+
+
+def write_script(output_dir):
+    """כתיבת SCRIPT_FILE לתיקיית הפלט - מחזיר את הנתיב"""
+    path = os.path.join(output_dir, SCRIPT_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(SCRIPT)
+    return path
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+דחיסה עם מילון משותף לקבצים קטנים (פרקי הספרים)
+קובץ קטן שנדחס לבד מתחיל כל פעם מאפס - אותן מילים בעברית ואותם מפתחות JSON
+("n", "t", "q", "g") חוזרים בכל קובץ. כאן מאמנים מילון אחד על הקורפוס
+(בחירה חמדנית של מקטעים עם הכי הרבה רצפים נפוצים, בשיטת COVER של zstd),
+וכל קובץ נדחס ב-deflate עם המילון כ-preset dictionary (zlib zdict).
+המילון נשמר פעם אחת בשם לפי ה-hash שלו, והקוראים - zlib ב-Python ו-pako בדפדפן -
+פותחים את הקבצים בלי תלות נוספת
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import zlib
+from collections import Counter
+
+from torah_serializer import dumps
+
+# חלון ה-deflate הוא 32KB - מילון ארוך יותר לא בשימוש
+DICTIONARY_SIZE = 32 * 1024
+
+# אורך מקטע שנבחר למילון, ואורך הרצף (d-mer) שלפיו מדורגים המקטעים
+SEGMENT_SIZE = 64
+DMER_SIZE = 8
+
+# תקרת בתי הדגימה לאימון (דגימות נבחרות במרווחים שווים)
+SAMPLE_LIMIT = 2 * 1024 * 1024
+
+# קובץ שנדחס עם המילון: X.json -> X.json.zd
+EXTENSION = ".zd"
+
+# המצביע למילון הנוכחי (תוצר רגיל, דחוס בכל הקידודים)
+POINTER_FILE = "data/dictionary.json"
+
+
+def _select_samples(samples, limit):
+    total = sum(len(sample) for sample in samples)
+    if total <= limit:
+        return list(samples)
+    stride = -(-total // limit)
+    return samples[::stride]
+
+
+def train_dictionary(samples, size=DICTIONARY_SIZE, segment_size=SEGMENT_SIZE, dmer_size=DMER_SIZE,
+                     sample_limit=SAMPLE_LIMIT):
+    """אימון מילון גולמי מדגימות (רשימת bytes) - אותן דגימות נותנות אותו מילון
+
+    הדגימות מחולקות ל-size/segment_size תקופות; מכל תקופה נבחר המקטע שמכסה הכי הרבה
+    רצפים שמופיעים בהרבה דגימות, והרצפים שלו לא נספרים שוב. המקטעים החשובים בסוף -
+    deflate מקודד מרחק קצר בפחות ביטים.
+    """
+    samples = _select_samples(samples, sample_limit)
+
+    # בכמה דגימות מופיע כל רצף
+    frequency = Counter()
+    for sample in samples:
+        frequency.update({sample[i:i + dmer_size] for i in range(len(sample) - dmer_size + 1)})
+
+    data = b"".join(samples)
+    epochs = max(1, size // segment_size)
+    epoch_size = max(segment_size, len(data) // epochs)
+    segments = []
+    for start in range(0, len(data), epoch_size):
+        stop = min(start + epoch_size, len(data))
+        window = Counter()
+        score = best_score = 0
+        best_start = start
+        for i in range(start, stop - dmer_size + 1):
+            dmer = data[i:i + dmer_size]
+            if not window[dmer]:
+                score += frequency[dmer]
+            window[dmer] += 1
+            # הרצף שיצא מהחלון
+            first = i - (segment_size - dmer_size)
+            if first > start:
+                old = data[first - 1:first - 1 + dmer_size]
+                window[old] -= 1
+                if not window[old]:
+                    score -= frequency[old]
+            if score > best_score:
+                best_score, best_start = score, max(start, first)
+        if not best_score:
+            continue
+        segment = data[best_start:best_start + segment_size]
+        for i in range(len(segment) - dmer_size + 1):
+            frequency[segment[i:i + dmer_size]] = 0
+        segments.append((best_score, segment))
+
+    segments.sort(key=lambda item: item[0])
+    return b"".join(segment for _, segment in segments)[-size:]
+
+
+def dictionary_id(dictionary):
+    """מזהה הגרסה של מילון - גם שם הקובץ שלו"""
+    return hashlib.sha256(dictionary).hexdigest()[:12]
+
+
+def compress(payload, dictionary):
+    """deflate (פורמט zlib) עם המילון - הכותרת מכילה את ה-Adler-32 של המילון"""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS, 9, zlib.Z_DEFAULT_STRATEGY, dictionary)
+    return compressor.compress(payload) + compressor.flush()
+
+
+def compress_json(data, dictionary):
+    return compress(dumps(data), dictionary)
+
+
+def decompress(data, dictionary):
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS, dictionary)
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def dictionary_path(identifier):
+    return f"data/dictionary/{identifier}.bin"
+
+
+class DictionaryReader:
+    """קריאת קבצי .zd מתיקיית האתר לפי המילון הנוכחי"""
+
+    def __init__(self, site_dir):
+        self.site_dir = site_dir
+        with open(os.path.join(site_dir, f"{POINTER_FILE}.gz"), 'rb') as f:
+            pointer = json.loads(gzip.decompress(f.read()))
+        self.id = pointer["i"]
+        with open(os.path.join(site_dir, pointer["f"]), 'rb') as f:
+            self.dictionary = f.read()
+        if dictionary_id(self.dictionary) != self.id:
+            raise ValueError(f"המילון {pointer['f']} לא תואם למזהה {self.id}")
+
+    def load(self, path):
+        """התוכן של תוצר לוגי (למשל chunks/book_1/ch_1.json) מתוך X.json.zd"""
+        with open(os.path.join(self.site_dir, path + EXTENSION), 'rb') as f:
+            return json.loads(decompress(f.read(), self.dictionary))
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+קבצים דחוסים מראש בכמה קידודים (brotli, zstd, gzip) + מניפסט קידודים
+כל תוצר X נכתב כ-X.br, X.zst ו-X.gz לצד X, כך ששרת סטטי בוחר לפי Accept-Encoding
+את הקידוד הקטן ביותר שהדפדפן תומך בו ומגיש אותו עם Content-Encoding -
+והדפדפן פותח את הדחיסה בעצמו, בלי pako.
+brotli ו-zstandard הן תלויות רשות: בלעדיהן נכתב רק gzip.
+submit_variants שולח כל קידוד כתוצר נפרד לשלב הדחיסה (torah_compress), כך שהקידודים
+של כל הקבצים נדחסים במקביל בזמן שהבנייה ממשיכה
+"""
+
+import hashlib
+import json
+import os
+import struct
+
+from torah_json_stream import gzip_bytes
+from torah_serializer import dumps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MANIFEST_FILE = "encodings.json"
+
+# סיומות הקבצים לכל Content-Encoding
+EXTENSIONS = {"br": ".br", "zstd": ".zst", "gzip": ".gz"}
+
+CONTENT_TYPES = {
+    ".json": "application/json; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+}
+
+
+def available_encodings():
+    """הקידודים שאפשר לייצר בסביבה הנוכחית (gzip תמיד)"""
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+
+def _brotli(payload):
+    # מצב טקסט - מילון מובנה שמתאים ל-UTF-8
+    return brotli.compress(payload, mode=brotli.MODE_TEXT, quality=11)
+
+
+def _zstd(payload):
+    return zstandard.ZstdCompressor(level=19).compress(payload)
+
+
+def encoders():
+    """{קידוד: פונקציה(בתים) -> בתים} לקידודים הזמינים, לפי הסדר של available_encodings"""
+    functions = {"br": _brotli, "zstd": _zstd, "gzip": gzip_bytes}
+    return {encoding: functions[encoding] for encoding in available_encodings()}
+
+
+def encode(payload):
+    """כל הקידודים של תוכן: {"identity": בתים, "br": ..., "zstd": ..., "gzip": ...}"""
+    variants = {"identity": payload}
+    for encoding, encoder in encoders().items():
+        variants[encoding] = encoder(payload)
+    return variants
+
+
+def encode_json(data):
+    """JSON קומפקטי בכל הקידודים"""
+    return encode(dumps(data))
+
+
+def write_variants(path, variants, identity=False):
+    """כתיבת הקידודים לצד path (והקובץ הלא דחוס עצמו אם identity)"""
+    for encoding, payload in variants.items():
+        if encoding == "identity":
+            if not identity:
+                continue
+            target = path
+        else:
+            target = path + EXTENSIONS[encoding]
+        with open(target, 'wb') as f:
+            f.write(payload)
+
+
+class PendingVariants:
+    """הקידודים של תוצר שנשלח לשלב הדחיסה: digest מיד, הגדלים אחרי stage.wait()"""
+
+    def __init__(self, payload, artifacts, sizes=None):
+        self.digest = hashlib.sha256(payload).hexdigest()  # hash של התוכן - לא תלוי בקידודים
+        self.identity_size = len(payload)
+        self.artifacts = artifacts  # קידוד -> CompressedArtifact
+        self._sizes = sizes
+
+    def sizes(self):
+        """{קידוד: גודל} כמו אורכי encode (כולל identity)"""
+        if self._sizes is None:
+            sizes = {"identity": self.identity_size}
+            for encoding, artifact in self.artifacts.items():
+                if artifact.compressed_size is None:
+                    raise RuntimeError(f"{artifact.path} עוד לא נכתב (חסר wait של שלב הדחיסה)")
+                sizes[encoding] = artifact.compressed_size
+            self._sizes = sizes
+        return self._sizes
+
+
+def submit_variants(stage, path, payload):
+    """כמו write_variants(path, encode(payload)) - דרך שלב הדחיסה אם יש (בלי שלב - מיד)"""
+    if stage is None:
+        variants = encode(payload)
+        write_variants(path, variants)
+        return PendingVariants(payload, {}, {encoding: len(data) for encoding, data in variants.items()})
+    return PendingVariants(payload, {
+        encoding: stage.submit(path + EXTENSIONS[encoding], payload, encoder)
+        for encoding, encoder in encoders().items()
+    })
+
+
+def strip_encoding(filename):
+    """שם התוצר בלי סיומת הקידוד (או None אם זה לא קובץ מקודד)"""
+    for extension in EXTENSIONS.values():
+        if filename.endswith(extension):
+            return filename[:-len(extension)]
+    return None
+
+
+def _gzip_identity_size(path):
+    # 4 הבתים האחרונים של gzip: גודל התוכן המקורי (מודולו 2^32)
+    with open(path, 'rb') as f:
+        f.seek(-4, os.SEEK_END)
+        return struct.unpack("<I", f.read(4))[0]
+
+
+def build_manifest(output_dir):
+    """מניפסט הקידודים של כל התיקייה: נתיב -> גודל לכל קידוד, מסודר מהקטן לגדול"""
+    files = {}
+    for dirpath, _, filenames in os.walk(output_dir):
+        for filename in filenames:
+            logical = strip_encoding(filename)
+            if logical is None:
+                continue
+            path = os.path.join(dirpath, filename)
+            relative = os.path.relpath(os.path.join(dirpath, logical), output_dir).replace(os.sep, "/")
+            entry = files.setdefault(relative, {"encodings": {}})
+            encoding = next(name for name, extension in EXTENSIONS.items() if filename.endswith(extension))
+            entry["encodings"][encoding] = os.path.getsize(path)
+            if encoding == "gzip":
+                entry["identity"] = _gzip_identity_size(path)
+
+    manifest = {"version": 1, "files": {}}
+    for relative in sorted(files):
+        entry = files[relative]
+        logical_path = os.path.join(output_dir, relative)
+        if "identity" not in entry and os.path.exists(logical_path):
+            entry["identity"] = os.path.getsize(logical_path)
+        manifest["files"][relative] = {
+            "type": CONTENT_TYPES.get(os.path.splitext(relative)[1], "application/octet-stream"),
+            "identity": entry.get("identity"),
+            "stored": os.path.exists(logical_path),
+            "encodings": dict(sorted(entry["encodings"].items(), key=lambda item: item[1]))
+        }
+
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    return manifest
+
+
+def negotiate(entry, accept_encoding):
+    """הקידוד הקטן ביותר ש-Accept-Encoding מתיר, או None (להגיש את הקובץ כמו שהוא)"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in entry["encodings"]:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
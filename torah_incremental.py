@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+בנייה מצטברת לפי טביעות אצבע של התוכן
+לכל טבלה, לכל פרק (ספר, פרק) ולכל ספר מחושב hash של התוכן בסריקה אחת לכל טבלה.
+קובץ מצב בתיקיית הפלט שומר לכל תוצר את טביעת האצבע של הקלטים שמהם נבנה,
+כך שבריצה הבאה נבנים מחדש רק תוצרים שהקלטים שלהם השתנו
+"""
+
+import hashlib
+import json
+import os
+from collections import defaultdict
+
+STATE_FILE = ".build_state.json"
+
+# גרסת פורמט קובץ המצב - שינוי בה מבטל את כל המצב הקודם
+STATE_VERSION = 1
+
+# הטבלאות שמהן נבנה המבנה ספר->פרק->פסוק->כותרת->שאלה
+CORE_TABLES = ("tbl_Sefer", "tbl_Torah", "tbl_Title", "tbl_Question")
+
+
+def _digest(*parts):
+    """hash משולב של כמה טביעות אצבע"""
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(str(part).encode('utf-8'))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+class ContentFingerprints:
+    """טביעות אצבע של התוכן - לכל טבלה, לכל פרק ולכל ספר"""
+
+    def __init__(self):
+        self.tables = {}
+        self.chapters = {}
+        self.books = {}
+
+    @classmethod
+    def scan(cls, conn):
+        """חישוב כל טביעות האצבע בסריקה אחת לכל טבלה (בלי להחזיק את השורות בזיכרון)"""
+        fingerprints = cls()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+        for (table_name,) in [tuple(row) for row in cursor.fetchall()]:
+            hasher = hashlib.sha256()
+            cursor.execute(f"PRAGMA table_info({table_name})")
+            hasher.update(repr([tuple(row) for row in cursor.fetchall()]).encode('utf-8'))
+            cursor.execute(f"SELECT * FROM {table_name}")
+            for row in cursor:
+                hasher.update(repr(tuple(row)).encode('utf-8'))
+            fingerprints.tables[table_name] = hasher.hexdigest()
+
+        if all(table_name in fingerprints.tables for table_name in CORE_TABLES):
+            fingerprints._scan_chapters(cursor)
+        return fingerprints
+
+    def _scan_chapters(self, cursor):
+        # כל שורה נכנסת ל-hash של הפרק שלה, לפי סדר קבוע
+        hashers = defaultdict(hashlib.sha256)
+        queries = (
+            (b"V", """
+                SELECT tor.Sefer, tor.Perek, tor.* FROM tbl_Torah tor
+                ORDER BY tor.Sefer, tor.Perek, tor.PasukNum, tor.ID
+            """),
+            (b"T", """
+                SELECT tor.Sefer, tor.Perek, t.* FROM tbl_Title t
+                JOIN tbl_Torah tor ON t.TorahID = tor.ID
+                ORDER BY tor.Sefer, tor.Perek, t.TorahID, t.ID
+            """),
+            (b"Q", """
+                SELECT tor.Sefer, tor.Perek, q.* FROM tbl_Question q
+                JOIN tbl_Title t ON q.TitleID = t.ID
+                JOIN tbl_Torah tor ON t.TorahID = tor.ID
+                ORDER BY tor.Sefer, tor.Perek, q.TitleID, q.ID
+            """),
+        )
+        for kind, query in queries:
+            cursor.execute(query)
+            for row in cursor:
+                row = tuple(row)
+                hasher = hashers[row[:2]]
+                hasher.update(kind)
+                hasher.update(repr(row[2:]).encode('utf-8'))
+        self.chapters = {key: hasher.hexdigest() for key, hasher in sorted(hashers.items())}
+
+        # ספר = שורת הספר + טביעות האצבע של כל הפרקים שלו
+        cursor.execute("SELECT ID, * FROM tbl_Sefer ORDER BY ID")
+        for book in cursor.fetchall():
+            book_id = book[0]
+            chapter_hashes = [(chapter, digest) for (sefer, chapter), digest in self.chapters.items() if sefer == book_id]
+            self.books[book_id] = _digest(repr(tuple(book)[1:]), *chapter_hashes)
+
+    def of_tables(self, *table_names):
+        """טביעת אצבע של קבוצת טבלאות (טבלה חסרה נחשבת כקלט בפני עצמו)"""
+        return _digest(*((name, self.tables.get(name)) for name in table_names))
+
+    @staticmethod
+    def combine(*fingerprints):
+        """טביעת אצבע של תוצר שנבנה מכמה קלטים (למשל כמה פרקים)"""
+        return _digest(*fingerprints)
+
+    def of_all(self):
+        """טביעת אצבע של כל בסיס הנתונים"""
+        return self.of_tables(*sorted(self.tables))
+
+    def of_book(self, book_id):
+        return self.books.get(book_id)
+
+    def of_chapter(self, book_id, chapter_num):
+        return self.chapters.get((book_id, chapter_num))
+
+    def to_dict(self):
+        return {
+            "tables": self.tables,
+            "books": {str(book_id): digest for book_id, digest in self.books.items()},
+            "chapters": {f"{book_id}:{chapter_num}": digest for (book_id, chapter_num), digest in self.chapters.items()}
+        }
+
+
+class BuildState:
+    """מצב הבנייה של תיקיית פלט - איזה תוצר נבנה מאיזו טביעת אצבע"""
+
+    def __init__(self, output_dir, fingerprints, incremental=False, layout=None):
+        self.output_dir = output_dir
+        self.fingerprints = fingerprints
+        self.incremental = incremental
+        self.layout = layout  # פורמט הפלט (פרופיל ה-JSON) - שינוי שלו בונה הכל מחדש
+        self.path = os.path.join(output_dir, STATE_FILE)
+        self.previous = self._load()
+        self.artifacts = {}
+        self.rebuilt = set()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if state.get("version") != STATE_VERSION or state.get("layout") != self.layout:
+            return {}
+        return state.get("artifacts", {})
+
+    def is_fresh(self, artifact, fingerprint):
+        """האם התוצר קיים ונבנה מאותה טביעת אצבע (רק במצב מצטבר)"""
+        entry = self.previous.get(artifact)
+        fresh = (
+            self.incremental
+            and fingerprint is not None
+            and entry is not None
+            and entry["fingerprint"] == fingerprint
+            and os.path.exists(os.path.join(self.output_dir, artifact))
+        )
+        if fresh:
+            self.artifacts.setdefault(artifact, entry)
+        return fresh
+
+    def record(self, artifact, fingerprint, info=None):
+        """רישום תוצר שנבנה עכשיו, עם מידע נלווה (למשל סטטיסטיקות) לשימוש בריצה מדלגת"""
+        self.artifacts[artifact] = {"fingerprint": fingerprint, "info": info}
+        self.rebuilt.add(artifact)
+
+    def info(self, artifact):
+        """המידע הנלווה של תוצר שדולג"""
+        entry = self.artifacts.get(artifact) or self.previous.get(artifact) or {}
+        return entry.get("info")
+
+    def save(self):
+        state = {
+            "version": STATE_VERSION,
+            "layout": self.layout,
+            "inputs": self.fingerprints.to_dict(),
+            "artifacts": dict(sorted(self.artifacts.items()))
+        }
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        print(f"  🔁 מצב בנייה: {len(self.rebuilt)} תוצרים נבנו, {len(self.artifacts) - len(self.rebuilt)} ללא שינוי")
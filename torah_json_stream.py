@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+כתיבת JSON בזרימה לקבצים גדולים
+מילונים נכתבים מפתח אחר מפתח, וגנרטורים נכתבים כמערך איבר אחר איבר,
+כך שבזיכרון נמצא בכל רגע רק האיבר הנוכחי (למשל ספר אחד)
+"""
+
+import gzip
+import io
+import json
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from torah_serializer import dumps
+
+
+class Deferred:
+    """ערך שמחושב רק כשהכותב מגיע אליו (למשל סטטיסטיקות שמצטברות בזמן הכתיבה)"""
+
+    def __init__(self, func):
+        self.func = func
+
+    def resolve(self):
+        return self.func()
+
+
+class RawJSON:
+    """JSON שכבר עבר סריאליזציה (למשל בתהליך עובד) ומוזרק כמו שהוא בעומק הנוכחי"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def iter_json(value, indent=None, level=0):
+    """הפקת מחרוזות JSON זהות לפלט של json.dumps, בלי לבנות את כל המבנה בזיכרון"""
+    if isinstance(value, Deferred):
+        value = value.resolve()
+
+    if isinstance(value, RawJSON):
+        yield _indent(value.text, indent, level)
+    elif isinstance(value, dict):
+        yield from _iter_object(value, indent, level)
+    elif isinstance(value, Iterator):
+        yield from _iter_array(value, indent, level)
+    else:
+        yield _dumps(value, indent, level)
+
+
+def _dumps(value, indent, level):
+    """סריאליזציה של ערך שלם (במנוע של התהליך) והזחה לעומק הנוכחי"""
+    return _indent(dumps(value, indent).decode('utf-8'), indent, level)
+
+
+def _indent(text, indent, level):
+    """הזחת JSON שנוצר בעומק 0 לעומק הנוכחי"""
+    if indent is None or not level:
+        return text
+    # מחרוזות JSON אינן מכילות ירידת שורה גולמית, לכן ההחלפה בטוחה
+    return text.replace("\n", "\n" + " " * (indent * level))
+
+
+def _iter_object(obj, indent, level):
+    if not obj:
+        yield "{}"
+        return
+
+    if indent is None:
+        opening, separator, closing, key_separator = "{", ",", "}", ":"
+    else:
+        inner = "\n" + " " * (indent * (level + 1))
+        opening, separator, closing, key_separator = "{" + inner, "," + inner, "\n" + " " * (indent * level) + "}", ": "
+
+    yield opening
+    first = True
+    for key, item in obj.items():
+        if not first:
+            yield separator
+        first = False
+        yield json.dumps(str(key), ensure_ascii=False) + key_separator
+        yield from iter_json(item, indent, level + 1)
+    yield closing
+
+
+def _iter_array(items, indent, level):
+    first = True
+    for item in items:
+        if first:
+            if indent is None:
+                yield "["
+            else:
+                yield "[\n" + " " * (indent * (level + 1))
+            first = False
+        elif indent is None:
+            yield ","
+        else:
+            yield ",\n" + " " * (indent * (level + 1))
+        yield from iter_json(item, indent, level + 1)
+
+    if first:
+        yield "[]"
+    elif indent is None:
+        yield "]"
+    else:
+        yield "\n" + " " * (indent * level) + "]"
+
+
+@contextmanager
+def open_gzip_text(path):
+    """פתיחת gzip לכתיבת טקסט עם כותרת קבועה (בלי שם קובץ וזמן) - פלט זהה בכל ריצה"""
+    with open(path, 'wb') as raw, \
+            gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) as compressed, \
+            io.TextIOWrapper(compressed, encoding='utf-8') as text:
+        yield text
+
+
+def gzip_bytes(data):
+    """דחיסת gzip בזיכרון עם אותה כותרת קבועה"""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(filename='', mode='wb', fileobj=buffer, mtime=0) as compressed:
+        compressed.write(data)
+    return buffer.getvalue()
+
+
+def json_text(data, pretty=True):
+    """כל ה-JSON כמחרוזת אחת (תומך ב-RawJSON, זהה ל-json.dumps)"""
+    return "".join(iter_json(data, 2 if pretty else None))
+
+
+def write_json_stream(data, path, pretty=True, compress=False):
+    """כתיבת JSON בזרימה לקובץ רגיל או ל-gzip, מחזיר את גודל הקובץ"""
+    indent = 2 if pretty else None
+
+    opener = open_gzip_text(path) if compress else open(path, 'w', encoding='utf-8')
+
+    with opener as f:
+        for chunk in iter_json(data, indent):
+            f.write(chunk)
+
+    return os.path.getsize(path)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+אינדקס מיקומים של פסוקים בקבצי הספרים - קריאת פסוק אחד בלי לטעון ספר שלם
+books/book_N.json נכתב בדיוק כמו קודם (JSON עם הזחה של 2, או קומפקטי), אבל תוך כדי הכתיבה
+נרשם הטווח בבתים של כל פרק ושל כל פסוק. api/verse_locator.json ממפה
+(ספר, פרק, פסוק) -> (קובץ, offset, length): בדפדפן - בקשת Range לטווח, ובשרת -
+פרוסה של mmap. כל טווח הוא אובייקט JSON שלם שאפשר לפענח לבד
+"""
+
+import json
+import mmap
+import os
+
+from torah_serializer import INDENT, dumps
+
+LOCATOR_FILE = "api/verse_locator.json"
+
+LOCATOR_VERSION = 1
+
+
+class _SpanWriter:
+    """צבירת הבתים של המסמך עם המיקום הנוכחי (indent=None - JSON קומפקטי)"""
+
+    def __init__(self, indent):
+        self.indent = indent
+        self.parts = []
+        self.offset = 0
+
+    def pad(self, level):
+        return "" if self.indent is None else "\n" + " " * (self.indent * level)
+
+    def dumps(self, value, level):
+        """JSON של ערך בעומק level - זהה לחלק שלו ב-JSON של המסמך כולו"""
+        # ירידת שורה בתוך מחרוזת נכתבת כ-\n, כך שכל ירידת שורה כאן היא של ההזחה
+        text = dumps(value, self.indent).decode('utf-8')
+        return text if self.indent is None else text.replace("\n", self.pad(level))
+
+    def emit(self, text):
+        data = text.encode('utf-8')
+        self.parts.append(data)
+        self.offset += len(data)
+
+    def key(self, index, key, level):
+        separator = ":" if self.indent is None else ": "
+        self.emit(("," if index else "") + self.pad(level) + json.dumps(key, ensure_ascii=False) + separator)
+
+    def payload(self):
+        return b"".join(self.parts)
+
+
+def dump_book(book, indent=INDENT):
+    """(בתים, טווחים) של ספר {"book_info": ..., "chapters": [...]}
+
+    הבתים זהים ל-json.dumps(book, ensure_ascii=False, indent=indent) ב-UTF-8
+    (indent=None - כמו separators=(',', ':')).
+    טווחים: [[פרק, offset, length, [[פסוק, offset, length], ...]], ...]
+    """
+    writer = _SpanWriter(indent)
+    spans = []
+    writer.emit("{")
+    for index, (key, value) in enumerate(book.items()):
+        writer.key(index, key, 1)
+        if key != "chapters" or not value:
+            writer.emit(writer.dumps(value, 1))
+            continue
+        writer.emit("[")
+        for chapter_index, chapter in enumerate(value):
+            writer.emit(("," if chapter_index else "") + writer.pad(2))
+            chapter_start = writer.offset
+            verse_spans = []
+            writer.emit("{")
+            for field_index, (field, field_value) in enumerate(chapter.items()):
+                writer.key(field_index, field, 3)
+                if field != "verses" or not field_value:
+                    writer.emit(writer.dumps(field_value, 3))
+                    continue
+                writer.emit("[")
+                for verse_index, verse in enumerate(field_value):
+                    writer.emit(("," if verse_index else "") + writer.pad(4))
+                    verse_start = writer.offset
+                    writer.emit(writer.dumps(verse, 4))
+                    verse_spans.append([verse["verse_number"], verse_start, writer.offset - verse_start])
+                writer.emit(writer.pad(3) + "]")
+            writer.emit(writer.pad(2) + "}")
+            spans.append([chapter["chapter_number"], chapter_start, writer.offset - chapter_start, verse_spans])
+        writer.emit(writer.pad(1) + "]")
+    writer.emit(writer.pad(0) + "}")
+    return writer.payload(), spans
+
+
+def book_entry(filepath, payload, spans):
+    """הרשומה של ספר באינדקס: הקובץ, הגודל שלו (לזיהוי קובץ שלא מתאים) והטווחים"""
+    return {
+        "file": filepath,
+        "size": len(payload),
+        "chapters": {str(chapter): [offset, length, verses] for chapter, offset, length, verses in spans}
+    }
+
+
+def build_locator(books):
+    """המסמך של api/verse_locator.json: מזהה ספר -> רשומת ספר
+
+    "chapters": פרק -> [offset, length, [[פסוק, offset, length], ...]] - הטווחים מוחלטים בקובץ.
+    """
+    return {"version": LOCATOR_VERSION, "books": {str(book_id): books[book_id] for book_id in sorted(books)}}
+
+
+class VerseLocator:
+    """(ספר, פרק, פסוק) -> (קובץ, offset, length), וקריאה של פרק או פסוק אחד מ-mmap"""
+
+    def __init__(self, locator, root="."):
+        self.books = locator["books"]
+        self.root = root
+        self.maps = {}
+
+    @classmethod
+    def load(cls, root):
+        with open(os.path.join(root, LOCATOR_FILE), 'r', encoding='utf-8') as f:
+            return cls(json.load(f), root)
+
+    def chapter_span(self, book_id, chapter):
+        """(קובץ, offset, length) של פרק, או None"""
+        book = self.books.get(str(book_id))
+        entry = book and book["chapters"].get(str(chapter))
+        if entry is None:
+            return None
+        return book["file"], entry[0], entry[1]
+
+    def verse_span(self, book_id, chapter, verse):
+        """(קובץ, offset, length) של פסוק, או None"""
+        book = self.books.get(str(book_id))
+        entry = book and book["chapters"].get(str(chapter))
+        if entry is None:
+            return None
+        for verse_num, offset, length in entry[2]:
+            if verse_num == verse:
+                return book["file"], offset, length
+        return None
+
+    def _map(self, book_id):
+        book = self.books[str(book_id)]
+        if book["file"] not in self.maps:
+            with open(os.path.join(self.root, book["file"]), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(mapped) != book["size"]:
+                mapped.close()
+                raise ValueError(f"{book['file']} לא תואם לאינדקס ({LOCATOR_FILE} מבנייה אחרת)")
+            self.maps[book["file"]] = mapped
+        return self.maps[book["file"]]
+
+    def read(self, book_id, chapter, verse=None):
+        """הפרק (או הפסוק) כאובייקט, מפרוסה של הקובץ - או None אם אין כזה"""
+        span = self.chapter_span(book_id, chapter) if verse is None else self.verse_span(book_id, chapter, verse)
+        if span is None:
+            return None
+        _, offset, length = span
+        return json.loads(self._map(book_id)[offset:offset + length])
+
+    def close(self):
+        for mapped in self.maps.values():
+            mapped.close()
+        self.maps = {}
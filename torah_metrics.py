@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מדידה מובנית של שלבי הבנייה
+כל שלב (מתודה עם @measured, או בלוק with metrics.stage(...)) נמדד: זמן, זמן מעבד
+(כולל תהליכי העובדים), מספר שאילתות SQL, שורות שנקראו, בתים שנכתבו ושיא זיכרון.
+עבודה שרצה ברקע במקביל לשלבים (חוטי הדחיסה) נרשמת ב-record_background כשלב רקע.
+בסוף ההרצה הדוח נשמר כ-JSON בתיקיית הפלט, ו-print_profile מדפיס אותו כטבלה
+"""
+
+import functools
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# דוח ההרצה האחרונה בתיקיית הפלט (קובץ פנימי כמו מצב הבנייה)
+METRICS_FILE = ".build_metrics.json"
+
+METRICS_VERSION = 1
+
+# המונים שנצברים לכל שלב
+COUNTERS = ("seconds", "cpu_seconds", "queries", "rows", "bytes_written")
+
+
+def _read_proc_status(key):
+    """שדה (בקילובייטים) מ-/proc/self/status, או None מחוץ ללינוקס"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(key + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def rss_kb():
+    """הזיכרון התושב הנוכחי"""
+    return _read_proc_status("VmRSS")
+
+
+def peak_rss_kb():
+    """שיא הזיכרון התושב מאז האיפוס האחרון (או מתחילת התהליך)"""
+    peak = _read_proc_status("VmHWM")
+    if peak is not None or resource is None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS מחזיר בתים, לינוקס קילובייטים
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def reset_peak_rss():
+    """איפוס השיא (לינוקס 4.0+) - כך נמדד שיא לכל שלב; False אם השיא מצטבר"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def bytes_written():
+    """סך הבתים שהתהליך כתב (wchar), או None אם לא זמין"""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def cpu_seconds():
+    """זמן המעבד של התהליך וגם של תהליכי בנים שהסתיימו (מאגרי העובדים)"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class BuildMetrics:
+    """מדדים לכל שלב בהרצה אחת של בונה"""
+
+    def __init__(self, builder=None):
+        self.builder = builder
+        self.stages = {}
+        self.stack = []  # השלבים הפתוחים כרגע (שלב בתוך שלב נרשם עם parent)
+        self.queries = 0
+        self.rows = 0
+        self.started = None
+        self.start_wall = self.start_cpu = None
+        self.peak_is_cumulative = False
+        self.report = None
+
+    def begin(self):
+        self.started = datetime.now().isoformat()
+        self.start_wall, self.start_cpu = time.perf_counter(), cpu_seconds()
+
+    def attach(self, conn):
+        """ספירת השאילתות והשורות של החיבור הראשי (החיבורים של תהליכי העובדים לא נספרים)"""
+        def count_query(statement):
+            self.queries += 1
+
+        row_factory = conn.row_factory
+
+        def count_row(cursor, row):
+            self.rows += 1
+            return row_factory(cursor, row) if row_factory else row
+
+        conn.set_trace_callback(count_query)
+        conn.row_factory = count_row
+
+    def _snapshot(self):
+        return {
+            "seconds": time.perf_counter(),
+            "cpu_seconds": cpu_seconds(),
+            "queries": self.queries,
+            "rows": self.rows,
+            "bytes_written": bytes_written(),
+        }
+
+    def _fold_peak(self):
+        """השיא מאז האיפוס האחרון שייך לכל השלבים הפתוחים"""
+        peak = peak_rss_kb()
+        if peak is not None:
+            for frame in self.stack:
+                frame["peak_rss_kb"] = max(frame["peak_rss_kb"], peak)
+
+    @contextmanager
+    def stage(self, name):
+        """מדידת בלוק כשלב בשם name (קריאות חוזרות מצטברות)"""
+        self._fold_peak()
+        self.peak_is_cumulative = not reset_peak_rss()
+        frame = {"name": name, "start": self._snapshot(), "peak_rss_kb": 0}
+        parent = self.stack[-1]["name"] if self.stack else None
+        self.stack.append(frame)
+        try:
+            yield
+        finally:
+            self._fold_peak()
+            self.stack.pop()
+            end = self._snapshot()
+            stage = self.stages.setdefault(name, dict(parent=parent, calls=0, **{key: 0 for key in COUNTERS}))
+            stage["calls"] += 1
+            for key in COUNTERS:
+                if end[key] is None or frame["start"][key] is None:
+                    stage[key] = None
+                elif stage[key] is not None:
+                    stage[key] += end[key] - frame["start"][key]
+            stage["rss_kb"] = rss_kb()
+            stage["peak_rss_kb"] = max(stage.get("peak_rss_kb", 0), frame["peak_rss_kb"]) or None
+
+    def record_background(self, name, seconds, cpu_seconds):
+        """שלב רקע: סכום זמני המשימות שרצו בחוטים במקביל לשלבים האחרים (חופף להם, ולכן
+        לא נכנס לזמן שלא שויך לאף שלב)"""
+        stage = self.stages.setdefault(name, dict(parent=None, background=True, calls=0, seconds=0,
+                                                  cpu_seconds=0, queries=0, rows=0, bytes_written=None,
+                                                  rss_kb=None, peak_rss_kb=None))
+        stage["calls"] += 1
+        stage["seconds"] += seconds
+        stage["cpu_seconds"] += cpu_seconds
+
+    def finish(self, ok):
+        """סיכום ההרצה - השלבים העליונים + הזמן שלא שויך לאף שלב"""
+        if self.start_wall is None:
+            self.begin()
+        seconds = time.perf_counter() - self.start_wall
+        top_level = [stage for stage in self.stages.values()
+                     if stage["parent"] is None and not stage.get("background")]
+        self.report = {
+            "version": METRICS_VERSION,
+            "builder": self.builder,
+            "started": self.started,
+            "ok": ok,
+            "seconds": seconds,
+            "cpu_seconds": cpu_seconds() - self.start_cpu,
+            "queries": self.queries,
+            "rows": self.rows,
+            "other_seconds": seconds - sum(stage["seconds"] for stage in top_level),
+            "peak_rss_kb": max([stage["peak_rss_kb"] or 0 for stage in self.stages.values()] + [0]) or peak_rss_kb(),
+            "peak_is_cumulative": self.peak_is_cumulative,
+            "stages": self.stages,
+        }
+        return self.report
+
+    def save(self, output_dir):
+        """כתיבת הדוח ל-<output_dir>/.build_metrics.json (אם התיקייה קיימת)"""
+        if self.report is None:
+            self.finish(False)
+        if not os.path.isdir(output_dir):
+            return None
+        path = os.path.join(output_dir, METRICS_FILE)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report, f, ensure_ascii=False, indent=2)
+        return path
+
+    def print_profile(self):
+        """טבלת הפרופיל של ההרצה"""
+        report = self.report or self.finish(False)
+        total = report["seconds"] or 1
+        print(f"\n⏱️ פרופיל ({report['seconds']:.2f}s, מעבד {report['cpu_seconds']:.2f}s):")
+        print(f"  {'שלב':<34}{'שניות':>9}{'%':>6}{'מעבד':>9}{'SQL':>6}{'שורות':>10}{'שורות/s':>11}"
+              f"{'נכתב MB':>10}{'שיא MB':>9}")
+        for name, stage in self.stages.items():
+            label = ("  " + name) if stage["parent"] else name
+            if stage.get("background"):
+                label += " (רקע)"
+            rate = f"{stage['rows'] / stage['seconds']:,.0f}" if stage["rows"] and stage["seconds"] else "-"
+            written = f"{stage['bytes_written'] / 1024 / 1024:.1f}" if stage["bytes_written"] is not None else "-"
+            peak = f"{stage['peak_rss_kb'] / 1024:.0f}" if stage["peak_rss_kb"] else "-"
+            print(f"  {label:<34}{stage['seconds']:>9.2f}{stage['seconds'] / total * 100:>6.1f}"
+                  f"{stage['cpu_seconds']:>9.2f}{stage['queries']:>6}{stage['rows']:>10,}{rate:>11}"
+                  f"{written:>10}{peak:>9}")
+        print(f"  {'(אחר)':<34}{report['other_seconds']:>9.2f}{report['other_seconds'] / total * 100:>6.1f}")
+        if report["peak_is_cumulative"]:
+            print("  ℹ️ שיא הזיכרון מצטבר מתחילת התהליך (אין איפוס שיא במערכת הזו)")
+
+
+def measured(method):
+    """מתודת שלב שנמדדת ב-self.metrics בשם המתודה"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.metrics.stage(method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ייצוא מקבילי לפי ספר
+כל תהליך עובד פותח חיבור קריאה-בלבד משלו, טוען רק את נתוני הספר שלו ובונה את התוצר;
+התוצאות מוחזרות לפי סדר הספרים, כך שהפלט זהה בתים-לבתים לריצה סדרתית
+"""
+
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from torah_corpus import TorahCorpus
+
+# החיבור של תהליך העובד הנוכחי
+_worker_conn = None
+
+
+def connect_read_only(db_path):
+    """חיבור קריאה-בלבד לבסיס הנתונים"""
+    conn = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def list_book_ids(conn):
+    """מזהי הספרים לפי הסדר"""
+    return [row[0] for row in conn.execute("SELECT ID FROM tbl_Sefer ORDER BY ID")]
+
+
+def _init_worker(db_path):
+    global _worker_conn
+    _worker_conn = connect_read_only(db_path)
+
+
+def _run_book_task(task, book_id, args):
+    corpus = TorahCorpus.load(_worker_conn, book_id)
+    return task(corpus, book_id, *args)
+
+
+def map_books(db_path, book_ids, task, workers, *args):
+    """הרצת task(corpus, book_id, *args) לכל ספר במאגר תהליכים, והחזרת התוצאות לפי סדר book_ids
+
+    task חייבת להיות פונקציה ברמת המודול (כדי שתעבור ל-pickle).
+    התוצאות מוחזרות ברגע שהן מוכנות לפי הסדר, כך שהכתיבה חופפת לחישוב של הספרים הבאים.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_path,)) as pool:
+        futures = [pool.submit(_run_book_task, task, book_id, args) for book_id in book_ids]
+        for future in futures:
+            yield future.result()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+טווחי הפרשות לפי נקודות ההתחלה
+כל פרשה מתחילה ב-(StartPerek, StartPasuk) ונמשכת עד תחילת הפרשה הבאה באותו ספר
+(האחרונה בספר - עד סוף הספר). אינדקס הטווחים ממפה כל (ספר, פרק, פסוק) לפרשה
+בחיפוש בינארי
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+class ParshaIndex:
+    """נקודות ההתחלה של הפרשות, ממוינות לפי ספר, פרק ופסוק"""
+
+    def __init__(self, parshiot):
+        rows = [
+            parsha for parsha in parshiot
+            if None not in (parsha["SeferID"], parsha["StartPerek"], parsha["StartPasuk"])
+        ]
+        rows.sort(key=lambda parsha: (parsha["SeferID"], parsha["StartPerek"], parsha["StartPasuk"], parsha["ID"]))
+        self.starts = [(parsha["SeferID"], parsha["StartPerek"], parsha["StartPasuk"]) for parsha in rows]
+        self.ids = [parsha["ID"] for parsha in rows]
+        self.names = {parsha["ID"]: parsha["ParshaName"] for parsha in rows}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def find(self, book_id, chapter_num, verse_num):
+        """מזהה הפרשה שהפסוק שייך לה, או None (לפני הפרשה הראשונה בספר)"""
+        position = bisect_right(self.starts, (book_id, chapter_num, verse_num)) - 1
+        if position < 0 or self.starts[position][0] != book_id:
+            return None
+        return self.ids[position]
+
+    def intervals(self):
+        """(מזהה, ספר, התחלה, התחלת הבאה או None) - טווח חצי-פתוח של (פרק, פסוק)"""
+        for position, (parsha_id, (book_id, chapter_num, verse_num)) in enumerate(zip(self.ids, self.starts)):
+            following = self.starts[position + 1] if position + 1 < len(self.starts) else None
+            end = following[1:] if following is not None and following[0] == book_id else None
+            yield parsha_id, book_id, (chapter_num, verse_num), end
+
+    def spans(self, book_refs):
+        """טווחי ההיסטים לכל פרשה: מזהה -> (ראשון, אחרי האחרון)
+
+        book_refs: ספר -> רשימה ממוינת של (פרק, פסוק) של כל הפסוקים בספר.
+        """
+        spans = {}
+        for parsha_id, book_id, start, end in self.intervals():
+            refs = book_refs.get(book_id, [])
+            first = bisect_left(refs, start)
+            last = bisect_left(refs, end) if end is not None else len(refs)
+            spans[parsha_id] = (first, max(first, last))
+        return spans
+
+    def to_dict(self):
+        """האינדקס לדפדפן: ספר -> [[פרק, פסוק, מזהה], ...] ממוין (לחיפוש בינארי)"""
+        books = {}
+        for parsha_id, (book_id, chapter_num, verse_num) in zip(self.ids, self.starts):
+            books.setdefault(str(book_id), []).append([chapter_num, verse_num, parsha_id])
+        return {"b": books}
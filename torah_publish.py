@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+פרסום תוצרים בשמות לפי תוכן + asset-manifest.json
+כל תוצר X.json מקבל עותק immutable/X.<hash>.json (עם כל הקידודים שלו) - שם שהתוכן שלו
+לא משתנה לעולם, כך שאפשר להגיש את כל immutable/ עם Cache-Control: immutable.
+המניפסט ממפה שם לוגי -> שם עם hash, והוא הקובץ היחיד שהדפדפן צריך לבדוק מחדש.
+השמות הקבועים נשארים (הבנייה המצטברת והניקוי שלה עובדים עליהם), והעותקים של
+הפרסום הקודם נשמרים עוד פרסום אחד - לדפדפנים שעדיין מחזיקים את המניפסט הישן.
+לכל תוצר JSON שהשתנה נכתב patch ברמת רשומה מהגרסה הקודמת (torah_delta), והמניפסט
+מחזיק את שרשרת הגרסאות: "patches": שם לוגי -> {שם קודם: [patch, השם הבא, גודל]}
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+from torah_delta import apply_patch, diff
+from torah_dictionary import EXTENSION as DICTIONARY_EXTENSION
+from torah_encodings import EXTENSIONS, MANIFEST_FILE as ENCODINGS_FILE, encode_json, strip_encoding, write_variants
+from torah_incremental import STATE_FILE
+from torah_json_stream import gzip_bytes
+from torah_metrics import METRICS_FILE
+
+MANIFEST_FILE = "asset-manifest.json"
+
+# תת-התיקייה של העותקים בשם לפי תוכן
+PUBLISHED_DIR = "immutable"
+
+# אורך ה-hash בשם הקובץ
+HASH_LENGTH = 12
+
+# תת-התיקייה (בתוך immutable/) של קבצי ה-patch
+PATCHES_DIR = "patches"
+
+# patch נכתב רק אם הוא קטן מהחלק הזה של הקובץ המלא (בגודל דחוס)
+MAX_PATCH_RATIO = 0.5
+
+# הסיומות שמתלוות לתוצר לוגי: הקובץ עצמו, הקידודים והגרסה עם המילון
+SIBLING_EXTENSIONS = ("",) + tuple(EXTENSIONS.values()) + (DICTIONARY_EXTENSION,)
+
+# קבצים שלא מפורסמים: המניפסטים עצמם, מצב הבנייה ומדדי ההרצה
+INTERNAL_FILES = {MANIFEST_FILE, ENCODINGS_FILE, STATE_FILE, METRICS_FILE}
+
+
+def logical_name(filename):
+    """שם התוצר הלוגי של קובץ (בלי סיומת קידוד או מילון)"""
+    logical = strip_encoding(filename)
+    if logical is None and filename.endswith(DICTIONARY_EXTENSION):
+        logical = filename[:-len(DICTIONARY_EXTENSION)]
+    return logical or filename
+
+
+def hashed_name(path, digest):
+    """chunks/book_1/ch_1.json -> immutable/chunks/book_1/ch_1.<hash>.json"""
+    directory, filename = os.path.split(path)
+    stem, extension = os.path.splitext(filename)
+    if stem != digest:
+        # שם שכבר לפי תוכן (למשל המילון המשותף) לא מקבל hash שני
+        filename = f"{stem}.{digest}{extension}"
+    return "/".join(part for part in (PUBLISHED_DIR, directory.replace(os.sep, "/"), filename) if part)
+
+
+def read_payload(output_dir, path):
+    """התוכן הלא דחוס של תוצר (הקובץ עצמו, או פתיחת X.gz)"""
+    full_path = os.path.join(output_dir, path)
+    if os.path.exists(full_path):
+        with open(full_path, 'rb') as f:
+            return f.read()
+    with open(full_path + EXTENSIONS["gzip"], 'rb') as f:
+        return gzip.decompress(f.read())
+
+
+def content_digest(output_dir, path):
+    """hash של התוכן הלא דחוס - אותו שם לכל הקידודים, ולא תלוי בספריית הדחיסה"""
+    return hashlib.sha256(read_payload(output_dir, path)).hexdigest()[:HASH_LENGTH]
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"files": {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _walk_logical(root, output_dir):
+    """הנתיבים הלוגיים (יחסית ל-output_dir) של כל הקבצים תחת root: נתיב -> [קבצים]"""
+    paths = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            relative = os.path.relpath(os.path.join(dirpath, logical_name(filename)), output_dir)
+            paths.setdefault(relative.replace(os.sep, "/"), []).append(os.path.join(dirpath, filename))
+    return paths
+
+
+def transfer_size(output_dir, target):
+    """הגודל הדחוס (gzip) של תוצר - מהקובץ X.gz אם קיים"""
+    gzip_path = os.path.join(output_dir, target + EXTENSIONS["gzip"])
+    if os.path.exists(gzip_path):
+        return os.path.getsize(gzip_path)
+    return len(gzip_bytes(read_payload(output_dir, target)))
+
+
+def patch_name(old_target, new_target):
+    """immutable/chunks/book_1/ch_1.<ישן>.json -> immutable/patches/chunks/book_1/ch_1.<ישן>-<חדש>.json"""
+    directory, filename = old_target.split("/", 1)[1].rpartition("/")[::2]
+    stem, extension = os.path.splitext(filename)
+    new_digest = os.path.splitext(new_target)[0].rsplit(".", 1)[-1]
+    return "/".join(part for part in (PUBLISHED_DIR, PATCHES_DIR, directory, f"{stem}-{new_digest}{extension}") if part)
+
+
+def write_patch(output_dir, old_target, new_target):
+    """patch ברמת רשומה מהגרסה הקודמת לחדשה: [שם הקובץ, גודל דחוס], או None אם לא כדאי"""
+    try:
+        old = json.loads(read_payload(output_dir, old_target))
+        new = json.loads(read_payload(output_dir, new_target))
+    except (OSError, ValueError):
+        return None
+    patch = diff(old, new)
+    if patch is None or "=" in patch or apply_patch(old, patch) != new:
+        return None
+    size = len(gzip_bytes(json.dumps(patch, ensure_ascii=False, separators=(',', ':')).encode('utf-8')))
+    if size > transfer_size(output_dir, new_target) * MAX_PATCH_RATIO:
+        return None
+    target = patch_name(old_target, new_target)
+    os.makedirs(os.path.dirname(os.path.join(output_dir, target)), exist_ok=True)
+    # גם הקובץ הלא דחוס - גם שרת סטטי בלי Content-Encoding מגיש אותו
+    write_variants(os.path.join(output_dir, target), encode_json(patch), identity=True)
+    return [target, size]
+
+
+def _chain_size(chain, start, head):
+    """הגודל הכולל של ה-patches מ-start עד הגרסה הנוכחית (None - השרשרת לא מגיעה אליה)"""
+    total, current, seen = 0, start, set()
+    while current != head:
+        if current in seen or current not in chain:
+            return None
+        seen.add(current)
+        total += chain[current][2]
+        current = chain[current][1]
+    return total
+
+
+def build_patch_chains(output_dir, old_manifest, files):
+    """שרשרת הגרסאות של כל תוצר: {שם קודם: [patch, השם הבא, גודל]} שמובילה לגרסה הנוכחית
+
+    שרשרת נשמרת רק כל עוד הורדת כל ה-patches שלה קטנה מהורדת הקובץ המלא.
+    """
+    chains = {}
+    written = 0
+    for path, target in files.items():
+        chain = dict(old_manifest.get("patches", {}).get(path, {}))
+        old_target = old_manifest["files"].get(path)
+        if old_target is None or not path.endswith(".json"):
+            continue
+        if old_target != target:
+            patch = write_patch(output_dir, old_target, target)
+            if patch is None:
+                # אין דרך להגיע לגרסה החדשה - השרשרת הישנה כבר לא שימושית
+                continue
+            chain[old_target] = [patch[0], target, patch[1]]
+            written += 1
+        if not chain:
+            continue
+        full_size = transfer_size(output_dir, target)
+        sizes = {start: _chain_size(chain, start, target) for start in chain}
+        chain = {start: link for start, link in chain.items() if sizes[start] and sizes[start] < full_size}
+        if chain:
+            chains[path] = chain
+    return chains, written
+
+
+def publish(output_dir, exclude=()):
+    """עותק בשם לפי תוכן לכל תוצר בתיקייה + asset-manifest.json, מחזיר את המניפסט
+
+    exclude: נתיבים לוגיים שנשארים בשם קבוע (למשל index.html - נקודת הכניסה).
+    """
+    old_manifest = load_manifest(output_dir)
+    published_root = os.path.join(output_dir, PUBLISHED_DIR)
+    skipped = INTERNAL_FILES | set(exclude)
+
+    logical_paths = [
+        path for path in _walk_logical(output_dir, output_dir)
+        if path not in skipped and not path.startswith(PUBLISHED_DIR + "/")
+    ]
+
+    files = {}
+    copied = 0
+    for path in sorted(logical_paths):
+        target = hashed_name(path, content_digest(output_dir, path))
+        files[path] = target
+        os.makedirs(os.path.dirname(os.path.join(output_dir, target)), exist_ok=True)
+        for extension in SIBLING_EXTENSIONS:
+            source = os.path.join(output_dir, path + extension)
+            destination = os.path.join(output_dir, target + extension)
+            # שם לפי תוכן - אם הקובץ קיים הוא כבר זהה (ולא נכתב מחדש: immutable)
+            if os.path.exists(source) and not os.path.exists(destination):
+                shutil.copyfile(source, destination)
+                copied += 1
+
+    patches, written = build_patch_chains(output_dir, old_manifest, files)
+
+    # הפרסום הקודם נשאר לדפדפנים עם המניפסט הישן; מה שלפניו נמחק (חוץ מ-patches בשרשרת)
+    keep = set(files.values()) | set(old_manifest["files"].values())
+    keep |= {link[0] for chain in patches.values() for link in chain.values()}
+    for path, filenames in _walk_logical(published_root, output_dir).items():
+        if path not in keep:
+            for filename in filenames:
+                os.remove(filename)
+
+    manifest = {"version": 1, "files": files}
+    if patches:
+        manifest["patches"] = patches
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+
+    print(f"  🔖 {MANIFEST_FILE}: {len(files)} תוצרים ({copied} קבצים חדשים בשם לפי תוכן, "
+          f"{written} patches מהגרסה הקודמת)")
+    return manifest
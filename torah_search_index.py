@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+אינדקס הפוך לחיפוש מלא בפסוקים ובשאלות
+כל מילה מנורמלת (בלי ניקוד וטעמים, אותיות סופיות כרגילות) ממופה לרשימת המזהים
+של הפסוקים והשאלות שבהם היא מופיעה. הרשימות מחולקות לרסיסים לפי האות הראשונה
+(ואות גדולה מדי מתפצלת לפי שתי האותיות הראשונות), כך שהדפדפן מוריד רק את
+הרסיסים של מילות השאילתה, ותוכן התוצאות נטען בבלוקים לפי מזהה
+"""
+
+import json
+import re
+from collections import defaultdict
+
+from torah_strings import STRINGS_KEY, StringTables
+
+# גרסת הנרמול - חייבת להתאים ל-normalizeHebrew ב-JavaScript
+NORMALIZATION_VERSION = 1
+
+# גודל בלוק של רשומות תוצאה (לפי מזהה)
+DOC_BLOCK_SIZE = 1024
+
+# רסיס של אות שה-JSON שלו גדול מזה מתפצל לרסיסים לפי שתי אותיות
+MAX_SHARD_BYTES = 64 * 1024
+
+# מקף, פסק, סוף פסוק ונו"ן הפוכה מפרידים בין מילים
+_SEPARATORS = re.compile("[\u05BE\u05C0\u05C3\u05C6]")
+# ניקוד וטעמים
+_MARKS = re.compile("[\u0591-\u05C7]")
+# גרש, גרשיים ומרכאות בתוך ראשי תיבות (רש"י -> רשי)
+_QUOTES = re.compile("[\u05F3\u05F4'\"]")
+_FINALS = str.maketrans("ךםןףץ", "כמנפצ")
+_TOKEN = re.compile(r"\w+")
+
+
+def normalize_hebrew(text):
+    """נרמול טקסט עברי לחיפוש"""
+    text = _SEPARATORS.sub(" ", text or "")
+    text = _MARKS.sub("", text)
+    text = _QUOTES.sub("", text)
+    return text.translate(_FINALS).lower()
+
+
+def tokenize(text):
+    """המילים המנורמלות של טקסט"""
+    return _TOKEN.findall(normalize_hebrew(text))
+
+
+def shard_file_name(key):
+    """שם קובץ הרסיס - קודי האותיות של המפתח (שמות ASCII בלבד)"""
+    return "s_" + "_".join(f"{ord(char):04x}" for char in key)
+
+
+def delta_encode(ids):
+    """רשימה ממוינת כהפרשים (מספרים קטנים - JSON ודחיסה קטנים יותר)"""
+    encoded = []
+    previous = 0
+    for value in ids:
+        encoded.append(value - previous)
+        previous = value
+    return encoded
+
+
+class SearchIndexBuilder:
+    """בניית האינדקס ההפוך והבלוקים של רשומות התוצאה"""
+
+    def __init__(self):
+        self.verse_postings = defaultdict(set)
+        self.question_postings = defaultdict(set)
+        self.verse_docs = {}
+        self.question_docs = {}
+        self.book_names = {}
+
+    def add_verse(self, torah_id, book_id, chapter, verse, text):
+        for token in tokenize(text):
+            self.verse_postings[token].add(torah_id)
+        self.verse_docs[torah_id] = [torah_id, book_id, chapter, verse, text]
+
+    def add_question(self, question_id, torah_id, book_id, chapter, verse, title, question):
+        for token in tokenize(f"{title} {question}"):
+            self.question_postings[token].add(question_id)
+        self.question_docs[question_id] = [question_id, torah_id, book_id, chapter, verse, title, question]
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """אינדקס לכל הפסוקים והשאלות, בסדר ספר-פרק-פסוק"""
+        builder = cls()
+        for book in corpus.books:
+            builder.book_names[book["ID"]] = book["SeferName"]
+
+        for verse in corpus.iter_verses():
+            if verse["Sefer"] not in builder.book_names:
+                continue
+            location = (verse["Sefer"], verse["Perek"], verse["PasukNum"])
+            builder.add_verse(verse["ID"], *location, verse["Pasuk"])
+            for title, question in corpus.verse_questions(verse["ID"]):
+                builder.add_question(question["ID"], verse["ID"], *location, title["Title"], question["Question"])
+        return builder
+
+    def _group(self, tokens, prefix_length):
+        shards = defaultdict(lambda: {"v": {}, "q": {}})
+        for kind, postings in (("v", self.verse_postings), ("q", self.question_postings)):
+            for token in tokens:
+                if token in postings:
+                    shards[token[:prefix_length]][kind][token] = delta_encode(sorted(postings[token]))
+        return shards
+
+    def shards(self, max_shard_bytes=MAX_SHARD_BYTES):
+        """הרסיסים: מפתח (אות או שתי אותיות) -> {"v": מילה -> הפרשי מזהי פסוקים, "q": מילה -> הפרשי מזהי שאלות}
+
+        מילה נמצאת ברסיס של שתי האותיות הראשונות שלה אם קיים כזה, ואחרת ברסיס של האות הראשונה.
+        """
+        tokens = sorted(set(self.verse_postings) | set(self.question_postings))
+        shards = {}
+        for letter, shard in self._group(tokens, 1).items():
+            size = len(json.dumps(shard, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            if size <= max_shard_bytes:
+                shards[letter] = shard
+            else:
+                letter_tokens = [token for token in tokens if token[0] == letter]
+                shards.update(self._group(letter_tokens, 2))
+        return dict(sorted(shards.items()))
+
+    @staticmethod
+    def _blocks(docs):
+        blocks = defaultdict(list)
+        for doc_id in sorted(docs):
+            blocks[doc_id // DOC_BLOCK_SIZE].append(docs[doc_id])
+        return dict(blocks)
+
+    def verse_blocks(self):
+        """בלוקים של רשומות פסוקים: מספר בלוק -> [[torah_id, ספר, פרק, פסוק, טקסט], ...]"""
+        return self._blocks(self.verse_docs)
+
+    def question_blocks(self):
+        """בלוקים של רשומות שאלות: מספר בלוק -> {"strings": {"title": [כותרות]}, "rows": [[question_id, torah_id, ספר, פרק, פסוק, מיקום כותרת, שאלה], ...]}
+
+        הכותרת (טקסט הפסוק) חוזרת בכל שאלה שלה, ולכן נשמרת פעם אחת בטבלת המחרוזות של הבלוק.
+        """
+        blocks = {}
+        for block, docs in self._blocks(self.question_docs).items():
+            tables = StringTables("title")
+            rows = [doc[:5] + [tables.ref("title", doc[5])] + doc[6:] for doc in docs]
+            blocks[block] = {STRINGS_KEY: tables.to_dict(), "rows": rows}
+        return blocks
+
+    def manifest(self, shard_files, doc_files):
+        """מניפסט האתחול - הקובץ היחיד שנטען לפני החיפוש הראשון
+
+        shard_files: מפתח רסיס -> [שם, גודל, hash]; doc_files: "v"/"q" -> מספר בלוק -> [שם, גודל, hash]
+        """
+        return {
+            "version": NORMALIZATION_VERSION,
+            "block_size": DOC_BLOCK_SIZE,
+            "shards": shard_files,
+            "docs": doc_files,
+            "books": {str(book_id): name for book_id, name in self.book_names.items()},
+            "counts": {
+                "tokens": len(set(self.verse_postings) | set(self.question_postings)),
+                "verses": len(self.verse_docs),
+                "questions": len(self.question_docs)
+            }
+        }
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+סריאליזציית JSON אחידה לכל הבונים - פרופיל פלט ומנוע קידוד
+פרופיל: "pretty" (פיתוח/דיבוג - הזחה של 2, כמו עד עכשיו) או "compact" (ייצור - בלי רווחים).
+מנוע: "json" (הספרייה הסטנדרטית) או "orjson" (תלות רשות, מהיר פי כמה). "auto" בוחר
+ב-orjson אם הוא מותקן ועובר בדיקת שקילות מול json על מסמך בדיקה, אחרת json.
+הפלט של שני המנועים זהה בתים-לבתים, כך שהמנוע משפיע רק על המהירות:
+ערך ש-orjson לא יודע לקודד (מספר שלם גדול מ-64 ביט, טיפוס לא מוכר) או פלט עם מספר
+בכתיב מעריכי (1e-05 מול 1e-5) מקודדים מחדש ב-json. NaN/Infinity (שאינם JSON תקני)
+הם היוצא מן הכלל - orjson כותב null; בנתונים שלנו אין כאלה.
+python torah_serializer.py מודד את קצב הקידוד של כל מנוע על הקורפוס עצמו
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sqlite3
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PROFILES = ("pretty", "compact")
+BACKENDS = ("json", "orjson")
+
+# ההזחה של פרופיל pretty (כמו json.dump(..., indent=2) שהיה בכל הסקריפטים)
+INDENT = 2
+
+# מספר בכתיב מעריכי בפלט של orjson - json כותב אותו אחרת
+_EXPONENT = re.compile(rb'[0-9][eE][-+]?[0-9]')
+
+# מסמך הבדיקה של "auto": עברית, תווי בקרה, מבנים ריקים ומקוננים, מפתחות לא-מחרוזת
+_PROBE = {
+    "text": "בְּרֵאשִׁית בָּרָא - \"ציטוט\" \\ / \n\t\r\b\f \x00\x1f\x7f   😀",
+    "numbers": [0, -1, 2 ** 63 - 1, 1.0, 0.5, 123.456, 0.0001, 10.148525238037109],
+    "flags": [True, False, None],
+    "empty": {"object": {}, "array": [], "string": ""},
+    "nested": [{"chapter_number": 1, "verses": [{"verse_number": 1, "question_groups": []}]}],
+    1: "int key",
+}
+
+_backend = None  # המנוע של התהליך (נבחר ב-use_backend, או auto בשימוש הראשון)
+
+
+def available_backends():
+    """המנועים שאפשר להשתמש בהם בסביבה הנוכחית (json תמיד)"""
+    return [name for name in BACKENDS if name == "json" or orjson is not None]
+
+
+def _json_bytes(value, indent):
+    if indent is None:
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return json.dumps(value, ensure_ascii=False, indent=indent).encode('utf-8')
+
+
+def _orjson_bytes(value, indent):
+    if indent not in (None, INDENT):
+        return _json_bytes(value, indent)
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+    try:
+        payload = orjson.dumps(value, option=option)
+    except TypeError:
+        return _json_bytes(value, indent)
+    if _EXPONENT.search(payload):
+        return _json_bytes(value, indent)
+    return payload
+
+
+_ENCODERS = {"json": _json_bytes, "orjson": _orjson_bytes}
+
+
+def equivalent(backend, value):
+    """האם המנוע מקודד את value בדיוק כמו json, בשני הפרופילים"""
+    encoder = _ENCODERS[backend]
+    return all(encoder(value, indent) == _json_bytes(value, indent) for indent in (INDENT, None))
+
+
+def resolve_backend(name="auto"):
+    """שם המנוע בפועל: auto - orjson אם מותקן ושקול ל-json, אחרת json"""
+    if name == "auto":
+        return "orjson" if orjson is not None and equivalent("orjson", _PROBE) else "json"
+    if name not in BACKENDS:
+        raise ValueError(f"מנוע JSON לא מוכר: {name} (אפשרויות: auto, {', '.join(BACKENDS)})")
+    if name not in available_backends():
+        raise ValueError(f"המנוע {name} לא מותקן (pip install {name})")
+    return name
+
+
+def use_backend(name="auto"):
+    """בחירת המנוע של התהליך - מחזיר את השם שנבחר בפועל"""
+    global _backend
+    _backend = resolve_backend(name)
+    return _backend
+
+
+def current_backend():
+    return _backend or use_backend()
+
+
+def dumps(value, indent=None):
+    """JSON של ערך כבתים ב-UTF-8 - זהה ל-json.dumps(value, ensure_ascii=False, ...) בכל מנוע"""
+    return _ENCODERS[current_backend()](value, indent)
+
+
+class JSONSerializer:
+    """הפרופיל של בונה: pretty משאיר את ההזחה של כל קובץ כמו שהיא, compact מבטל אותה בכל הקבצים"""
+
+    def __init__(self, profile="pretty"):
+        if profile not in PROFILES:
+            raise ValueError(f"פרופיל JSON לא מוכר: {profile} (אפשרויות: {', '.join(PROFILES)})")
+        self.profile = profile
+
+    def indented(self, pretty=True):
+        """האם קובץ שנכתב בהזחה (pretty=True) יוזח בפרופיל הזה"""
+        return pretty and self.profile == "pretty"
+
+    def indent(self, pretty=True):
+        return INDENT if self.indented(pretty) else None
+
+    def dumps(self, data, pretty=True):
+        return dumps(data, self.indent(pretty))
+
+    def write(self, data, path, pretty=True):
+        """כתיבת קובץ JSON - מחזיר את הגודל שלו"""
+        payload = self.dumps(data, pretty)
+        with open(path, 'wb') as f:
+            f.write(payload)
+        return len(payload)
+
+
+# --- מדידה על הקורפוס ---
+
+def corpus_documents(db_path):
+    """המסמכים שהבונים כותבים בפועל: כל הטבלאות הגולמיות (~40 אלף שורות) וכל הספרים המובנים"""
+    from full_torah_exporter import FullTorahJSONExporter
+    from torah_corpus import TorahCorpus
+    from torah_stats import TorahStats
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        tables = {}
+        for (table_name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table' "
+                                          "AND name NOT LIKE 'sqlite_%' ORDER BY name"):
+            tables[table_name] = [dict(row) for row in conn.execute(f'SELECT * FROM "{table_name}"')]
+        corpus = TorahCorpus.load(conn)
+        exporter = FullTorahJSONExporter()
+        exporter.torah_stats = TorahStats.compute(conn)
+        with contextlib.redirect_stdout(io.StringIO()):  # ההדפסות של הבנייה לכל פרק
+            books = [exporter.build_structured_book(corpus, book) for book in corpus.books]
+    finally:
+        conn.close()
+    return {"raw_tables": {"tables": tables}, "structured_books": {"books": books}}
+
+
+def benchmark(documents, backends=None, repeat=3):
+    """[(מסמך, מנוע, פרופיל, שניות, בתים, זהה ל-json)] - הזמן הטוב מבין repeat ריצות"""
+    results = []
+    for doc_name, document in documents.items():
+        for indent, profile in ((INDENT, "pretty"), (None, "compact")):
+            reference = _json_bytes(document, indent)
+            for backend in backends or available_backends():
+                encoder = _ENCODERS[backend]
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    payload = encoder(document, indent)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                results.append((doc_name, backend, profile, best, len(payload), payload == reference))
+    return results
+
+
+def print_benchmark(results):
+    print(f"  {'מסמך':<18} {'מנוע':<8} {'פרופיל':<8} {'שניות':>7} {'MB':>7} {'MB/s':>8}  זהה")
+    for doc_name, backend, profile, seconds, size, identical in results:
+        mb = size / (1024 * 1024)
+        print(f"  {doc_name:<18} {backend:<8} {profile:<8} {seconds:>7.3f} {mb:>7.2f} {mb / seconds:>8.1f}  "
+              f"{'✅' if identical else '❌'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="מדידת קצב הקידוד של מנועי ה-JSON על הקורפוס")
+    parser.add_argument("--db", default="torah.db", help="בסיס הנתונים")
+    parser.add_argument("--repeat", type=int, default=3, help="מספר הריצות לכל מדידה (נלקח הזמן הטוב)")
+    parser.add_argument("--output", help="שמירת התוצאות כ-JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"❌ שגיאה: הקובץ {args.db} לא נמצא!")
+        return
+    print(f"⚙️ מנועים זמינים: {', '.join(available_backends())} (auto: {resolve_backend()})")
+    print("📥 טוען את הקורפוס...")
+    documents = corpus_documents(args.db)
+    print(f"⏱️ קידוד ({args.repeat} ריצות לכל מדידה):")
+    results = benchmark(documents, repeat=args.repeat)
+    print_benchmark(results)
+    if not all(identical for *_, identical in results):
+        print("⚠️ יש מנוע שהפלט שלו שונה מ-json - auto לא צריך לבחור בו")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump([dict(zip(("document", "backend", "profile", "seconds", "bytes", "identical"), result))
+                       for result in results], f, ensure_ascii=False, indent=2)
+        print(f"💾 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+שרת סטטי מקומי לאתר התורה - תחליף ל-python -m http.server שמתנהג כמו ה-CDN
+- מגיש את הקידוד הקטן ביותר ש-Accept-Encoding מתיר (X.br / X.zst / X.gz) עם Content-Encoding,
+  לפי encodings.json (torah_encodings) או לפי הקבצים שעל הדיסק; לדפדפן בלי gzip
+  התוכן נפתח בשרת
+- ETag חזק לכל ייצוג (hash של הבתים שנשלחים) ו-304 ל-If-None-Match
+- Cache-Control: העותקים בשם לפי תוכן (immutable/, היעדים של asset-manifest.json) נשמרים
+  שנה בלי בדיקה; כל השאר - no-cache (בדיקה מחדש עם ה-ETag)
+- Range (טווח אחד, כולל If-Range) על הייצוג שנבחר
+- תהליכון לכל חיבור (ThreadingHTTPServer, HTTP/1.1 keep-alive) ושורת לוג לכל בקשה עם זמן התגובה
+"""
+
+import argparse
+import email.utils
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import sys
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from torah_dictionary import EXTENSION as DICTIONARY_EXTENSION
+from torah_encodings import CONTENT_TYPES, EXTENSIONS, MANIFEST_FILE as ENCODINGS_FILE, negotiate
+from torah_incremental import STATE_FILE
+from torah_metrics import METRICS_FILE
+from torah_publish import MANIFEST_FILE as ASSET_MANIFEST_FILE, PUBLISHED_DIR
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# קבצי בנייה פנימיים שלא מוגשים
+PRIVATE_FILES = {STATE_FILE, METRICS_FILE}
+
+# סוגי התוכן של הקבצים שמוגשים כמו שהם (הקידודים עצמם, המילון המשותף)
+RAW_TYPES = {
+    ".br": "application/x-brotli",
+    ".zst": "application/zstd",
+    ".gz": "application/gzip",
+    DICTIONARY_EXTENSION: "application/octet-stream",
+    ".bin": "application/octet-stream",
+}
+
+CHUNK_SIZE = 64 * 1024
+
+
+def content_type(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in CONTENT_TYPES:
+        return CONTENT_TYPES[extension]
+    if extension in RAW_TYPES:
+        return RAW_TYPES[extension]
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def parse_range(header, length):
+    """טווח בתים אחד מ-Range: (התחלה, סוף כולל), None להגשה מלאה, או False אם לא ניתן לספק"""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        # יחידה אחרת או כמה טווחים - מותר להתעלם ולהגיש הכל
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # bytes=-N: N הבתים האחרונים
+            suffix = int(last)
+            if suffix <= 0:
+                return False
+            return max(0, length - suffix), length - 1
+        start = int(first)
+        end = int(last) if last else length - 1
+    except ValueError:
+        return None
+    if start >= length or end < start:
+        return False
+    return start, min(end, length - 1)
+
+
+class Representation:
+    """הבתים שיוגשו לבקשה: קובץ על הדיסק או תוכן שנפתח בזיכרון"""
+
+    def __init__(self, path, encoding=None, payload=None, varies=False):
+        self.path = path
+        self.encoding = encoding
+        self.payload = payload
+        self.varies = varies  # יש כמה קידודים - התגובה תלויה ב-Accept-Encoding
+        stat = os.stat(path)
+        self.mtime = stat.st_mtime
+        self.length = len(payload) if payload is not None else stat.st_size
+
+    def read(self, start, length):
+        """הבתים [start, start+length) במקטעים"""
+        if self.payload is not None:
+            yield self.payload[start:start + length]
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            while length > 0:
+                chunk = f.read(min(CHUNK_SIZE, length))
+                if not chunk:
+                    break
+                length -= len(chunk)
+                yield chunk
+
+
+class StaticSite:
+    """מיפוי בקשות לקבצים בתיקיית האתר + מטמון ETag ומניפסט הקידודים"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.lock = threading.Lock()
+        self.etags = {}  # (נתיב, mtime_ns, גודל) -> ETag
+        self.manifest = None
+        self.manifest_mtime = None
+
+    def local_path(self, url_path):
+        """הנתיב היחסי בתיקיית האתר, או None לנתיב לא חוקי"""
+        path = posixpath.normpath(unquote(url_path))
+        parts = [part for part in path.split("/") if part]
+        if any(part in ("..", ".") or "\\" in part for part in parts):
+            return None
+        relative = "/".join(parts)
+        if os.path.isdir(os.path.join(self.root, relative)):
+            relative = posixpath.join(relative, "index.html") if relative else "index.html"
+        if posixpath.basename(relative) in PRIVATE_FILES:
+            return None
+        return relative
+
+    def encodings_entry(self, relative):
+        """רשומת הקידודים של קובץ לוגי - מ-encodings.json, ואם אין - מהקבצים שעל הדיסק"""
+        manifest_path = os.path.join(self.root, ENCODINGS_FILE)
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self.lock:
+            if mtime != self.manifest_mtime:
+                self.manifest_mtime = mtime
+                self.manifest = None
+                if mtime is not None:
+                    with open(manifest_path, encoding='utf-8') as f:
+                        self.manifest = json.load(f)["files"]
+            manifest = self.manifest
+
+        if manifest is not None and relative in manifest:
+            return manifest[relative]
+        sizes = {}
+        for encoding, extension in EXTENSIONS.items():
+            sibling = os.path.join(self.root, relative + extension)
+            if os.path.isfile(sibling):
+                sizes[encoding] = os.path.getsize(sibling)
+        if not sizes:
+            return None
+        return {"encodings": dict(sorted(sizes.items(), key=lambda item: item[1]))}
+
+    def select(self, relative, accept_encoding):
+        """הייצוג שיוגש לבקשה, או None אם הקובץ לא קיים"""
+        full_path = os.path.join(self.root, relative)
+        entry = self.encodings_entry(relative)
+        if entry is not None:
+            encoding = negotiate(entry, accept_encoding)
+            if encoding is not None and os.path.isfile(full_path + EXTENSIONS[encoding]):
+                return Representation(full_path + EXTENSIONS[encoding], encoding, varies=True)
+            if not os.path.isfile(full_path) and os.path.isfile(full_path + EXTENSIONS["gzip"]):
+                # הלקוח לא מקבל אף קידוד והקובץ נשמר רק דחוס - פתיחה בשרת
+                with open(full_path + EXTENSIONS["gzip"], 'rb') as f:
+                    return Representation(full_path + EXTENSIONS["gzip"], payload=gzip.decompress(f.read()),
+                                          varies=True)
+        if os.path.isfile(full_path):
+            return Representation(full_path, varies=entry is not None)
+        return None
+
+    def etag(self, representation):
+        """ETag חזק - hash של הבתים שנשלחים (שונה לכל קידוד)"""
+        if representation.payload is not None:
+            return '"%s"' % hashlib.sha256(representation.payload).hexdigest()[:24]
+        stat = os.stat(representation.path)
+        key = (representation.path, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            etag = self.etags.get(key)
+        if etag is None:
+            digest = hashlib.sha256()
+            with open(representation.path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            etag = '"%s"' % digest.hexdigest()[:24]
+            with self.lock:
+                self.etags[key] = etag
+        return etag
+
+    def cache_control(self, relative):
+        # היעדים של asset-manifest.json כולם תחת immutable/ - התוכן שלהם לא משתנה לעולם
+        if relative.startswith(PUBLISHED_DIR + "/"):
+            return IMMUTABLE_CACHE
+        return REVALIDATE_CACHE
+
+
+class TorahRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "TorahServer/1.0"
+    site = None
+    quiet = False
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def serve(self, send_body):
+        started = time.perf_counter()
+        status, sent, encoding = self.respond(send_body)
+        if not self.quiet:
+            elapsed = (time.perf_counter() - started) * 1000
+            sys.stderr.write(f"{self.address_string()} {self.command} {self.path} {status} {sent} "
+                             f"{encoding or '-'} {elapsed:.1f}ms\n")
+
+    def respond(self, send_body):
+        """שליחת התגובה - מחזיר (סטטוס, בתי גוף שנשלחו, קידוד)"""
+        relative = self.site.local_path(urlsplit(self.path).path)
+        representation = self.site.select(relative, self.headers.get("Accept-Encoding")) if relative is not None else None
+        if representation is None:
+            return self.send_empty(HTTPStatus.NOT_FOUND), 0, None
+
+        etag = self.site.etag(representation)
+        headers = {
+            "Content-Type": content_type(relative),
+            "ETag": etag,
+            "Last-Modified": email.utils.formatdate(representation.mtime, usegmt=True),
+            "Cache-Control": self.site.cache_control(relative),
+            "Accept-Ranges": "bytes",
+        }
+        if representation.encoding:
+            headers["Content-Encoding"] = representation.encoding
+        if representation.varies:
+            headers["Vary"] = "Accept-Encoding"
+
+        # If-None-Match בהשוואה חלשה (W/"x" תואם ל-"x")
+        if_none_match = [tag.strip().removeprefix("W/") for tag in self.headers.get("If-None-Match", "").split(",")]
+        if etag in if_none_match or "*" in if_none_match:
+            return self.send_empty(HTTPStatus.NOT_MODIFIED, headers), 0, representation.encoding
+
+        status = HTTPStatus.OK
+        start, length = 0, representation.length
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and (if_range is None or if_range.strip() == etag):
+            byte_range = parse_range(range_header, representation.length)
+            if byte_range is False:
+                headers["Content-Range"] = f"bytes */{representation.length}"
+                return self.send_empty(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, headers), 0, representation.encoding
+            if byte_range is not None:
+                status = HTTPStatus.PARTIAL_CONTENT
+                start, length = byte_range[0], byte_range[1] - byte_range[0] + 1
+                headers["Content-Range"] = f"bytes {byte_range[0]}-{byte_range[1]}/{representation.length}"
+
+        self.send_response_only(status)
+        self.send_header("Date", self.date_time_string())
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+
+        sent = 0
+        if send_body:
+            for chunk in representation.read(start, length):
+                self.wfile.write(chunk)
+                sent += len(chunk)
+        return status.value, sent, representation.encoding
+
+    def send_empty(self, status, headers=None):
+        self.send_response_only(status)
+        self.send_header("Date", self.date_time_string())
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return status.value
+
+    def log_message(self, format, *args):
+        # הלוג נכתב ב-serve (עם זמן התגובה)
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def log_request(self, code='-', size='-'):
+        pass
+
+
+def create_server(root, host="127.0.0.1", port=8000, quiet=False):
+    handler = type("Handler", (TorahRequestHandler,), {"site": StaticSite(root), "quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="שרת סטטי מקומי לאתר התורה (קידודים דחוסים, ETag, Range)")
+    parser.add_argument("--root", default=".", help="תיקיית האתר (למשל optimized_torah_site)")
+    parser.add_argument("--host", default="127.0.0.1", help="כתובת האזנה")
+    parser.add_argument("--port", type=int, default=8000, help="פורט")
+    parser.add_argument("--quiet", action="store_true", help="בלי שורת לוג לכל בקשה")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"❌ שגיאה: התיקייה {args.root} לא נמצאה!")
+        sys.exit(1)
+
+    server = create_server(args.root, args.host, args.port, args.quiet)
+    print(f"🌐 מגיש את {os.path.abspath(args.root)} בכתובת http://{args.host}:{args.port}/")
+    print(f"🗜️ קידודים מוגשים לפי {ENCODINGS_FILE}, מטמון לפי {ASSET_MANIFEST_FILE}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 השרת נעצר")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
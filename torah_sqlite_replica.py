@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+עותק SQLite לקריאה בלבד, מותאם לאתר
+כל הטבלאות מועתקות כמו שהן, ובנוסף: אינדקסים מכסים לשאילתות ספר/פרק, פסוק->כותרות
+וכותרת->שאלות, טבלת FTS5 על טקסט מנורמל של פסוקים, כותרות ושאלות, וטבלאות ספירה
+מוכנות לכל ספר ולכל פרק. הקובץ נבנה בלי WAL, עובר VACUUM ו-ANALYZE,
+ומיועד להגשה כקובץ סטטי (sql.js) או לפתיחה עם immutable=1
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+
+from torah_incremental import CORE_TABLES
+from torah_search_index import normalize_hebrew, tokenize
+
+# 4096 = דף מערכת ההפעלה, מתאים לקריאה מקומית ול-mmap.
+# להגשה דרך HTTP Range (sql.js-httpvfs) דף קטן יותר (1024) מקטין את הבתים לכל חיפוש
+DEFAULT_PAGE_SIZE = 4096
+
+# האינדקסים מכסים את המעבר פרק -> פסוקים -> כותרות -> שאלות בלי לגשת לטבלה עצמה
+# (המזהים מגיעים מהאינדקס, והטקסט נקרא לפי rowid רק לשורות שבתוצאה)
+INDEXES = [
+    # WHERE Sefer = ? AND Perek = ? ORDER BY PasukNum
+    ("tbl_Torah", "CREATE INDEX idx_torah_chapter ON tbl_Torah(Sefer, Perek, PasukNum, ID)"),
+    # WHERE TorahID = ?
+    ("tbl_Title", "CREATE INDEX idx_title_torah ON tbl_Title(TorahID, ID)"),
+    # WHERE TitleID = ?
+    ("tbl_Question", "CREATE INDEX idx_question_title ON tbl_Question(TitleID, ID)"),
+    # פרשות לפי ספר ונקודת התחלה
+    ("tbl_Parsha", "CREATE INDEX idx_parsha_start ON tbl_Parsha(SeferID, StartPerek, StartPasuk)"),
+]
+
+# סוגי הרשומות ב-FTS - ה-rowid הוא ref_id * len(SEARCH_KINDS) + מיקום הסוג
+SEARCH_KINDS = ("verse", "title", "question")
+
+COUNT_TABLES = [
+    """
+    CREATE TABLE chapter_counts (
+        Sefer INTEGER NOT NULL,
+        Perek INTEGER NOT NULL,
+        verses INTEGER NOT NULL,
+        titles INTEGER NOT NULL,
+        questions INTEGER NOT NULL,
+        PRIMARY KEY (Sefer, Perek)
+    ) WITHOUT ROWID
+    """,
+    """
+    INSERT INTO chapter_counts
+    SELECT tor.Sefer, tor.Perek,
+           COUNT(DISTINCT tor.ID),
+           COUNT(DISTINCT t.ID),
+           COUNT(q.ID)
+    FROM tbl_Torah tor
+    LEFT JOIN tbl_Title t ON t.TorahID = tor.ID
+    LEFT JOIN tbl_Question q ON q.TitleID = t.ID
+    GROUP BY tor.Sefer, tor.Perek
+    """,
+    """
+    CREATE TABLE book_counts (
+        SeferID INTEGER PRIMARY KEY,
+        SeferName TEXT,
+        chapters INTEGER NOT NULL,
+        verses INTEGER NOT NULL,
+        titles INTEGER NOT NULL,
+        questions INTEGER NOT NULL
+    )
+    """,
+    """
+    INSERT INTO book_counts
+    SELECT s.ID, s.SeferName,
+           COUNT(c.Perek),
+           COALESCE(SUM(c.verses), 0),
+           COALESCE(SUM(c.titles), 0),
+           COALESCE(SUM(c.questions), 0)
+    FROM tbl_Sefer s
+    LEFT JOIN chapter_counts c ON c.Sefer = s.ID
+    GROUP BY s.ID
+    """,
+]
+
+
+def fts5_available():
+    """האם ה-SQLite של Python נבנה עם FTS5"""
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE probe USING fts5(text)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+def _build_fts(conn):
+    # FTS בלי תוכן (content='') - הטקסט המקורי כבר בטבלאות, והסוג והמזהה מקודדים ב-rowid
+    conn.execute("""
+        CREATE VIRTUAL TABLE search_fts USING fts5(
+            text, content = '', tokenize = 'unicode61', prefix = '2 3'
+        )
+    """)
+    sources = {
+        "verse": "SELECT ID, Pasuk FROM tbl_Torah",
+        "title": "SELECT ID, Title FROM tbl_Title",
+        "question": "SELECT ID, Question FROM tbl_Question",
+    }
+    for position, kind in enumerate(SEARCH_KINDS):
+        rows = (
+            (row_id * len(SEARCH_KINDS) + position, normalize_hebrew(text))
+            for row_id, text in conn.execute(sources[kind]).fetchall()
+        )
+        conn.executemany("INSERT INTO search_fts(rowid, text) VALUES (?, ?)", rows)
+    conn.execute("INSERT INTO search_fts(search_fts) VALUES ('optimize')")
+
+
+def build_replica(db_path, output_path, page_size=DEFAULT_PAGE_SIZE, source_fingerprint=None):
+    """בניית העותק לקובץ זמני והחלפה אטומית, מחזיר את גודל הקובץ"""
+    temp_path = f"{output_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    conn = sqlite3.connect(temp_path)
+    try:
+        # גודל הדף נקבע לפני יצירת הטבלה הראשונה; בלי WAL - קובץ אחד להגשה
+        conn.execute(f"PRAGMA page_size = {int(page_size)}")
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.execute("ATTACH DATABASE ? AS src", (Path(db_path).resolve().as_uri() + "?mode=ro",))
+
+        tables = conn.execute("""
+            SELECT name, sql FROM src.sqlite_master
+            WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+            ORDER BY rowid
+        """).fetchall()
+        for table_name, create_sql in tables:
+            conn.execute(create_sql)
+            conn.execute(f"INSERT INTO main.{table_name} SELECT * FROM src.{table_name}")
+        conn.commit()
+        conn.execute("DETACH DATABASE src")
+
+        table_names = {table_name for table_name, _ in tables}
+        for table_name, statement in INDEXES:
+            if table_name in table_names:
+                conn.execute(statement)
+
+        if table_names.issuperset(CORE_TABLES):
+            for statement in COUNT_TABLES:
+                conn.execute(statement)
+            if fts5_available():
+                _build_fts(conn)
+
+        conn.execute("CREATE TABLE replica_info (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID")
+        conn.executemany("INSERT INTO replica_info VALUES (?, ?)", [
+            ("source_database", os.path.basename(db_path)),
+            ("source_fingerprint", source_fingerprint or ""),
+            ("page_size", str(page_size)),
+        ])
+        conn.commit()
+
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(temp_path, output_path)
+    return os.path.getsize(output_path)
+
+
+def open_replica(path):
+    """פתיחת העותק לקריאה בלבד עם immutable=1 - בלי נעילות ובלי בדיקת שינויים"""
+    conn = sqlite3.connect(Path(path).resolve().as_uri() + "?immutable=1", uri=True)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+def search(conn, query, kind=None, limit=20):
+    """חיפוש ב-FTS5 של העותק - כל המילים חייבות להופיע, האחרונה גם כקידומת
+
+    מחזיר [(סוג, מזהה), ...] לפי דירוג; השורות עצמן נקראות מ-tbl_Torah/tbl_Title/tbl_Question.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    match = " ".join(f'"{token}"' for token in tokens) + "*"
+    sql = "SELECT rowid FROM search_fts WHERE search_fts MATCH ?"
+    params = [match]
+    if kind is not None:
+        sql += " AND rowid % ? = ?"
+        params += [len(SEARCH_KINDS), SEARCH_KINDS.index(kind)]
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
+    return [
+        (SEARCH_KINDS[rowid % len(SEARCH_KINDS)], rowid // len(SEARCH_KINDS))
+        for (rowid,) in conn.execute(sql, params)
+    ]
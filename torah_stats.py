@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+סטטיסטיקות מצטברות של התורה - מחושבות פעם אחת ונשמרות כתוצר
+ספירות לכל ספר, פרק ופסוק (פסוקים, כותרות, שאלות) וגודל כל פרשה מחושבים
+בשאילתה מקובצת אחת. כל האינדקסים והמניפסטים קוראים מכאן במקום לספור מחדש
+"""
+
+import gzip
+import json
+import os
+from torah_incremental import CORE_TABLES
+from torah_json_stream import gzip_bytes
+from torah_parsha import ParshaIndex
+
+# גרסת פורמט הקובץ (2: טווחי פרשות לפי נקודות ההתחלה)
+STATS_VERSION = 2
+
+# הטבלאות שמהן מחושבות הסטטיסטיקות
+STATS_TABLES = CORE_TABLES + ("tbl_Parsha",)
+
+# מונים לכל רמה
+COUNT_KEYS = ("chapters", "verses", "titles", "questions")
+
+
+def _zero(*keys):
+    return {key: 0 for key in keys}
+
+
+class TorahStats:
+    """ספירות לכל ספר, פרק, פסוק ופרשה + סיכום כללי"""
+
+    def __init__(self):
+        self.totals = _zero("books", *COUNT_KEYS)
+        self.books = {}
+        self.chapters = {}
+        self.verses = {}
+        self.parshiot = {}
+
+    @classmethod
+    def compute(cls, conn):
+        """כל הספירות במעבר מקובץ אחד על הפסוקים (ספר ופרק מצטברים תוך כדי)"""
+        stats = cls()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT ID, SeferName FROM tbl_Sefer ORDER BY ID")
+        for book_id, book_name in cursor.fetchall():
+            stats.books[book_id] = dict(name=book_name, **_zero(*COUNT_KEYS))
+
+        cursor.execute("""
+            SELECT tor.ID, tor.Sefer, tor.Perek, tor.PasukNum,
+                   COUNT(DISTINCT t.ID), COUNT(q.ID)
+            FROM tbl_Torah tor
+            LEFT JOIN tbl_Title t ON t.TorahID = tor.ID
+            LEFT JOIN tbl_Question q ON q.TitleID = t.ID
+            GROUP BY tor.ID
+            ORDER BY tor.Sefer, tor.Perek, tor.PasukNum, tor.ID
+        """)
+        # (פרק, פסוק) ממוינים לכל ספר + סכומים מצטברים - לספירת טווחי פרשות
+        refs = {}
+        for torah_id, book_id, chapter_num, verse_num, titles, questions in cursor:
+            stats.verses[torah_id] = {"titles": titles, "questions": questions}
+
+            chapter = stats.chapters.get((book_id, chapter_num))
+            if chapter is None:
+                chapter = stats.chapters[(book_id, chapter_num)] = _zero("verses", "titles", "questions")
+                if book_id in stats.books:
+                    stats.books[book_id]["chapters"] += 1
+            for target in (chapter, stats.books.get(book_id)):
+                if target is not None:
+                    target["verses"] += 1
+                    target["titles"] += titles
+                    target["questions"] += questions
+
+            keys, sums = refs.setdefault(book_id, ([], [(0, 0)]))
+            keys.append((chapter_num, verse_num))
+            sums.append((sums[-1][0] + titles, sums[-1][1] + questions))
+
+        # הסיכום הכללי - רק ספרים שקיימים ב-tbl_Sefer (כמו בייצוא המובנה)
+        stats.totals["books"] = len(stats.books)
+        for book in stats.books.values():
+            for key in COUNT_KEYS:
+                stats.totals[key] += book[key]
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name = 'tbl_Parsha'")
+        if cursor.fetchone():
+            cursor.execute("SELECT ID, SeferID, ParshaName, StartPerek, StartPasuk FROM tbl_Parsha ORDER BY ID")
+            names = [description[0] for description in cursor.description]
+            parsha_index = ParshaIndex(dict(zip(names, row)) for row in cursor.fetchall())
+            # כל פרשה - מנקודת ההתחלה שלה ועד תחילת הבאה באותו ספר
+            spans = parsha_index.spans({book_id: keys for book_id, (keys, _) in refs.items()})
+            for parsha_id, book_id, _, _ in parsha_index.intervals():
+                keys, sums = refs.get(book_id, ([], [(0, 0)]))
+                first, last = spans[parsha_id]
+                stats.parshiot[parsha_id] = {
+                    "name": parsha_index.names[parsha_id],
+                    "book_id": book_id,
+                    "verses": last - first,
+                    "titles": sums[last][0] - sums[first][0],
+                    "questions": sums[last][1] - sums[first][1]
+                }
+        return stats
+
+    def book(self, book_id):
+        """{"name", "chapters", "verses", "titles", "questions"} של ספר"""
+        return self.books.get(book_id) or dict(name=None, **_zero(*COUNT_KEYS))
+
+    def chapter(self, book_id, chapter_num):
+        """{"verses", "titles", "questions"} של פרק"""
+        return self.chapters.get((book_id, chapter_num)) or _zero("verses", "titles", "questions")
+
+    def chapter_numbers(self, book_id):
+        """מספרי הפרקים של ספר לפי הסדר"""
+        return sorted(chapter_num for sefer, chapter_num in self.chapters if sefer == book_id)
+
+    def verse(self, torah_id):
+        """{"titles", "questions"} של פסוק"""
+        return self.verses.get(torah_id) or _zero("titles", "questions")
+
+    def parsha(self, parsha_id):
+        return self.parshiot.get(parsha_id)
+
+    def to_dict(self):
+        return {
+            "version": STATS_VERSION,
+            "totals": self.totals,
+            "books": {str(book_id): counts for book_id, counts in self.books.items()},
+            "chapters": {f"{book_id}:{chapter_num}": counts for (book_id, chapter_num), counts in self.chapters.items()},
+            "verses": {str(torah_id): counts for torah_id, counts in self.verses.items()},
+            "parshiot": {str(parsha_id): counts for parsha_id, counts in self.parshiot.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.totals = data["totals"]
+        stats.books = {int(book_id): counts for book_id, counts in data["books"].items()}
+        stats.chapters = {
+            tuple(int(part) for part in key.split(":")): counts for key, counts in data["chapters"].items()
+        }
+        stats.verses = {int(torah_id): counts for torah_id, counts in data["verses"].items()}
+        stats.parshiot = {int(parsha_id): counts for parsha_id, counts in data["parshiot"].items()}
+        return stats
+
+
+def load_stats(conn, build_state, artifact):
+    """הסטטיסטיקות של תיקיית הפלט - נקראות מהתוצר אם הקלטים לא השתנו, אחרת מחושבות ונשמרות
+
+    artifact שמסתיים ב-.gz נשמר דחוס.
+    """
+    fingerprint = build_state.fingerprints.of_tables(*STATS_TABLES)
+    path = os.path.join(build_state.output_dir, artifact)
+    compressed = artifact.endswith(".gz")
+
+    if build_state.is_fresh(artifact, fingerprint):
+        with open(path, 'rb') as f:
+            payload = f.read()
+        data = json.loads(gzip.decompress(payload) if compressed else payload)
+        if data.get("version") == STATS_VERSION:
+            print(f"  ⏭️ {artifact}: ללא שינוי")
+            return TorahStats.from_dict(data)
+
+    stats = TorahStats.compute(conn)
+    text = json.dumps(stats.to_dict(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(gzip_bytes(text) if compressed else text)
+    build_state.record(artifact, fingerprint)
+
+    totals = stats.totals
+    print(f"  📊 {artifact}: {totals['books']} ספרים, {totals['chapters']} פרקים, {totals['verses']:,} פסוקים, "
+          f"{totals['titles']:,} כותרות, {totals['questions']:,} שאלות")
+    return stats
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+טבלאות מחרוזות - ערכים שחוזרים נשמרים פעם אחת
+שם ספר, כותרת (טקסט הפסוק שחוזר בכל שאלה שלו) ושם מפרש מופיעים באלפי שורות.
+במצב טבלאות מחרוזות כל ערך כזה נשמר פעם אחת ב-"strings" של המסמך, והשדה בשורה
+מחזיק את המיקום שלו בטבלה: {"title": 12} + "strings": {"title": [..., "<הכותרת>", ...]}.
+שדה ששמו הוא שם של טבלה וערכו מספר שלם - הוא הפניה; decode_strings מחזיר את המסמך המקורי
+"""
+
+# המפתח של הטבלאות במסמך
+STRINGS_KEY = "strings"
+
+# עמודות שחוזרות בטבלאות הגולמיות (שם מפרש לכל פירוש)
+INTERNED_COLUMNS = {"tbl_Perush": ("Mefaresh",)}
+
+
+class StringTables:
+    """טבלה לכל שדה: ערך -> מיקום, לפי סדר ההופעה הראשונה (פלט זהה בכל ריצה)"""
+
+    def __init__(self, *names):
+        self.tables = {name: {} for name in names}
+
+    def ref(self, name, value):
+        """המיקום של value בטבלה name (None נשאר None)"""
+        if value is None:
+            return None
+        table = self.tables[name]
+        position = table.get(value)
+        if position is None:
+            position = table[value] = len(table)
+        return position
+
+    def intern(self, row):
+        """עותק של שורה (מילון) עם הפניות במקום הערכים של השדות שיש להם טבלה"""
+        return {key: self.ref(key, value) if key in self.tables else value for key, value in row.items()}
+
+    def intern_rows(self, rows):
+        """כל השורות עם הפניות - גנרטור, כך שמתאים גם לכתיבה בזרימה"""
+        for row in rows:
+            yield self.intern(row)
+
+    def to_dict(self):
+        """{"שדה": [ערכים לפי מיקום]} - נכתב אחרי השורות (עם Deferred במצב זרימה)"""
+        return {name: list(table) for name, table in self.tables.items()}
+
+    def count(self):
+        return sum(len(table) for table in self.tables.values())
+
+
+def decode_strings(value, tables=None):
+    """המסמך המקורי: כל הפניה בשדה שיש לו טבלה מוחלפת בערך
+
+    "strings" של מילון חל עליו ועל כל מה שבתוכו (למשל טבלה לכל טבלה גולמית).
+    """
+    if isinstance(value, list):
+        return [decode_strings(item, tables) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if STRINGS_KEY in value:
+        tables = dict(tables or {}, **value[STRINGS_KEY])
+    return {
+        key: tables[key][item] if tables and key in tables and type(item) is int else decode_strings(item, tables)
+        for key, item in value.items() if key != STRINGS_KEY
+    }
@@ -3,13 +3,32 @@
 import sqlite3
 import json
 import os
+import argparse
 from datetime import datetime
 
+import torah_delta
+from torah_corpus import TorahCorpus
+from torah_incremental import CORE_TABLES, BuildState, ContentFingerprints
+from torah_locator import LOCATOR_FILE, book_entry, build_locator, dump_book
+from torah_metrics import BuildMetrics, measured
+from torah_publish import publish
+from torah_serializer import BACKENDS, PROFILES, JSONSerializer, dumps, use_backend
+from torah_stats import load_stats
+
+# גרסת המבנה של קבצי הספרים - נכנסת לטביעת האצבע, כך ששינוי שלה בונה את כל הספרים מחדש
+BOOK_FORMAT = 2
+
 class TorahWebsiteBuilder:
-    def __init__(self, db_path="torah.db", output_dir="website_data"):
+    def __init__(self, db_path="torah.db", output_dir="website_data", incremental=False, json_profile="pretty"):
         self.db_path = db_path
         self.output_dir = output_dir
+        self.incremental = incremental
+        self.serializer = JSONSerializer(json_profile)  # pretty (פיתוח) או compact (ייצור)
         self.conn = None
+        self.corpus = None
+        self.build_state = None
+        self.torah_stats = None
+        self.metrics = BuildMetrics("TorahWebsiteBuilder")
         
     def connect_db(self):
         if not os.path.exists(self.db_path):
@@ -20,6 +39,11 @@ class TorahWebsiteBuilder:
         print(f"✅ מחובר ל-{self.db_path}")
         return True
     
+    def load_corpus(self):
+        if self.corpus is None:
+            self.corpus = TorahCorpus.load(self.conn)
+        return self.corpus
+    
     def setup_directories(self):
         directories = [self.output_dir, f"{self.output_dir}/books", f"{self.output_dir}/api"]
         for directory in directories:
@@ -27,11 +51,31 @@ class TorahWebsiteBuilder:
             print(f"📁 {directory}")
     
     def save_json(self, data, filepath):
-        full_path = f"{self.output_dir}/{filepath}"
-        with open(full_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        self.serializer.write(data, f"{self.output_dir}/{filepath}")
         return filepath
     
+    def save_book(self, book_data, filepath):
+        """שמירת ספר (אותם בתים כמו save_json) - מחזיר את רשומת הספר באינדקס המיקומים"""
+        payload, spans = dump_book(book_data, self.serializer.indent())
+        with open(f"{self.output_dir}/{filepath}", 'wb') as f:
+            f.write(payload)
+        return book_entry(filepath, payload, spans)
+    
+    def load_book_entry(self, filepath, previous):
+        """רשומת אינדקס של ספר שלא נבנה מחדש: מהאינדקס הקודם, או מחישוב מחדש מהקובץ"""
+        full_path = f"{self.output_dir}/{filepath}"
+        if previous and previous.get("file") == filepath and previous.get("size") == os.path.getsize(full_path):
+            return previous
+        with open(full_path, 'r', encoding='utf-8') as f:
+            payload, spans = dump_book(json.load(f), self.serializer.indent())
+        return book_entry(filepath, payload, spans)
+    
+    def skip_unchanged(self, filepath, fingerprint):
+        if not self.build_state.is_fresh(filepath, fingerprint):
+            return False
+        print(f"  ⏭️ {filepath}: ללא שינוי")
+        return True
+    
     def create_slug(self, text):
         hebrew_to_english = {
             "בראשית": "genesis", "שמות": "exodus", "ויקרא": "leviticus",
@@ -39,29 +83,22 @@ class TorahWebsiteBuilder:
         }
         return hebrew_to_english.get(text, text.lower().replace(" ", "-"))
     
+    @measured
     def create_books_index(self):
         print("\n📚 יוצר אינדקס ספרים...")
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM tbl_Sefer ORDER BY ID")
-        books = [dict(row) for row in cursor.fetchall()]
+        fingerprint = self.build_state.fingerprints.of_tables(*CORE_TABLES)
+        if self.skip_unchanged("api/books_index.json", fingerprint):
+            with open(f"{self.output_dir}/api/books_index.json", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        
         books_index = {"books": []}
         
-        for book in books:
-            book_id = book["ID"]
-            book_name = book["SeferName"]
-            
-            cursor.execute("SELECT COUNT(DISTINCT Perek) FROM tbl_Torah WHERE Sefer = ?", (book_id,))
-            chapter_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM tbl_Torah WHERE Sefer = ?", (book_id,))
-            verse_count = cursor.fetchone()[0]
-            
-            cursor.execute("""
-                SELECT COUNT(q.ID) FROM tbl_Question q
-                JOIN tbl_Title t ON q.TitleID = t.ID
-                JOIN tbl_Torah tor ON t.TorahID = tor.ID
-                WHERE tor.Sefer = ?""", (book_id,))
-            question_count = cursor.fetchone()[0]
+        # הספירות מוכנות מראש ב-torah_stats - בלי מעבר על הפסוקים
+        for book_id, book_stats in self.torah_stats.books.items():
+            book_name = book_stats["name"]
+            chapter_count = book_stats["chapters"]
+            verse_count = book_stats["verses"]
+            question_count = book_stats["questions"]
             
             book_info = {
                 "id": book_id, "name": book_name, "slug": self.create_slug(book_name),
@@ -72,57 +109,83 @@ class TorahWebsiteBuilder:
             print(f"  📖 {book_name}: {chapter_count} פרקים, {verse_count} פסוקים, {question_count} שאלות")
         
         self.save_json(books_index, "api/books_index.json")
+        self.build_state.record("api/books_index.json", fingerprint)
         print("  ✅ אינדקס ספרים נשמר")
         return books_index
     
+    @measured
     def create_book_files(self, books_index):
         print("\n📖 יוצר קבצי ספרים...")
-        cursor = self.conn.cursor()
+        fingerprints = self.build_state.fingerprints
+        
+        # אינדקס המיקומים הקודם - לספרים שלא נבנים מחדש
+        locator_path = f"{self.output_dir}/{LOCATOR_FILE}"
+        previous_books = {}
+        if os.path.exists(locator_path):
+            with open(locator_path, 'r', encoding='utf-8') as f:
+                previous_books = json.load(f).get("books", {})
+        located_books = {}
         
-        for book_info in books_index["books"][:2]:
+        for book_info in books_index["books"]:
             book_id = book_info["id"]
             book_name = book_info["name"]
+            book_fingerprint = fingerprints.combine(fingerprints.of_book(book_id), BOOK_FORMAT)
+            if self.skip_unchanged(f"books/book_{book_id}.json", book_fingerprint):
+                located_books[book_id] = self.load_book_entry(f"books/book_{book_id}.json",
+                                                              previous_books.get(str(book_id)))
+                continue
             print(f"  📚 מעבד ספר: {book_name}")
+            corpus = self.load_corpus()
             
             book_data = {"book_info": book_info, "chapters": []}
             
-            cursor.execute("SELECT DISTINCT Perek FROM tbl_Torah WHERE Sefer = ? ORDER BY Perek LIMIT 2", (book_id,))
-            chapters = [row[0] for row in cursor.fetchall()]
+            chapters = corpus.chapters(book_id)
             
             for chapter_num in chapters:
                 chapter_data = {"chapter_number": chapter_num, "verses": []}
                 
-                cursor.execute("SELECT ID, PasukNum, Pasuk FROM tbl_Torah WHERE Sefer = ? AND Perek = ? ORDER BY PasukNum LIMIT 5", (book_id, chapter_num))
-                verses = cursor.fetchall()
+                verses = corpus.verses(book_id, chapter_num)
                 
                 for verse in verses:
                     torah_id, verse_num, verse_text = verse["ID"], verse["PasukNum"], verse["Pasuk"]
                     
-                    cursor.execute("SELECT COUNT(*) FROM tbl_Title WHERE TorahID = ?", (torah_id,))
-                    question_count = cursor.fetchone()[0]
+                    # שאלות לפי כותרת, כמו בפרקים של האופטימייזר (כותרת בלי שאלות לא נכללת)
+                    question_groups = []
+                    for title in corpus.titles(torah_id):
+                        questions = [question["Question"] for question in corpus.questions(title["ID"])]
+                        if questions:
+                            question_groups.append({"title": title["Title"], "questions": questions})
                     
                     verse_data = {
                         "verse_number": verse_num, "text": verse_text, "torah_id": torah_id,
-                        "total_questions": question_count, "question_groups": []
+                        "total_questions": sum(len(group["questions"]) for group in question_groups),
+                        "question_groups": question_groups
                     }
                     
-                    if question_count > 0:
-                        verse_data["question_groups"] = [{"title": "שאלות", "questions": [f"שאלה מספר {i+1}" for i in range(min(3, question_count))]}]
-                    
                     chapter_data["verses"].append(verse_data)
                 
                 book_data["chapters"].append(chapter_data)
             
-            self.save_json(book_data, f"books/book_{book_id}.json")
+            located_books[book_id] = self.save_book(book_data, f"books/book_{book_id}.json")
+            self.build_state.record(f"books/book_{book_id}.json", book_fingerprint)
             print(f"    ✅ {len(book_data['chapters'])} פרקים נשמרו")
+        
+        # (ספר, פרק, פסוק) -> (קובץ, offset, length) לקריאת פסוק אחד ב-Range או mmap
+        with open(locator_path, 'wb') as f:
+            f.write(dumps(build_locator(located_books)))
+        verse_count = sum(len(chapter[2]) for book in located_books.values() for chapter in book["chapters"].values())
+        print(f"  📍 {LOCATOR_FILE}: {verse_count:,} פסוקים ב-{len(located_books)} ספרים")
     
+    @measured
     def create_parshiot_data(self):
         print("\n📜 יוצר נתוני פרשות...")
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT p.*, s.SeferName FROM tbl_Parsha p JOIN tbl_Sefer s ON p.SeferID = s.ID ORDER BY p.ID")
+        fingerprint = self.build_state.fingerprints.of_tables("tbl_Parsha", "tbl_Sefer")
+        if self.skip_unchanged("api/parshiot.json", fingerprint):
+            return
+        
         parshiot = []
         
-        for row in cursor.fetchall():
+        for row in self.load_corpus().parshiot_with_book_names():
             parsha_data = {
                 "id": row["ID"], "name": row["ParshaName"], "sefer_id": row["SeferID"],
                 "sefer_name": row["SeferName"], "start_chapter": row["StartPerek"], "start_verse": row["StartPasuk"]
@@ -131,40 +194,73 @@ class TorahWebsiteBuilder:
         
         parshiot_data = {"parshiot": parshiot, "total_count": len(parshiot)}
         self.save_json(parshiot_data, "api/parshiot.json")
+        self.build_state.record("api/parshiot.json", fingerprint)
         print(f"  ✅ {len(parshiot)} פרשות נשמרו")
     
+    @measured
     def create_manifest(self):
+        fingerprint = self.build_state.fingerprints.of_all()
+        if self.skip_unchanged("manifest.json", fingerprint):
+            return
+        
         manifest = {
             "version": "1.0", "created": datetime.now().isoformat(),
             "description": "נתוני תורה מוכנים לאתר"
         }
         self.save_json(manifest, "manifest.json")
+        self.build_state.record("manifest.json", fingerprint)
         print("  ✅ מניפסט נוצר")
     
     def build_website_data(self):
         print("🌐 בונה נתונים לאתר התורה")
         print("=" * 50)
+        self.metrics.begin()
         try:
             if not self.connect_db(): return False
+            self.metrics.attach(self.conn)
             self.setup_directories()
+            with self.metrics.stage("scan_fingerprints"):
+                self.build_state = BuildState(self.output_dir, ContentFingerprints.scan(self.conn), self.incremental,
+                                              layout=self.serializer.profile)
+            with self.metrics.stage("load_stats"):
+                self.torah_stats = load_stats(self.conn, self.build_state, "api/stats.json")
             books_index = self.create_books_index()
             self.create_book_files(books_index)
             self.create_parshiot_data()
             self.create_manifest()
+            # העותקים השמורים וה-patches של index.html (אותו סקריפט כמו באתר האופטימלי)
+            torah_delta.write_script(self.output_dir)
+            self.build_state.save()
+            with self.metrics.stage("publish"):
+                publish(self.output_dir)
             print("\n🎉 נתוני האתר מוכנים!")
+            self.metrics.finish(ok=True)
             return True
         except Exception as e:
             print(f"\n❌ שגיאה: {e}")
             return False
         finally:
             if self.conn: self.conn.close()
+            self.metrics.save(self.output_dir)
 
 def main():
-    builder = TorahWebsiteBuilder()
+    parser = argparse.ArgumentParser(description="בניית נתונים לאתר התורה")
+    parser.add_argument("--incremental", action="store_true", help="בנייה רק של תוצרים שהקלטים שלהם השתנו")
+    parser.add_argument("--profile", action="store_true", help="הדפסת טבלת זמנים ומדדים לכל שלב")
+    parser.add_argument("--json-profile", choices=PROFILES, default="pretty",
+                        help="pretty - קבצים מוזחים לפיתוח, compact - בלי רווחים לייצור")
+    parser.add_argument("--json-backend", choices=("auto",) + BACKENDS, default="auto",
+                        help="מנוע הקידוד של JSON (הפלט זהה בכל מנוע)")
+    args = parser.parse_args()
+    print(f"⚙️ מנוע JSON: {use_backend(args.json_backend)}")
+    
+    builder = TorahWebsiteBuilder(incremental=args.incremental, json_profile=args.json_profile)
     success = builder.build_website_data()
+    if args.profile:
+        builder.metrics.print_profile()
     if success:
         print("\n🎯 הנתונים מוכנים לאתר!")
-        print("\n🚀 הרץ: python -m http.server 8000")
+        print("\n🚀 הרץ: python torah_server.py --port 8000")
 
 if __name__ == "__main__":
     main()